@@ -21,25 +21,163 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import argparse
+import CompressedFiles
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+
+INDEX_SUFFIX = '.npz'
+
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Create a table showing tleap-style residue numbers alongside the corresponding PDB residue/chain')
     parser.add_argument('infile', help='input file (PDB format)')
     parser.add_argument('outfile', help='output file')
     parser.add_argument('startnum', help='starting residue number')
+    parser.add_argument('-i', '--index', help='also write a machine-readable index of the numbering to the specified '
+                                              'file (NumPy .npz format)')
+    parser.add_argument('-s', '--chain_start', nargs=2, action='append', default=[], metavar=('CHAIN', 'STARTNUM'),
+                        help='restart the numbering at STARTNUM at the first residue of CHAIN, for example where the '
+                             'chain is in a separate topology. May be repeated')
+    parser.add_argument('-p', '--processes', help='number of worker processes: the file is split into chunks at '
+                                                  'residue boundaries, which are read in parallel', type=int,
+                        default=1)
     args = parser.parse_args()
-        
-    sernum = int(args.startnum)
-    old_resnum = -1
-        
-    with open(argv[1], "r") as f, open(argv[2], "w") as of:
-        for line in f:
-            if line[0:4] == "ATOM":
-                resnum = line[22:27]
-                if resnum != old_resnum:
-                    of.write("%5d    %s" % (sernum, line))
-                    sernum += 1
-                    old_resnum = resnum
+
+    chain_starts = dict((chain, int(startnum)) for chain, startnum in args.chain_start)
+
+    if args.processes > 1:
+        index, lines, newline = number_parallel(args.infile, int(args.startnum), chain_starts, args.processes)
+    else:
+        s = PdbArrays.read_pdb(args.infile)
+        index = number_residues(s, int(args.startnum), chain_starts)
+        text_lines = s.text_lines()
+        lines = [text_lines[line] for line in s.atom_lines[index.atom].tolist()]
+        newline = s.newline
+
+    with CompressedFiles.open_file(args.outfile, "w") as of:
+        for sernum, line in zip(index.serial.tolist(), lines):
+            of.write("%5d    %s%s" % (sernum, line, newline))
+
+    if args.index:
+        if len(np.unique(index.serial)) < len(index.serial):
+            print 'Warning: tleap numbers are repeated between chains. Lookups by tleap number will return the first ' \
+                  'residue with that number.'
+        index.save(args.index)
+
+
+class NumberingIndex(object):
+    """Cross-reference between tleap residue numbers and PDB residues.
+
+    serial[i] is the tleap number of residue i, and chain[i], resseq[i], icode[i] and resname[i] identify it in the
+    PDB file. residue() and serial_of() look up either way round in constant time.
+    """
+
+    _FIELDS = ['serial', 'chain', 'resseq', 'icode', 'resname']
+
+    def __init__(self, serial, chain, resseq, icode, resname, atom=None):
+        self.serial = serial
+        self.chain = chain
+        self.resseq = resseq
+        self.icode = icode
+        self.resname = resname
+        self.atom = atom        # the first atom of each residue in the structure it was built from, if any
+
+        self._by_serial = {}
+        self._by_residue = {}
+        for i, key in enumerate(zip(chain.tolist(), resseq.tolist(), icode.tolist())):
+            self._by_serial.setdefault(int(serial[i]), i)
+            self._by_residue.setdefault(key, i)
+
+    def __len__(self):
+        return len(self.serial)
+
+    def residue(self, serial):
+        # (chain, resseq, icode, resname) of the residue with the given tleap number, or None
+        i = self._by_serial.get(serial)
+        if i is None:
+            return None
+        return self.chain[i], int(self.resseq[i]), self.icode[i] or ' ', self.resname[i]
+
+    def serial_of(self, chain, resseq, icode=' '):
+        # tleap number of the given PDB residue, or None
+        i = self._by_residue.get((chain, resseq, icode.strip()))
+        return None if i is None else int(self.serial[i])
+
+    def save(self, filename):
+        np.savez(filename, **dict((f, getattr(self, f)) for f in self._FIELDS))
+
+
+def load_index(filename):
+    stored = np.load(filename)
+    return NumberingIndex(*[stored[f] for f in NumberingIndex._FIELDS])
+
+
+def number_residues(s, startnum, chain_starts=None):
+    # Number the residues of the ATOM records in s from startnum, in the manner of tleap. chain_starts optionally
+    # gives the number at which to restart at the first residue of a chain.
+
+    first = first_atoms(s)
+    serial = tleap_numbers(s.records['chain'][first], startnum, chain_starts)
+    return NumberingIndex(serial, s.records['chain'][first], s.atoms['resseq'][first], s.atoms['icode'][first],
+                          s.atoms['resname'][first], first)
+
+
+def first_atoms(s):
+    # Index of the first ATOM record of each residue in s
+    rec = s.records
+    atoms = np.nonzero(np.char.startswith(rec['record'], 'ATOM'))[0]
+    resid = rec['resid'][atoms]
+    chain = rec['chain'][atoms]
+    return atoms[np.r_[True, (resid[1:] != resid[:-1]) | (chain[1:] != chain[:-1])]] if len(atoms) else atoms
+
+
+def tleap_numbers(chains, startnum, chain_starts=None):
+    # Number residues, given the chain of each in file order, from startnum
+
+    # Each restart renumbers from the chain's first residue onwards, so they are applied in file order
+
+    serial = startnum + np.arange(len(chains), dtype=np.int64)
+    restarts = []
+    for restart_chain, restart_num in (chain_starts or {}).items():
+        in_chain = np.nonzero(chains == restart_chain)[0]
+        if len(in_chain):
+            restarts.append((in_chain[0], restart_num))
+    for pos, restart_num in sorted(restarts):
+        serial[pos:] += restart_num - serial[pos]
+    return serial
+
+
+def number_parallel(infile, startnum, chain_starts, processes):
+    # Read the residues of chunks of the file, split at residue boundaries, in parallel. The residues of the chunks,
+    # concatenated in order, are then numbered as a whole. Returns the index, with the text of the first atom of each
+    # residue, and the line ending to use.
+
+    with CompressedFiles.open_file(infile, "r") as f:
+        data = f.read()
+
+    chunks = [data[start:end] for start, end in PdbArrays.residue_chunks(data, processes)]
+    results = PdbArrays.map_models(chunk_residues, chunks, (), processes)
+
+    lines = []
+    for result in results:
+        lines.extend(result[0])
+    chain, resseq, icode, resname = [np.concatenate([result[i] for result in results]) for i in range(1, 5)]
+    newline = '\r\n' if any(result[5] == '\r\n' for result in results) else '\n'
+
+    index = NumberingIndex(tleap_numbers(chain, startnum, chain_starts), chain, resseq, icode, resname)
+    return index, lines, newline
+
+
+def chunk_residues(text):
+    # The first atom of each residue in a chunk of the file: its text, chain, residue number, insertion code and
+    # residue name, with the line ending used in the chunk
+    s = PdbArrays.PdbStructure(text)
+    first = first_atoms(s)
+    text_lines = s.text_lines()
+    return ([text_lines[line] for line in s.atom_lines[first].tolist()], s.records['chain'][first],
+            s.atoms['resseq'][first], s.atoms['icode'][first], s.atoms['resname'][first], s.newline)
 
 if __name__ == "__main__":
     main(sys.argv)
@@ -16,24 +16,19 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import pandas
-import scipy
-import scikits.bootstrap as bootstrap
 import sys
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
 import argparse
-import numpy as np
 import csv
+import CompressedFiles
+from LazyModules import LazyModule
 
-mean_results = []
+np = LazyModule('numpy')
 
-font = {'family' : 'sans-serif',
-        'weight' : 'normal',
-        'size'   : 22}
+mean_results = []
 
-matplotlib.rc('font', **font)
+rc_font = {'family' : 'sans-serif',
+           'weight' : 'normal',
+           'size'   : 22}
 
 
 def main(argv):
@@ -47,13 +42,19 @@ def main(argv):
     column = 'TOTAL' if not args.column else args.column
     
     global mean_results
-    
+
+    # matplotlib is slow to load, so is only imported once the arguments have been read
+    import matplotlib
+    matplotlib.rc('font', **rc_font)
+    import matplotlib.pyplot as plt
+    from matplotlib.font_manager import FontProperties
+
     font = FontProperties()
     font.set_name('Calibri')
     font.set_size(28)
 
     means = []
-    with open(args.infile) as infile:
+    with CompressedFiles.open_file(args.infile) as infile:
         reader = csv.DictReader(infile)
         for row in reader:
             if len(row[column]) > 0:
@@ -66,7 +67,7 @@ def main(argv):
     results_l = []
     xs = []
 
-    with open(args.sumfile, 'w') as fo:
+    with CompressedFiles.open_file(args.sumfile, 'w') as fo:
         for i in range(5, len(means)+5, 5):
             if i >= 10000:
                 print('Stopping after 10000 values due to limitations in the bootstrap function.')
@@ -100,6 +101,7 @@ def main(argv):
 
 
 def conf_intervals(data):
+	import scikits.bootstrap as bootstrap
 	mean = np.average(data)
 	CIs = bootstrap.ci(data=data, statfunction=mymean, n_samples=10000)
 	ubound = CIs[1]-mean
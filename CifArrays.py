@@ -0,0 +1,276 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Columnar reader and writer for the _atom_site loop of an mmCIF (PDBx) file, for structures that the fixed columns of
+# the PDB format cannot hold: more than 99,999 atoms, more than 9,999 residues in a chain, or chain ids of more than
+# one character.
+#
+# The rows of the loop are streamed in blocks of lines. Each block is split into tokens in one pass (str.split if
+# nothing in it is quoted, a regular expression otherwise) and the tokens are reshaped into a table with a column for
+# each data item, so that the tools work on whole columns at a time, as they do with PdbArrays. Tokens are held as
+# written, quotes and all, so that the values a tool does not change are written back as they were read. Everything
+# outside the _atom_site loop is carried through untouched.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import itertools
+import re
+import numpy as np
+import PdbArrays
+import CompressedFiles
+
+STREAM_LINES = 1 << 16
+
+# Items holding the per-atom values used by the tools. The author chain ids, residue numbers and residue names are
+# used where present, as they are the ones carried over to PDB files. Residue names are changed in every item that
+# holds them.
+
+CHAIN_ITEMS = ('auth_asym_id', 'label_asym_id')
+RESSEQ_ITEMS = ('auth_seq_id', 'label_seq_id')
+RESNAME_ITEMS = ('auth_comp_id', 'label_comp_id')
+ICODE_ITEM = 'pdbx_PDB_ins_code'
+RECORD_ITEM = 'group_PDB'
+
+_ITEM_PREFIX = '_atom_site.'
+
+# A quoted token ends at a matching quote that is followed by white space
+_TOKEN_RE = re.compile(r"""'(?:[^']|'(?=\S))*'(?=\s|$)|"(?:[^"]|"(?=\S))*"(?=\s|$)|\S+""")
+
+# Lines that end a loop. Comment lines are included, as PDBx files separate their categories with them.
+_END_RE = re.compile(r'^(?:_|#|loop_|data_|save_|global_|stop_)', re.M)
+
+# Values that must be quoted to be read back as they are. The checks are made on the bytes of the values, as the
+# np.char functions are slow on large arrays.
+_SPECIAL_STARTS = np.frombuffer('_#$\'"[];', dtype=np.uint8)
+_RESERVED_STARTS = ('data_', 'loop_', 'save_', 'global_', 'stop_')
+_QUOTES = np.frombuffer('\'"', dtype=np.uint8)
+
+
+def _bytes(values):
+    # The bytes of an array of strings, one row for each string, padded with zeros
+    values = np.ascontiguousarray(values)
+    return values.view(np.uint8).reshape(len(values), values.dtype.itemsize)
+
+
+def quote(values):
+    # Values as CIF tokens: blank values are written as ?, and values that contain spaces, or that would be read as
+    # something else, are quoted
+    values = np.atleast_1d(np.asarray(values))
+    if values.dtype.kind != 'S':
+        values = values.astype('S')
+    b = _bytes(values)
+    blank = ~((b != 0) & (b != ord(' '))).any(axis=1)
+    if blank.any():
+        values = np.where(blank, '?', values)
+        b = _bytes(values)
+    need = (b == ord(' ')).any(axis=1) | np.in1d(b[:, 0], _SPECIAL_STARTS)
+    reserved = np.in1d(b[:, 0], np.frombuffer('dlsgDLSG', dtype=np.uint8))
+    if reserved.any():
+        need[reserved] |= [v.lower().startswith(_RESERVED_STARTS) for v in values[reserved].tolist()]
+    if need.any():
+        values = values.astype('S%d' % (values.dtype.itemsize + 2))
+        values[need] = [("'%s'" if '"' in v else '"%s"') % v for v in values[need].tolist()]
+    return values
+
+
+def loop_header(names):
+    # The text that starts an _atom_site loop with the given items
+    return 'loop_\n' + ''.join('%s%s\n' % (_ITEM_PREFIX, name) for name in names)
+
+
+class AtomSite(object):
+    """A block of rows of the _atom_site loop, held as a table of tokens with a column for each data item."""
+
+    def __init__(self, names, tokens):
+        self.names = names
+        self.tokens = tokens
+        self._index = dict((name, i) for i, name in enumerate(names))
+
+        self.chain_item = self.item(*CHAIN_ITEMS)
+        self.resseq_item = self.item(*RESSEQ_ITEMS)
+        self.resname_items = [name for name in RESNAME_ITEMS if name in self._index]
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def item(self, *names):
+        # The first of the named items that is present in the loop, or None
+        for name in names:
+            if name in self._index:
+                return name
+        return None
+
+    def column(self, name):
+        # The tokens of an item, as written
+        return self.tokens[:, self._index[name]]
+
+    def values(self, name):
+        # The values of an item, without quotes. The null values ? and . are read as blank, as is a missing item.
+        if name is None or name not in self._index:
+            return np.zeros(len(self), dtype='S1')
+        col = self.column(name)
+        quoted = np.in1d(_bytes(col)[:, 0], _QUOTES)
+        if quoted.any():
+            col = col.copy()
+            col[quoted] = [v[1:-1] for v in col[quoted].tolist()]
+        return np.where((col == '?') | (col == '.'), '', col)
+
+    def set_values(self, name, values, sel=None):
+        # Set the values of an item, for every row or for those selected by sel. Values are quoted as necessary.
+        if name is None or name not in self._index:
+            return
+        values = quote(values)
+        if values.dtype.itemsize > self.tokens.dtype.itemsize:
+            self.tokens = self.tokens.astype(values.dtype)
+        if sel is None:
+            self.tokens[:, self._index[name]] = values
+        else:
+            self.tokens[sel, self._index[name]] = values
+
+    def select(self, sel):
+        return AtomSite(self.names, self.tokens[sel])
+
+    # Per-atom values in the form used with PdbArrays
+
+    def is_record(self, *types):
+        # Mask of the rows of the given record types (ATOM, HETATM). If there is no group_PDB item, every row is ATOM.
+        if RECORD_ITEM not in self._index:
+            return np.ones(len(self), dtype=bool) if 'ATOM' in types else np.zeros(len(self), dtype=bool)
+        return np.in1d(self.values(RECORD_ITEM), types)
+
+    def chains(self):
+        # Chain ids, with a missing id read as a blank, as in a PDB file
+        chains = self.values(self.chain_item)
+        return np.where(chains == '', ' ', chains)
+
+    def resseqs(self):
+        return PdbArrays.column_ints(self.values(self.resseq_item))
+
+    def icodes(self):
+        return self.values(ICODE_ITEM)
+
+    def resids(self):
+        # Residue number and insertion code together, as in the resid column of a PDB file (but not padded)
+        return np.char.add(self.values(self.resseq_item), self.icodes())
+
+    def resnames(self):
+        return self.values(self.resname_items[0] if self.resname_items else None)
+
+    def residue_keys(self):
+        # Integer key ordering residues by sequence number, then insertion code, as PdbArrays.residue_keys
+        icodes = np.char.ljust(self.icodes(), 1).astype('S1')
+        return self.resseqs() * 1000 + icodes.view(np.uint8)
+
+    def text(self):
+        # The rows, one to a line, with each column padded to the width of its longest token
+        if not len(self):
+            return ''
+        n, ncols = self.tokens.shape
+        raw = _bytes(self.tokens.ravel()).reshape(n, ncols, -1)
+        widths = [np.nonzero((raw[:, k, :] != 0).any(axis=0))[0].max() + 1 for k in range(ncols)]
+
+        out = np.empty((n, sum(widths) + ncols), dtype=np.uint8)
+        pos = 0
+        for k, w in enumerate(widths):
+            cell = raw[:, k, :w]
+            out[:, pos:pos + w] = np.where(cell == 0, ord(' '), cell)
+            out[:, pos + w] = ord(' ')
+            pos += w + 1
+        out[:, -1] = ord('\n')
+        return out.tostring()
+
+
+class CifReader(object):
+    """An mmCIF file, with the rows of its _atom_site loop read a block at a time.
+
+    header holds the text of the file up to and including the item names of the loop, and names the names of its
+    items (without the _atom_site. prefix). Once blocks() has been read to the end, trailer holds the text that follows
+    the loop.
+    """
+
+    def __init__(self, filename, block_lines=STREAM_LINES):
+        self.filename = filename
+        self.block_lines = block_lines
+        self.f = CompressedFiles.open_file(filename, 'r')
+        self.names = []
+        self.trailer = None
+
+        header = []
+        loop_line = None
+        for line in self.f:
+            stripped = line.strip()
+            if stripped.startswith(_ITEM_PREFIX) and loop_line is not None:
+                self.names.append(stripped.split()[0][len(_ITEM_PREFIX):])
+            elif self.names:
+                self._first = line
+                break
+            elif stripped == 'loop_':
+                loop_line = line
+            else:
+                loop_line = None
+            header.append(line)
+        else:
+            self._first = ''
+
+        if not self.names:
+            self.error('no _atom_site loop was found')
+        self.header = ''.join(header)
+
+    def error(self, message):
+        print 'Error: %s: %s' % (self.filename, message)
+        quit()
+
+    def blocks(self):
+        # Generate the rows of the loop as AtomSite blocks. A row may run over several lines, so tokens left over at
+        # the end of one block of lines are carried into the next.
+        ncols = len(self.names)
+        carried = []
+        lines = itertools.chain([self._first], self.f)
+        while True:
+            text = ''.join(itertools.islice(lines, self.block_lines))
+            end = _END_RE.search(text)
+            if end:
+                self.trailer = text[end.start():] + ''.join(lines)
+                text = text[:end.start()]
+            if re.search(r'^;', text, re.M):
+                self.error('multi-line values are not supported in the _atom_site loop')
+
+            if '"' in text or "'" in text:
+                tokens = carried + _TOKEN_RE.findall(text)
+            else:
+                tokens = carried + text.split()
+            rows = len(tokens) // ncols
+            carried = tokens[rows * ncols:]
+            if rows:
+                yield AtomSite(self.names, np.array(tokens[:rows * ncols], dtype='S').reshape(rows, ncols))
+
+            if end or not text:
+                break
+
+        if carried:
+            self.error('the last row of the _atom_site loop is incomplete')
+        if self.trailer is None:
+            self.trailer = ''
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
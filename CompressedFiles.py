@@ -0,0 +1,198 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Transparent reading and writing of gzip, bzip2 and xz compressed files.
+#
+# Files opened for reading are recognised as compressed by their first few bytes, whatever they are called. Files
+# opened for writing are compressed if their name ends in .gz, .bz2 or .xz. If the environment variable
+# AMBERUTILS_COMPRESS_THREAD is set, compression is carried out on a separate thread, so that it can proceed while the
+# tool prepares the next output. xz support requires the lzma module (included with Python 3, or installed for Python
+# 2 with pip install backports.lzma).
+#
+# is_cif tells mmCIF files from PDB files in the same way, so that the tools that read both can do so without
+# loading anything else.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import os
+
+# The compression modules are imported only when a compressed file is opened, to keep the start-up time of the tools
+# down.
+
+THREAD_ENV = 'AMBERUTILS_COMPRESS_THREAD'
+
+_MAGIC = [
+    ('\x1f\x8b', 'gz'),
+    ('BZh', 'bz2'),
+    ('\xfd7zXZ\x00', 'xz'),
+]
+
+_SUFFIXES = {'.gz': 'gz', '.bz2': 'bz2', '.xz': 'xz'}
+
+_CHUNK = 1 << 20
+
+
+def compression_of(filename):
+    # The compression of an existing file ('gz', 'bz2' or 'xz'), found from its first bytes, or None
+    with open(filename, 'rb') as f:
+        head = f.read(6)
+    for magic, kind in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def compression_for(filename):
+    # The compression that will be used to write a file of the given name, or None
+    return _SUFFIXES.get(os.path.splitext(filename)[1].lower())
+
+
+def strip_suffix(filename):
+    # The file name without any compression suffix
+    if compression_for(filename):
+        return os.path.splitext(filename)[0]
+    return filename
+
+
+def is_compressed(filename, mode='r'):
+    # True if the file would be read (or, for mode 'w', written) with compression. Such files cannot be used for
+    # random access.
+    if 'r' in mode and '+' not in mode:
+        return compression_of(filename) is not None
+    return compression_for(filename) is not None
+
+
+def open_file(filename, mode='r'):
+    # Open a file for reading or writing, as open(), decompressing or compressing it as necessary
+    if 'r' in mode and '+' not in mode:
+        kind = compression_of(filename)
+    elif 'w' in mode or 'a' in mode:
+        kind = compression_for(filename)
+    else:
+        kind = None
+
+    if kind is None:
+        return open(filename, mode)
+
+    cmode = 'rb' if 'r' in mode else ('ab' if 'a' in mode else 'wb')
+    if kind == 'gz':
+        import gzip
+        f = gzip.open(filename, cmode)
+    elif kind == 'bz2':
+        import bz2
+        f = bz2.BZ2File(filename, cmode)
+    else:
+        lzma = _lzma()
+        if lzma is None:
+            raise IOError('%s: xz compression requires the lzma module (pip install backports.lzma)' % filename)
+        f = lzma.LZMAFile(filename, cmode)
+
+    if 'r' not in mode and os.environ.get(THREAD_ENV):
+        f = ThreadedWriter(f)
+    return f
+
+
+def is_cif(filename):
+    # True if the file is in mmCIF format: that is, if its first line that is not blank or a comment starts a data
+    # block. Like compression, this is told from the content of the file rather than its name.
+    with open_file(filename, 'r') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                return line.startswith('data_')
+    return False
+
+
+def _lzma():
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            lzma = None
+    return lzma
+
+
+class ThreadedWriter(object):
+    """Write to a (compressed) file on a separate thread.
+
+    Output is gathered into chunks, which are handed to the thread through a short queue, so that the writer is held
+    up only if the thread falls more than a few chunks behind.
+    """
+
+    def __init__(self, f):
+        import threading
+        import Queue
+
+        self.f = f
+        self.queue = Queue.Queue(maxsize=4)
+        self.buffer = []
+        self.size = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error is None:
+                try:
+                    self.f.write(chunk)
+                except Exception as e:
+                    self.error = e
+
+    def _flush(self):
+        if self.buffer:
+            self.queue.put(''.join(self.buffer))
+            self.buffer = []
+            self.size = 0
+
+    def write(self, data):
+        if self.error is not None:
+            raise self.error
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= _CHUNK:
+            self._flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.f.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -25,6 +25,7 @@ __docformat__ = "restructuredtext en"
 import sys
 import csv
 import argparse
+import CompressedFiles
 
 def main(argv):
     repeat = 99999
@@ -71,7 +72,7 @@ def main(argv):
     pairs = {}
 
     for file in infiles:
-        with open(file, "rb") as f:
+        with CompressedFiles.open_file(file, "rb") as f:
             for line in f:
                 if '@' in line:
                     (acceptor, hdonor, donor, frames, frac, avgdist, avgang) = line.split()
@@ -85,7 +86,7 @@ def main(argv):
                     ind = '%s,%s' % (acceptor, donor)
                     pairs[ind] = pairs.get(ind, 0) + int(frames)
 
-    with open(outfile, "w") as f:
+    with CompressedFiles.open_file(outfile, "w") as f:
         for (k, v) in pairs.iteritems():
             #k = k.replace('_', ',')
             f.write('%s,%s\n' % (k,v))
@@ -0,0 +1,263 @@
+#! /usr/bin/env python
+
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Find the residues in contact with each other in a PDB file, and list the residues at the interface between each pair
+# of chains. Two residues are in contact if any of their heavy atoms are within the cutoff distance of each other.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import sys
+import argparse
+import CompressedFiles
+import ExtractResidues
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+Neighbours = LazyModule('Neighbours')
+
+DEFAULT_CUTOFF = 4.0
+
+# Atoms are searched in chunks of this many, to bound the memory used by the candidate pairs
+QUERY_CHUNK = 1 << 16
+
+# Records that end a residue even if the identifiers either side of them are the same
+_BREAK_RECORDS = ['TER   ', 'END   ']
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='List the residues at the interface between each pair of chains, '
+                                                 'from the distances between their heavy atoms.')
+    parser.add_argument('infile', help='input file (PDB format)')
+    parser.add_argument('outfile', help='output file: the interface residues of each chain, for each pair of chains')
+    parser.add_argument('-d', '--distance', help='largest distance, in Angstroms, between heavy atoms in contact '
+                                                 '(default %(default)s)', type=float, default=DEFAULT_CUTOFF)
+    parser.add_argument('-x', '--matrix', help='also write the residue contact matrix, as a list of the pairs of '
+                                               'residues in contact, to this file (CSV, or NumPy format if the name '
+                                               'ends in .npz)')
+    parser.add_argument('-c', '--control', help='also write a control file for DrawInteractions, listing the interface '
+                                                'residues (CSV)')
+    parser.add_argument('-o', '--column_order', help='with -c, assign chains to columns (e.g. \'-o CA\' -> C first, A '
+                                                     'second column). By default, chains are taken in file order')
+    parser.add_argument('-s', '--startnum', help='with -c, the tleap number of the first residue, from which residue '
+                                                 'ids are numbered (default 1)', type=int, default=1)
+    parser.add_argument('-e', '--exclude', help='names of residues to leave out, comma separated (default %s)'
+                                                % ExtractResidues.DEFAULT_STRIP, default=ExtractResidues.DEFAULT_STRIP)
+    args = parser.parse_args()
+
+    with CompressedFiles.open_file(args.infile, "r") as f:
+        data = f.read()
+
+    header, models, trailer = PdbArrays.split_models(data)
+    if models:
+        if len(models) > 1:
+            print 'Warning: %s contains %d models. Contacts are found in the first.' % (args.infile, len(models))
+        data = models[0]
+
+    atoms = Atoms(data)
+    residues = Residues(atoms)
+    pairs = residue_contacts(atoms, args.distance, ExtractResidues.strip_names(args.exclude.split(',')))
+
+    interfaces = chain_interfaces(residues, pairs)
+    with CompressedFiles.open_file(args.outfile, "w") as of:
+        write_interfaces(of, residues, interfaces)
+    for (chain_1, chain_2), (first, second) in sorted(interfaces.items()):
+        print '%s-%s: %d residues in %s, %d in %s' % (chain_1, chain_2, len(first), chain_1, len(second), chain_2)
+
+    if args.matrix:
+        write_matrix(args.matrix, residues, pairs)
+
+    if args.control:
+        write_control(args.control, residues, interfaces, args.column_order, args.startnum)
+
+
+class Atoms(object):
+    """The columns of the ATOM and HETATM records of a PDB file that are needed to find contacts.
+
+    The columns are read straight from the bytes of the text, which is much quicker for a large file than parsing
+    every field. label holds columns 18-27 (residue name, chain and residue id), and residue the index of the residue
+    to which each atom belongs.
+    """
+
+    def __init__(self, data):
+        buf = np.frombuffer(data, dtype=np.uint8)
+        starts, ends = PdbArrays.line_bounds(buf)
+        records = PdbArrays.gather_column(buf, starts, 0, 6, ends)
+        lines = np.nonzero(np.in1d(records, ['ATOM  ', 'HETATM']))[0]
+        segment = np.cumsum(np.in1d(records, _BREAK_RECORDS))[lines]
+        starts, ends = starts[lines], ends[lines]
+
+        self.name = PdbArrays.gather_column(buf, starts, 12, 4, ends)
+        self.label = PdbArrays.gather_column(buf, starts, 17, 10, ends)
+        self.element = PdbArrays.gather_column(buf, starts, 76, 2, ends)
+        xyz = PdbArrays.gather_column(buf, starts, 30, 24, ends).view('S8').reshape(-1, 3)
+        self.xyz = np.column_stack([PdbArrays.column_floats(xyz[:, k]) for k in range(3)])
+
+        change = (self.label[1:] != self.label[:-1]) | (segment[1:] != segment[:-1])
+        self.residue = np.cumsum(np.r_[False, change]) if len(lines) else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.label)
+
+    def resnames(self):
+        # Residue names, as written in columns 18-21
+        return self.label.astype('S4')
+
+    def heavy(self):
+        # Mask of the atoms that are not hydrogens, judged by the element column or, where that is blank, by the first
+        # letter of the atom name
+        element = self.element.view(np.uint8).reshape(-1, 2)
+        name = self.name.view(np.uint8).reshape(-1, 4)
+        space = ord(' ')
+        is_h = np.in1d(element, np.frombuffer('Hh', dtype=np.uint8)).reshape(element.shape)
+        blank = (element == space).all(axis=1)
+        element_h = (is_h[:, 0] & (element[:, 1] == space)) | ((element[:, 0] == space) & is_h[:, 1])
+
+        letters = (name != space) & ((name < ord('0')) | (name > ord('9')))
+        first = name[np.arange(len(name)), letters.argmax(axis=1)]
+        return ~np.where(blank, first == ord('H'), element_h)
+
+
+class Residues(object):
+    """The chain, residue id (number and insertion code) and name of each residue of a structure, in file order."""
+
+    def __init__(self, atoms):
+        first = np.nonzero(np.r_[True, atoms.residue[1:] != atoms.residue[:-1]])[0] if len(atoms) else \
+            np.zeros(0, dtype=np.int64)
+        label = atoms.label[first]
+        self.resname = np.char.strip(label.astype('S4'))
+        self.chain = label.view('S1').reshape(-1, 10)[:, 4]
+        self.resid = np.char.strip(label.view('S5').reshape(-1, 2)[:, 1])
+
+    def __len__(self):
+        return len(self.chain)
+
+
+def residue_contacts(atoms, cutoff, exclude):
+    # The pairs of residues in contact. Returns (residue 1, residue 2, number of atom pairs in contact, least distance
+    # between them), with residue 1 < residue 2, in order of residue 1 then residue 2. Residues with the names in
+    # exclude (in the forms given by ExtractResidues.strip_names) are left out.
+
+    sel = np.nonzero(atoms.heavy() & ~np.in1d(atoms.resnames(), exclude))[0]
+    res = atoms.residue[sel]
+    grid = Neighbours.CellList(atoms.xyz[sel], cutoff)
+
+    # Atom pairs are reduced to residue pairs a chunk at a time
+    n = atoms.residue[-1] + 1 if len(atoms) else 1
+    keys = []
+    counts = []
+    dists = []
+    for i, j, d in grid.self_pairs(cutoff, QUERY_CHUNK):
+        res_i, res_j = res[i], res[j]
+        between = res_i != res_j
+        res_i, res_j = res_i[between], res_j[between]
+        chunk_keys, chunk_counts, chunk_dists = _reduce(np.minimum(res_i, res_j) * n + np.maximum(res_i, res_j),
+                                                        np.ones(len(res_i), dtype=np.int64), d[between])
+        keys.append(chunk_keys)
+        counts.append(chunk_counts)
+        dists.append(chunk_dists)
+
+    keys, counts, dists = _reduce(np.concatenate(keys), np.concatenate(counts), np.concatenate(dists))
+    return keys // n, keys % n, counts, dists
+
+
+def _reduce(keys, counts, dists):
+    # Combine the entries with the same key, summing the counts and taking the least distance
+    if not len(keys):
+        return keys, counts, dists
+    order = np.argsort(keys, kind='mergesort')
+    keys, counts, dists = keys[order], counts[order], dists[order]
+    starts = np.nonzero(np.r_[True, keys[1:] != keys[:-1]])[0]
+    return keys[starts], np.add.reduceat(counts, starts), np.minimum.reduceat(dists, starts)
+
+
+def chain_interfaces(residues, pairs):
+    # For each pair of chains in contact, (chain 1, chain 2) in file order, the residues of each chain at the interface
+    first, second = pairs[:2]
+    between = residues.chain[first] != residues.chain[second]
+    interfaces = {}
+    for a, b in zip(first[between].tolist(), second[between].tolist()):
+        chain_a, chain_b = residues.chain[a], residues.chain[b]
+        key = (chain_a, chain_b) if chain_a < chain_b else (chain_b, chain_a)
+        if chain_a > chain_b:
+            a, b = b, a
+        sides = interfaces.setdefault(key, (set(), set()))
+        sides[0].add(a)
+        sides[1].add(b)
+    return dict((key, (sorted(one), sorted(two))) for key, (one, two) in interfaces.items())
+
+
+def write_interfaces(of, residues, interfaces):
+    for (chain_1, chain_2), sides in sorted(interfaces.items()):
+        for chain, side in zip((chain_1, chain_2), sides):
+            of.write('%s-%s %s: %s\n' % (chain_1, chain_2, chain, ' '.join(residues.resid[side].tolist())))
+
+
+def write_matrix(filename, residues, pairs):
+    first, second, counts, dists = pairs
+    if filename.endswith('.npz'):
+        np.savez(filename, chain=residues.chain, resid=residues.resid, resname=residues.resname, residue_1=first,
+                 residue_2=second, contacts=counts, distance=dists)
+        return
+
+    with CompressedFiles.open_file(filename, 'w') as of:
+        of.write('Chain1,Residue1,Resname1,Chain2,Residue2,Resname2,Contacts,Distance\n')
+        rows = zip(residues.chain[first].tolist(), residues.resid[first].tolist(), residues.resname[first].tolist(),
+                   residues.chain[second].tolist(), residues.resid[second].tolist(), residues.resname[second].tolist(),
+                   counts.tolist(), dists.tolist())
+        for row in rows:
+            of.write('%s,%s,%s,%s,%s,%s,%d,%.2f\n' % row)
+
+
+def write_control(filename, residues, interfaces, column_order, startnum):
+    # A control file in the format written by CreateInteractionControl. Residue ids take the form used in the decomp
+    # table written by MMPBSA.py, with residues numbered in sequence through the file from startnum, as tleap does.
+    at_interface = set()
+    for sides in interfaces.values():
+        for side in sides:
+            at_interface.update(side)
+
+    chains = []
+    for chain in residues.chain.tolist():
+        if chain not in chains:
+            chains.append(chain)
+    if column_order:
+        column_order = column_order.replace(' ', '')
+        missing = [chain for chain in chains if chain not in column_order]
+        if missing:
+            print 'Error: chain %s is not given a column.' % missing[0]
+            quit()
+    else:
+        column_order = ''.join(chains)
+
+    out_lines = []
+    for i in sorted(at_interface):
+        column = str(column_order.index(residues.chain[i]) + 1)
+        res_id = '%s %3d' % (residues.resname[i][:3], startnum + i)
+        out_lines.append(column + "," + res_id + "," + residues.resid[i] + "," + residues.chain[i] + ",Hydro")
+
+    out_lines = sorted(out_lines)
+
+    with CompressedFiles.open_file(filename, 'w') as out:
+        out.writelines("Col,Id,Legend,Chain,Fill" + '\n')
+        for line in out_lines:
+            out.writelines(line + '\n')
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -20,52 +20,278 @@ __author__ = 'William Lees'
 __docformat__ = "restructuredtext en"
 
 import sys
+import os
 import argparse
+import itertools
+import shutil
+import CompressedFiles
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+ResidueIndex = LazyModule('ResidueIndex')
+CifArrays = LazyModule('CifArrays')
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Change the name of residues as specified in a control file')
-    parser.add_argument('infile', help='input file (PDB format)')
-    parser.add_argument('outfile', help='output file (PDB format)')
+    parser.add_argument('infile', nargs='+', help='input file (PDB or mmCIF format). With -b, one or more input files, '
+                                                  'wildcard patterns or directories')
+    parser.add_argument('outfile', help='output file (in the format of the input file). With -b, the directory to write the output files to')
     parser.add_argument('ctrlfile', help='control file')
+    parser.add_argument('-b', '--batch', help='convert a batch of input files with the same control file, writing '
+                                              'each to a file of the same name in the outfile directory',
+                        action='store_true')
+    parser.add_argument('-i', '--index', help='use a residue index alongside the input file (building it if necessary) '
+                                              'to rewrite only the residues that change', action='store_true')
+    parser.add_argument('-m', '--mmap', help='copy the file in bulk and patch the residue names in a memory map of the '
+                                             'copy. If outfile is the same as infile, the file is changed in place',
+                        action='store_true')
+    parser.add_argument('-p', '--processes', help='number of worker processes used to convert the models of a '
+                                                  'multi-model (MODEL/ENDMDL) file, or the files of a batch, in '
+                                                  'parallel', type=int, default=1)
     args = parser.parse_args()
-    
+
+    if len(args.infile) > 1 and not args.batch:
+        parser.error('only one input file may be given unless -b is specified')
+
+    changes = read_control(args.ctrlfile)
+    lookup = control_lookup(changes)
+
+    if args.batch:
+        convert_batch(args.infile, args.outfile, changes, lookup, args.index, args.processes, args.mmap)
+        return
+
+    changed = set()
+    if CompressedFiles.is_cif(args.infile[0]):
+        messages = convert_cif(args.infile[0], args.outfile, lookup, changed)
+    elif args.mmap and PdbArrays.patchable(args.infile[0], args.outfile):
+        messages = convert_mapped(args.infile[0], args.outfile, lookup, changed)
+    elif args.index and ResidueIndex.usable(args.infile[0], args.outfile):
+        messages = convert_indexed(args.infile[0], args.outfile, lookup, changed)
+    else:
+        messages = convert(args.infile[0], args.outfile, lookup, changed, args.processes)
+
+    for message in messages + not_found(changes, changed):
+        print message
+
+
+def read_control(ctrlfile):
     changes = []
-    changed = []
-    
-    with open(args.ctrlfile, "r") as cf:
+    with CompressedFiles.open_file(ctrlfile, "r") as cf:
         for line in cf:
             row = line.split()
             if len(row) != 3:
                 print 'Lines in the control file must contain three items, separated by spaces'
                 quit()
-            if len(row[1]) != 1:
-                print 'Chain identifiers in the control file must consist of a single character'
-                quit()
             if len(row[2]) != 3 and len(row[2]) != 4:
                 print 'Residue identifiers in the control file must be three or four characters long'
                 quit()
-            changes.append(row)
-    
-    reported = ''        
-    with open(args.infile, "r") as f, open(args.outfile, "w") as of:
-        for line in f:
-            if len(line) > 26 and line[:6] == 'ATOM  ': 
-                resnum = line[22:27].strip()
-                resname = line[17:20]
-                chain = line[21]
-                for row in changes:
-                    if row[0] == resnum and row[1] == chain:
-                        line = line.replace(resname, row[2])
-                        if reported != resnum + chain:
-                            print '%s %s %s -> %s' % (resnum, chain, resname, row[2])
-                            reported = resnum + chain
-                            changed.append(row)
-                        break
-            of.write(line)
+            changes.append(tuple(row))
+    return changes
+
 
+def control_lookup(changes):
+    # Map (residue number, chain) to the control file row that applies to it. If a residue is listed more than once,
+    # the first entry is used.
+    lookup = {}
     for row in changes:
-        if row not in changed:
-            print 'Warning: residue %s %s not found in PDB file.' % (row[0], row[1])
+        lookup.setdefault((row[0], row[1]), row)
+    return lookup
+
+
+def not_found(changes, changed):
+    return ['Warning: residue %s %s not found in PDB file.' % (row[0], row[1]) for row in changes if row not in changed]
+
+
+def convert_batch(patterns, outdir, changes, lookup, index=False, processes=1, mmap=False):
+    # Convert each input file into outdir. The files are spread over a pool of processes if requested; each worker
+    # returns its messages, which are printed here, file by file, in the order in which the files were given.
+
+    infiles = PdbArrays.expand_files(patterns, ('.pdb', '.cif'))
+    outfiles = PdbArrays.output_files(infiles, outdir)
+
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    results = PdbArrays.map_models(convert_file, zip(infiles, outfiles), (changes, lookup, index, mmap), processes)
+    for infile, messages in zip(infiles, results):
+        print '%s:' % infile
+        for message in messages:
+            print message
+
+
+def convert_file(files, changes, lookup, index=False, mmap=False):
+    # Convert one file of a batch, given as (input file, output file), returning the messages to report
+    infile, outfile = files
+    changed = set()
+    if CompressedFiles.is_cif(infile):
+        messages = convert_cif(infile, outfile, lookup, changed)
+    elif mmap and PdbArrays.patchable(infile, outfile):
+        messages = convert_mapped(infile, outfile, lookup, changed)
+    elif index and ResidueIndex.usable(infile, outfile):
+        messages = convert_indexed(infile, outfile, lookup, changed)
+    else:
+        messages = convert(infile, outfile, lookup, changed)
+    return messages + not_found(changes, changed)
+
+
+def convert(infile, outfile, lookup, changed, processes=1):
+    # Convert infile, adding the control file rows that are applied to changed. Returns a message describing each
+    # renamed residue.
+
+    with CompressedFiles.open_file(infile, "r") as f:
+        data = f.read()
+
+    header, models, trailer = PdbArrays.split_models(data)
+
+    if not models:
+        s = PdbArrays.parse_pdb(data)
+        messages = rename(s, lookup, changed)
+        with CompressedFiles.open_file(outfile, "w") as of:
+            s.write(of)
+        return messages
+
+    # Convert each model separately, reporting each change once
+
+    messages = []
+    reported = set()
+    with CompressedFiles.open_file(outfile, "w") as of:
+        of.write(header)
+        for text, model_messages, model_changed in PdbArrays.map_models(convert_model, models, (lookup,), processes):
+            for message in model_messages:
+                if message not in reported:
+                    messages.append(message)
+                    reported.add(message)
+            changed.update(model_changed)
+            of.write(text)
+        of.write(trailer)
+    return messages
+
+
+def convert_model(text, lookup):
+    s = PdbArrays.PdbStructure(text)
+    changed = set()
+    messages = rename(s, lookup, changed)
+    return s.text(), messages, changed
+
+
+def rename(s, lookup, changed):
+    # Rename the residues in s listed in lookup (see control_lookup), adding the rows that are applied to changed.
+    # Returns a message describing each renamed residue, in file order.
+
+    rec = s.records
+    candidates = np.nonzero((s.lengths >= 26) & s.is_record('ATOM  '))[0]
+    renamed, new_names, messages = new_residue_names(rec['chain'], rec['resid'], rec['resname'], candidates, lookup,
+                                                     changed)
+    rec['resname'][renamed] = new_names[renamed]
+    return messages
+
+
+def new_residue_names(chains, resids, resnames, candidates, lookup, changed):
+    # The residue names of the records at the candidate positions that are listed in lookup. Returns a mask of the
+    # records to rename, their new names and the messages describing each renamed residue.
+
+    resnums = np.char.strip(resids)
+    new_names = resnames.copy()
+    renamed = np.zeros(len(resnames), dtype=bool)
+
+    # Look up each distinct chain and residue number once. Chain ids may have more than one character in mmCIF files.
+    labels, inverse = np.unique(np.char.add(np.char.add(chains[candidates], '\t'), resnums[candidates]),
+                                return_inverse=True)
+    rows = [lookup.get(tuple(label.split('\t')[::-1])) for label in labels.tolist()]
+    changed.update(row for row in rows if row)
+
+    hit = np.array([row is not None for row in rows], dtype=bool)[inverse]
+    names = np.array([row[2] if row else '' for row in rows], dtype='S4')[inverse]
+    renamed[candidates[hit]] = True
+    new_names[candidates[hit]] = names[hit]
+
+    first = np.nonzero(renamed & np.r_[True, (resnums[1:] != resnums[:-1]) | (chains[1:] != chains[:-1])
+                                      | ~renamed[:-1]])[0]
+    messages = ['%s %s %s -> %s' % (resnums[i], chains[i], resnames[i][:3], new_names[i].strip()) for i in first]
+    return renamed, new_names, messages
+
+
+def convert_mapped(infile, outfile, lookup, changed):
+    # Copy the file in bulk, then patch the residue names of the ATOM records that change in a memory map of the copy.
+    # Each renamed residue is reported once, even if it occurs in several models.
+
+    buf = PdbArrays.map_for_patching(infile, outfile)
+    if buf is None:
+        return []
+
+    offsets = PdbArrays.record_offsets(buf, 'ATOM  ', 26)
+    resnames = PdbArrays.gather_column(buf, offsets, 17, 4)
+    renamed, new_names, messages = new_residue_names(PdbArrays.gather_column(buf, offsets, 21, 1),
+                                                     PdbArrays.gather_column(buf, offsets, 22, 5),
+                                                     resnames, np.arange(len(offsets)), lookup, changed)
+    PdbArrays.patch_column(buf, offsets[renamed], 17, 4, new_names[renamed])
+    buf.flush()
+
+    reported = []
+    for message in messages:
+        if message not in reported:
+            reported.append(message)
+    return reported
+
+
+def convert_cif(infile, outfile, lookup, changed):
+    # As convert, for an mmCIF file, which is streamed a block of rows at a time. Residue names are changed in both the
+    # author and label items. Each renamed residue is reported once.
+
+    messages = []
+    with CifArrays.CifReader(infile) as r, CompressedFiles.open_file(outfile, "w") as of:
+        of.write(r.header)
+        for block in r.blocks():
+            resnames = block.resnames()
+            if resnames.dtype.itemsize < 4:
+                resnames = resnames.astype('S4')
+            renamed, new_names, block_messages = new_residue_names(block.chains(), block.resids(), resnames,
+                                                                   np.nonzero(block.is_record('ATOM'))[0], lookup,
+                                                                   changed)
+            for name in block.resname_items:
+                block.set_values(name, new_names[renamed], renamed)
+            of.write(block.text())
+            for message in block_messages:
+                if message not in messages:
+                    messages.append(message)
+        of.write(r.trailer)
+    return messages
+
+
+def convert_indexed(infile, outfile, lookup, changed):
+    # Copy the file in bulk, then rewrite just the residue blocks that change. If outfile is the same as infile, the
+    # file is changed in place.
+    index = ResidueIndex.load_index(infile)
+    resnums = np.char.strip(index.resid)
+
+    block_changes = {}
+    for i, key in enumerate(itertools.izip(resnums.tolist(), index.chain.tolist())):
+        row = lookup.get(key)
+        if row:
+            block_changes[i] = row
+
+    messages = []
+    if not PdbArrays.same_file(infile, outfile):
+        shutil.copyfile(infile, outfile)
+
+    # Each block is read back from the copy before it is rewritten. Only the residue name columns change, so the blocks
+    # keep their lengths and offsets.
+    with open(outfile, "r+b") as of:
+        for i in sorted(block_changes):
+            row = block_changes[i]
+            lines = index.read_block(of, i).splitlines(True)
+            renamed = False
+            for k, line in enumerate(lines):
+                if line[:6] == 'ATOM  ' and len(line.rstrip('\r\n')) >= 26:
+                    lines[k] = line[:17] + row[2].ljust(4) + line[21:]
+                    renamed = True
+            if renamed:
+                messages.append('%s %s %s -> %s' % (row[0], row[1], index.resname[i][:3], row[2]))
+                changed.add(row)
+                of.seek(index.offset[i])
+                of.write(''.join(lines))
+    return messages
 
 if __name__ == "__main__":
     main(sys.argv)
@@ -20,6 +20,8 @@ import csv
 import re
 import sys
 
+import CompressedFiles
+
 __author__ = 'Martin Rosellen'
 __docformat__ = "restructuredtext en"
 
@@ -30,20 +32,21 @@ def main(argv):
     parser.add_argument('hbonds', help='hbonds_consol.csv')
     parser.add_argument('fdmmpbsa', help='FINAL_DECOMP_MMPBSA_table.csv')
     parser.add_argument('output', help='output file (CSV)')
-    parser.add_argument('-m', '--mapping', help='mapping file for residue numbers and chains')
+    parser.add_argument('-m', '--mapping', help='mapping file for residue numbers and chains (CSV), or numbering '
+                                                'index written by AmberNum (.npz)')
     parser.add_argument('-c', '--column_order', nargs='?', help='Assign chains to columns (e.g. \'-c CA\' -> C first, '
                                                                 'A second column)')
     args = parser.parse_args()
 
     entries = []
 
-    with open(args.hbonds, 'r') as fo:
+    with CompressedFiles.open_file(args.hbonds, 'r') as fo:
         for line in fo:
             entries.append(line[0:7])
             entries.append(line[8:15])
         entries = list(set(entries))
 
-    with open(args.fdmmpbsa, 'r') as fo:
+    with CompressedFiles.open_file(args.fdmmpbsa, 'r') as fo:
         head = fo.readline()
         head = head.strip()
         head = head.split(',')
@@ -55,9 +58,18 @@ def main(argv):
         entries = list(set(entries))
 
     out_lines = []
-    with open(args.mapping, 'r') as f:
-        mapping = csv.DictReader(f)
-        mapping = dict((row['from'], [row['to'], row['chain']]) for row in mapping)
+    if args.mapping.endswith('.npz'):
+        # numbering index written by AmberNum (imported here, as it requires NumPy)
+        import AmberNum
+        index = AmberNum.load_index(args.mapping)
+        mapping = {}
+        for serial in index.serial.tolist():
+            chain, resseq, icode, resname = index.residue(serial)
+            mapping[str(serial)] = [str(resseq) + icode.strip(), chain]
+    else:
+        with CompressedFiles.open_file(args.mapping, 'r') as f:
+            mapping = csv.DictReader(f)
+            mapping = dict((row['from'], [row['to'], row['chain']]) for row in mapping)
 
     if args.column_order:
         column_order = args.column_order.replace(' ', '')
@@ -74,7 +86,7 @@ def main(argv):
 
     out_lines = sorted(out_lines)
 
-    with open(args.output, 'w') as out:
+    with CompressedFiles.open_file(args.output, 'w') as out:
         out.writelines("Col,Id,Legend,Chain,Fill" + '\n')
         for line in out_lines:
             out.writelines(line + '\n')
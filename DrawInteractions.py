@@ -40,8 +40,12 @@ import csv
 import math
 import sys
 
-import cairo
-import matplotlib.colors as mc
+import CompressedFiles
+import WarningLog
+from ResidueCodes import res_codes
+
+# cairo and matplotlib.colors are slow to load, so are imported by main once the arguments have been read
+mc = None
 
 # Dimensions in pixels - can be altered at will, but the underlying software library does impose some limits on maximum sizes.
 
@@ -54,32 +58,6 @@ MARGIN = 100
 FONT_SIZE = 24
 DASH_SIZE = 10
 
-res_codes = {}
-res_codes['ALA'] = 'A'
-res_codes['ARG'] = 'R'
-res_codes['ASN'] = 'N'
-res_codes['ASP'] = 'D'
-res_codes['CYS'] = 'C'
-res_codes['CYX'] = 'C'
-res_codes['GLU'] = 'E'
-res_codes['GLN'] = 'Q'
-res_codes['GLY'] = 'G'
-res_codes['HIS'] = 'H'
-res_codes['HIE'] = 'H'
-res_codes['HID'] = 'H'
-res_codes['HIP'] = 'H'
-res_codes['ILE'] = 'I'
-res_codes['LEU'] = 'L'
-res_codes['LYS'] = 'K'
-res_codes['MET'] = 'M'
-res_codes['PHE'] = 'F'
-res_codes['PRO'] = 'P'
-res_codes['SER'] = 'S'
-res_codes['THR'] = 'T'
-res_codes['TRP'] = 'W'
-res_codes['TYR'] = 'Y'
-res_codes['VAL'] = 'V'
-
 res_singles = 'ARNDCEQGHILKMFPSTWYV'
 
 
@@ -97,7 +75,9 @@ def main(argv):
     parser.add_argument('-o', '--omit_none', help='omit residues with no significant interaction energy', action='store_true')
     parser.add_argument('-t', '--compare_thresh', help='threshold for comparison (default 0.5 kcal/mol)')
     parser.add_argument('-x', '--omit_same_col', help='do not show interactions between residues in the same column', action='store_true')
+    WarningLog.add_arguments(parser)
     args = parser.parse_args()
+    WarningLog.configure(args)
 
     compare_thresh = 0.5 if args.compare_thresh is None else float(args.compare_thresh)
 
@@ -105,6 +85,10 @@ def main(argv):
         print 'annotate_change option is only valid when comparing files.'
         quit()
 
+    global mc
+    import cairo
+    import matplotlib.colors as mc
+
     surface = cairo.PDFSurface(args.output, WIDTH, HEIGHT)
     ctx = cairo.Context(surface)
     ctx.set_font_size(FONT_SIZE)
@@ -204,6 +188,8 @@ def main(argv):
 
     write_summary_file(args.summary, col_ids, cols, energies, locations)
 
+    WarningLog.report()
+
 
 def remove_single_column(col_ids, cols, energies):
     res_with_energy = []
@@ -220,7 +206,7 @@ def remove_single_column(col_ids, cols, energies):
 
 
 def write_summary_file(summary, col_ids, cols, energies, locations):
-    with open(summary, 'wb') as fo:
+    with CompressedFiles.open_file(summary, 'wb') as fo:
         writer = csv.writer(fo, delimiter=',')
         writer.writerow(['Column', 'Chain', 'Residue', 'Total'])
         for col_id in col_ids:
@@ -268,7 +254,7 @@ def plot_interactions(col_ids, cols, ctx, energies, hbonds, surface, negatives,
 
 
 def read_hbond_file(hbond_file, energies, hbonds, thresh):
-    with open(hbond_file, 'r') as f:
+    with CompressedFiles.open_file(hbond_file, 'r') as f:
         reader = csv.reader(f)
         for row in reader:
             if int(row[2]) >= int(thresh):
@@ -278,7 +264,8 @@ def read_hbond_file(hbond_file, energies, hbonds, thresh):
                     key = row[0] + row[1]
 
                 if key not in energies:
-                    print 'Warning: hbond between %s and %s but no corresponding energy value.' % (row[0], row[1])
+                    WarningLog.warn('hbond without energy', 'hbond between %s and %s but no corresponding energy '
+                                                            'value.' % (row[0], row[1]))
                 else:
                     hbonds[key] = row[2]
 
@@ -287,7 +274,7 @@ def read_decomp_file(decomp, energies, res_with_energy, residue_ids, is_compare_
     warned = []
     subs = {}
     
-    with open(decomp, 'r') as f:
+    with CompressedFiles.open_file(decomp, 'r') as f:
         reader = csv.DictReader(f)
         for res in reader.fieldnames:
             if res != 'Res' and res not in residue_ids:
@@ -299,7 +286,8 @@ def read_decomp_file(decomp, energies, res_with_energy, residue_ids, is_compare_
                             if is_compare_file:
                                 subs[res] = residue_id
                             else:
-                                print 'Warning: control file id %s does not agree with decomp table id %s' % (residue_id, res)
+                                WarningLog.warn('control file id differs from decomp table id',
+                                                'control file id %s does not agree with decomp table id %s' % (residue_id, res))
 
 
         for row in reader:
@@ -321,13 +309,14 @@ def read_decomp_file(decomp, energies, res_with_energy, residue_ids, is_compare_
                     else:
                         for r in (res1, res2):
                             if r not in residue_ids and r not in warned:
-                                print 'Warning: %s has interaction energies but is not listed in the control file.' % r
+                                WarningLog.warn('residue not in control file',
+                                                '%s has interaction energies but is not listed in the control file.' % r)
                                 warned.append(r)
 
 
 def read_control_file(control, col_ids, cols, residue_ids):
     gapcount = 1  # used to make 'Gap' ids unique by adding a suffix
-    with open(control, 'r') as f:
+    with CompressedFiles.open_file(control, 'r') as f:
         reader = csv.DictReader(f)
         for row in reader:
             col_id = int(row['Col'])
@@ -447,16 +436,17 @@ def check_res(id, legend):
         return
     leg = decode_res(legend)
     if leg == 'X':
-        print 'Warning: invalid residue code in (%s, %s)' % (id, legend)
+        WarningLog.warn('invalid residue code', 'invalid residue code in (%s, %s)' % (id, legend))
         return
     
     loc = id.split()[0]
     if loc not in res_codes:
-        print 'Warning: invalid location code in (%s, %s)' % (id, legend)
+        WarningLog.warn('invalid location code', 'invalid location code in (%s, %s)' % (id, legend))
         return
     
     if res_codes[loc] != leg:
-        print 'Warning: three-letter and single-letter codes do not agree in (%s, %s)' % (id, legend)
+        WarningLog.warn('residue codes disagree',
+                        'three-letter and single-letter codes do not agree in (%s, %s)' % (id, legend))
 
 # Find the column containing a residue
 
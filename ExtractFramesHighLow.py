@@ -18,6 +18,7 @@
 import argparse
 import operator
 import sys
+import CompressedFiles
 
 
 def main(argv):
@@ -60,7 +61,7 @@ def main(argv):
     else:
         high_traj = 'high_energy_frames.nc'
 
-    with open(args.energies, 'r') as f:
+    with CompressedFiles.open_file(args.energies, 'r') as f:
         content = f.readlines()
     energies = [float(item) for item in content[1:]]
 
@@ -73,7 +74,7 @@ def main(argv):
     low = sorted(frames[:n_frames])
     high = sorted(frames[-n_frames:])
 
-    with open(summary, 'w') as s:
+    with CompressedFiles.open_file(summary, 'w') as s:
         s.write("High energy frames:\n")
         high_average = 0
         for key, val in high:
@@ -91,13 +92,13 @@ def main(argv):
     low_frames = [str(item[0]) for item in low]
     low_frames = ','.join(low_frames)
 
-    with open(low_out, 'w') as l:
+    with CompressedFiles.open_file(low_out, 'w') as l:
         l.write("trajout " + low_traj + " mdcrd onlyframes " + low_frames + "\ngo")
 
     high_frames = [str(item[0]) for item in high]
     high_frames = ','.join(high_frames)
 
-    with open(high_out, 'w') as l:
+    with CompressedFiles.open_file(high_out, 'w') as l:
         l.write("trajout " + high_traj + " mdcrd onlyframes " + high_frames + "\ngo")
 
 
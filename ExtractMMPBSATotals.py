@@ -16,7 +16,7 @@
 import sys
 import csv
 import argparse
-from MMPBSA_mods import API as MMPBSA_API
+import CompressedFiles
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Extract frame-by-frame MMPSA/MMGBSA Energy Totals')
@@ -29,11 +29,13 @@ def main(argv):
         print 'calc must be either "gb" or "pb"'
         quit()
     
+    from MMPBSA_mods import API as MMPBSA_API
+
     prefix = '_MMPBSA_' if args.prefix is None else args.prefix
     data=MMPBSA_API.load_mmpbsa_info(prefix + 'info')
     head = ['TOTAL']
     
-    with open(args.outfile, 'w') as csvfile:
+    with CompressedFiles.open_file(args.outfile, 'w') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=head)
         writer.writeheader()
         tot = 0
@@ -22,47 +22,492 @@ __author__ = 'Martin Rosellen'
 __docformat__ = "restructuredtext en"
 
 import sys
+import os
 import argparse
+import itertools
 import re
+import CompressedFiles
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+ResidueIndex = LazyModule('ResidueIndex')
+CifArrays = LazyModule('CifArrays')
+Neighbours = LazyModule('Neighbours')
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Extract residues from pdb')
-    parser.add_argument('infile', help='input file (PDB format)')
-    parser.add_argument('outfile', help='output file (PDB format)')
-    parser.add_argument('span', help='list of residues with chain identifier to extract (e.g.: "1 20 A 5 10 B ..."), if '
-                                     'there is no identifier use \'none\' (e.g.: "1 20 none")')
+    parser.add_argument('infile', help='input file (PDB or mmCIF format)')
+    parser.add_argument('outfile', help='output file (in the format of the input file)')
+    parser.add_argument('span', nargs='?', help='list of residues with chain identifier to extract (e.g.: "1 20 A 5 10 '
+                                                'B ..."), if there is no identifier use \'none\' (e.g.: "1 20 none"). '
+                                                'Residue numbers may include an insertion code (e.g.: "52A 60 A"). '
+                                                'Not given with -s or -r')
+    parser.add_argument('-i', '--index', help='use a residue index alongside the input file (building it if necessary) '
+                                              'to read only the selected residues', action='store_true')
+    parser.add_argument('-s', '--strip', help='instead of extracting a span, copy the file without solvent and ion '
+                                              'residues', action='store_true')
+    parser.add_argument('--strip_names', default=DEFAULT_STRIP, metavar='NAMES',
+                        help='with -s, the names of the residues to strip, comma separated (default %s)' % DEFAULT_STRIP)
+    parser.add_argument('-k', '--keep_within', type=float, metavar='DISTANCE',
+                        help='with -s, keep the residues that have an atom within this distance (in Angstrom) of the '
+                             'selection')
+    parser.add_argument('-n', '--near', metavar='SPAN',
+                        help='with -k, the residues (given as for span) to which the distance is measured (default: '
+                             'every residue that is not stripped)')
+    parser.add_argument('-r', '--radius', metavar='RADII',
+                        help='instead of extracting a span, copy the residues that have an atom within this distance '
+                             '(in Angstrom) of the reference residues. Several radii may be given, comma separated, '
+                             'in which case each is written to its own file, named by adding the radius to outfile '
+                             '(e.g. pocket_5.pdb)')
+    parser.add_argument('-a', '--around', metavar='SPAN',
+                        help='with -r, reference residues given as for span')
+    parser.add_argument('--around_chains', metavar='CHAINS',
+                        help='with -r, chains whose residues are reference residues, comma separated (\'none\' for no '
+                             'identifier)')
+    parser.add_argument('--around_names', metavar='NAMES',
+                        help='with -r, names of reference residues (e.g. a ligand), comma separated')
     args = parser.parse_args()
 
-    # print os.system("cd /d/as12/u/rm001/ && ls")
+    # The input is streamed while the output is written, so the output cannot replace it
+    if PdbArrays.same_file(args.infile, args.outfile):
+        print 'Error: outfile must not be the same as infile.'
+        quit()
+
+    if not args.strip and (args.keep_within is not None or args.near):
+        parser.error('-k and -n can only be given with -s')
+    if args.near and args.keep_within is None:
+        parser.error('-n requires -k')
+    if not args.radius and (args.around or args.around_chains or args.around_names):
+        parser.error('-a, --around_chains and --around_names can only be given with -r')
+
+    if args.radius:
+        if args.span or args.strip:
+            parser.error('a span or -s cannot be given with -r')
+        try:
+            radii = [float(r) for r in args.radius.split(',')]
+        except ValueError:
+            parser.error('radii must be numbers, separated by commas')
+        if min(radii) <= 0:
+            parser.error('radii must be greater than zero')
+        if not (args.around or args.around_chains or args.around_names):
+            parser.error('-r requires reference residues, given by -a, --around_chains or --around_names')
+        reference = Reference(parse_span(args.around) if args.around else None,
+                              args.around_chains.split(',') if args.around_chains else None,
+                              args.around_names.split(',') if args.around_names else None)
+        extract_within(args.infile, args.outfile, radii, reference)
+        return
+
+    if args.strip:
+        if args.span:
+            parser.error('a span cannot be given with -s')
+        near = parse_span(args.near) if args.near else None
+        strip(args.infile, args.outfile, args.strip_names.split(','), args.keep_within, near)
+        return
+    if not args.span:
+        parser.error('a span must be given unless -s or -r is specified')
+
+    span = parse_span(args.span)
+
+    if CompressedFiles.is_cif(args.infile):
+        extract_cif(args.infile, args.outfile, span)
+    elif args.index and ResidueIndex.usable(args.infile):
+        extract_indexed(args.infile, args.outfile, span)
+    else:
+        extract(args.infile, args.outfile, span)
 
 
-    span = args.span.split(' ')
+def parse_span(text):
+    span = text.split(' ')
     span = [" " if item == "none" else item for item in span]
 
     # create list of triplets
     it = iter(span)
-    span = zip(it, it, it)
-
-    extracted = ""
-
-    with open(args.infile, 'r') as f:
-        content = f.readlines()
-        for line in content:
-            if line[0:4] == 'ATOM':
-                # loop over the list of triplets
-                for res_1, res_2, chain in span:
-                    residues = range(int(res_1), int(res_2) + 1)
-                    if line[21] == chain:
-                        res_num = int(re.search(r'\d+', line[22:27]).group())
-                        if res_num in residues:
-                            extracted += line
+    return SpanIndex(zip(it, it, it))
+
+
+# Residue numbers in a span may carry an insertion code, e.g. "52A 60". A bound without an insertion code takes in
+# every insertion code of that residue number.
+
+_BOUND_RE = re.compile(r'^(-?\d+)([A-Za-z]?)$')
+
+
+def bound_key(bound, upper):
+    # Residue key (see PdbArrays.residue_keys) of a span bound
+    m = _BOUND_RE.match(bound)
+    if not m:
+        print 'Error: %s is not a valid residue number' % bound
+        quit()
+    if m.group(2):
+        return int(m.group(1)) * 1000 + ord(m.group(2))
+    return int(m.group(1)) * 1000 + (999 if upper else 0)
+
+
+class SpanIndex(object):
+    """The spans to extract, held for each chain as sorted, non-overlapping intervals of residue keys."""
+
+    def __init__(self, span):
+        intervals = {}
+        for res_1, res_2, chain in span:
+            intervals.setdefault(chain, []).append((bound_key(res_1, False), bound_key(res_2, True)))
+
+        self.chains = {}
+        for chain, ivs in intervals.items():
+            starts = []
+            ends = []
+            for lo, hi in sorted(ivs):
+                if starts and lo <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], hi)
+                else:
+                    starts.append(lo)
+                    ends.append(hi)
+            self.chains[chain] = (np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+    def contains(self, chains, keys):
+        # Mask of the residues (given by chain and residue key) that fall within a span
+        selected = np.zeros(len(keys), dtype=bool)
+        for chain, (starts, ends) in self.chains.items():
+            sel = np.nonzero(chains == chain)[0]
+            pos = np.searchsorted(starts, keys[sel], side='right') - 1
+            selected[sel] = (pos >= 0) & (keys[sel] <= ends[np.maximum(pos, 0)])
+        return selected
+
+
+STREAM_LINES = 1 << 16
+
+DEFAULT_STRIP = 'WAT,HOH,Na+,Cl-,K+,NA,CL,K'
+
+
+def extract(infile, outfile, span):
+    # Stream the file through in blocks of lines, writing the selected ATOM records of each block as it is read
+
+    with CompressedFiles.open_file(infile, 'r') as f, CompressedFiles.open_file(outfile, 'w') as o:
+        while True:
+            data = ''.join(itertools.islice(f, STREAM_LINES))
+            if not data:
+                break
+            s = PdbArrays.PdbStructure(data)
+
+            # query the spans once per residue
+            starts = s.res_starts
+            in_span = span.contains(s.records['chain'][starts], PdbArrays.residue_keys(s.records[starts]))
+            selected = in_span[s.residue_index()] & np.char.startswith(s.records['record'], 'ATOM')
+
+            keep = np.zeros(len(s.lines), dtype=bool)
+            keep[s.atom_lines[selected]] = True
+
             # retaining all TER records (even for parts that got removed) does not seem to be a problem for chimera,
             # cpptraj or leap
-            if line[0:3] == 'TER':
-                extracted += line
+            keep |= np.char.startswith(s.record_types, 'TER')
+
+            s.write(o, keep=keep)
+
+
+def extract_cif(infile, outfile, span):
+    # As extract, for an mmCIF file, which is streamed a block of rows at a time
+    with CifArrays.CifReader(infile) as r, CompressedFiles.open_file(outfile, 'w') as o:
+        o.write(r.header)
+        for block in r.blocks():
+            keep = span.contains(block.chains(), block.residue_keys()) & block.is_record('ATOM')
+            o.write(block.select(keep).text())
+        o.write(r.trailer)
+
+
+def extract_indexed(infile, outfile, span):
+    index = ResidueIndex.load_index(infile)
+    selected = span.contains(index.chain, index.keys())
+    # Selected residue blocks and all TER records, in file order
+    ter = index.boundary_record == 'TER'
+    offsets = np.r_[index.offset[selected], index.boundary_offset[ter]]
+    lengths = np.r_[index.length[selected], index.boundary_length[ter]]
+    is_block = np.r_[np.ones(np.count_nonzero(selected), dtype=bool), np.zeros(np.count_nonzero(ter), dtype=bool)]
+
+    with open(infile, 'rb') as f, CompressedFiles.open_file(outfile, 'wb') as o:
+        for i in np.argsort(offsets, kind='mergesort'):
+            f.seek(offsets[i])
+            text = f.read(lengths[i])
+            if is_block[i]:
+                text = ''.join(line for line in text.splitlines(True) if line[0:4] == 'ATOM')
+            o.write(text)
+
+# Stripping and selection by distance work on the bytes of the file: the columns they need are gathered from every atom
+# record into arrays and compared in a few vectorized operations, and the lines that remain are copied out in bulk.
+
+class AtomLines(object):
+    """The lines of the text of a PDB file, with the columns of its ATOM, HETATM and ANISOU records read as arrays."""
+
+    def __init__(self, data):
+        self.buf = np.frombuffer(data, dtype=np.uint8)
+        self.starts, ends = PdbArrays.line_bounds(self.buf)
+        self.records = PdbArrays.gather_column(self.buf, self.starts, 0, 6, ends)
+        self.atoms = np.nonzero(np.in1d(self.records, ['ATOM  ', 'HETATM', 'ANISOU']))[0]
+        self.atom_starts, self.atom_ends = self.starts[self.atoms], ends[self.atoms]
+
+    def column(self, start, length):
+        # The given columns of each atom record
+        return PdbArrays.gather_column(self.buf, self.atom_starts, start, length, self.atom_ends)
+
+    def resnames(self):
+        return self.column(17, 4)
+
+    def chains(self):
+        return self.column(21, 1)
+
+    def residue_keys(self):
+        # See PdbArrays.residue_keys
+        resids = self.column(22, 5)
+        return PdbArrays.column_ints(resids.astype('S4')) * 1000 + resids.view(np.uint8).reshape(-1, 5)[:, 4]
+
+    def residues(self):
+        # The index of the residue of each atom. Residues are runs of atoms with the same name, chain and number.
+        labels = self.column(17, 10)
+        if not len(labels):
+            return np.zeros(0, dtype=np.int64)
+        return np.cumsum(np.r_[True, labels[1:] != labels[:-1]]) - 1
+
+    def with_coords(self):
+        # The indices of the atom records that hold coordinates, that is, all but the ANISOU records
+        return np.nonzero(self.records[self.atoms] != 'ANISOU')[0]
+
+    def xyz(self, which):
+        # The coordinates of the atoms with the given indices
+        xyz = PdbArrays.gather_column(self.buf, self.atom_starts[which], 30, 24, self.atom_ends[which])
+        xyz = xyz.view('S8').reshape(-1, 3)
+        return np.column_stack([PdbArrays.column_floats(xyz[:, k]) for k in range(3)])
+
+    def text(self, dropped, last_dropped=False):
+        # The text without the atom records marked in dropped, and without any TER record that follows a dropped atom.
+        # Other records are kept. Returns the text and whether its last atom was dropped (last_dropped says whether
+        # the last atom before the text was).
+        drop = np.zeros(len(self.starts), dtype=bool)
+        drop[self.atoms[dropped]] = True
+
+        # A TER record goes with the atom before it
+        ters = np.nonzero(self.records == 'TER   ')[0]
+        before = np.searchsorted(self.atoms, ters) - 1
+        drop[ters] = np.where(before >= 0, drop[self.atoms[np.maximum(before, 0)]], last_dropped)
+        if len(self.atoms):
+            last_dropped = drop[self.atoms[-1]]
+
+        lengths = np.diff(np.r_[self.starts, len(self.buf)])
+        return self.buf[np.repeat(~drop, lengths)].tostring(), last_dropped
+
+
+def strip_names(names):
+    # The forms each residue name may take in columns 18-21: left-justified, or right-justified in columns 18-20
+    forms = set()
+    for name in names:
+        forms.add(name.ljust(4))
+        forms.add(name.rjust(3).ljust(4))
+    return np.array(sorted(forms), dtype='S4')
+
+
+def strip(infile, outfile, names, keep_within=None, near=None):
+    names = strip_names(names)
+
+    if CompressedFiles.is_cif(infile):
+        if keep_within is not None:
+            print 'Warning: -k is not supported for mmCIF files. All of the named residues will be stripped.'
+        strip_cif(infile, outfile, names)
+        return
+
+    with CompressedFiles.open_file(infile, 'r') as f, CompressedFiles.open_file(outfile, 'w') as o:
+        if keep_within is None:
+            # Each line is kept or dropped on its own, so the file can be streamed in blocks
+            last_dropped = False
+            while True:
+                data = ''.join(itertools.islice(f, STREAM_LINES))
+                if not data:
+                    break
+                text, last_dropped = strip_text(data, names, last_dropped=last_dropped)
+                o.write(text)
+            return
+
+        # Distances are measured within each model
+        data = f.read()
+        header, models, trailer = PdbArrays.split_models(data)
+        if not models:
+            o.write(strip_text(data, names, keep_within, near)[0])
+            return
+        o.write(header)
+        for model in models:
+            o.write(strip_text(model, names, keep_within, near)[0])
+        o.write(trailer)
+
+
+def strip_text(data, names, keep_within=None, near=None, last_dropped=False):
+    # Remove the ATOM, HETATM and ANISOU records of the residues with the given names from the text of a PDB file,
+    # together with any TER record that follows a removed atom (last_dropped says whether the last atom before the text
+    # was removed). If keep_within is given, residues that have an atom within that distance of the selection (the
+    # residues in the spans of near, or else every residue that is not stripped) are kept. Returns the text and whether
+    # its last atom was removed.
+
+    lines = AtomLines(data)
+    stripped = np.in1d(lines.resnames(), names)
+    if keep_within is not None and stripped.any():
+        stripped &= ~near_residues(lines, stripped, keep_within, near)
+    return lines.text(stripped, last_dropped)
+
+
+def near_residues(lines, stripped, keep_within, near):
+    # Mask of the stripped atoms in residues that have an atom within keep_within of the selection
+    selected = ~stripped
+    if near is not None:
+        selected &= near.contains(lines.chains(), lines.residue_keys())
+    residue = lines.residues()
+    has_coords = lines.with_coords()
+    within, = residues_within(lines.xyz(has_coords), residue[has_coords], residue[-1] + 1, selected[has_coords],
+                              [keep_within], stripped[has_coords])
+    return stripped & within[residue]
+
+
+def strip_cif(infile, outfile, names):
+    # As strip, for an mmCIF file
+    names = np.unique(np.char.strip(names))
+    with CifArrays.CifReader(infile) as r, CompressedFiles.open_file(outfile, 'w') as o:
+        o.write(r.header)
+        for block in r.blocks():
+            o.write(block.select(~np.in1d(block.resnames(), names)).text())
+        o.write(r.trailer)
+
+
+# Selection by distance: residues are kept if any of their atoms lies within a radius of the reference atoms. The
+# reference atoms are binned into a cell list, and every atom of the structure is searched against it, so that the cost
+# grows with the number of atoms rather than with the number of pairs. The search is made once, at the largest radius,
+# and the shortest distance from each residue to the reference serves for every radius.
+
+class Reference(object):
+    """The residues to which distances are measured: those in a span, those in whole chains, and those with given names."""
+
+    def __init__(self, span=None, chains=None, names=None):
+        self.span = span
+        self.chains = [' ' if chain == 'none' else chain for chain in chains] if chains else []
+        # Names as written in a PDB file (see strip_names) and as read from an mmCIF file
+        self.names = np.concatenate((strip_names(names), np.array(names, dtype='S4'))) if names else None
+
+    def contains(self, chains, keys, resnames):
+        # Mask of the atoms (given by chain, residue key and residue name) in the reference
+        selected = self.span.contains(chains, keys) if self.span else np.zeros(len(keys), dtype=bool)
+        if self.chains:
+            selected |= np.in1d(chains, self.chains)
+        if self.names is not None:
+            selected |= np.in1d(resnames, self.names)
+        return selected
+
+
+def residues_within(xyz, residue, nres, reference, radii, candidates=None):
+    # For each radius, a mask over the nres residues selecting those with an atom within the radius of a reference
+    # atom. xyz holds the coordinates of the atoms, residue the index of the residue of each atom, and reference is a
+    # mask over the atoms. If candidates (a mask over the atoms) is given, only those atoms are searched.
+    shortest = np.empty(nres)
+    shortest.fill(np.inf)
+    radius = max(radii)
+    if reference.any():
+        grid = Neighbours.CellList(xyz[reference], radius)
+
+        # Only the atoms in the box around the reference need be searched
+        lo = grid.xyz.min(axis=0) - radius
+        hi = grid.xyz.max(axis=0) + radius
+        in_box = ((xyz >= lo) & (xyz <= hi)).all(axis=1)
+        query = np.nonzero(in_box if candidates is None else in_box & candidates)[0]
+
+        for start in range(0, len(query), STREAM_LINES):
+            i, j, d = grid.pairs(xyz[query[start:start + STREAM_LINES]], radius)
+            if not len(i):
+                continue
+            res = residue[query[i + start]]
+            order = np.argsort(res, kind='mergesort')
+            res, d = res[order], d[order]
+            first = np.nonzero(np.r_[True, res[1:] != res[:-1]])[0]
+            res = res[first]
+            shortest[res] = np.minimum(shortest[res], np.minimum.reduceat(d, first))
+    return [shortest <= r for r in radii]
+
+
+def radius_files(outfile, radii):
+    # The output file for each radius: outfile itself if there is one radius, otherwise outfile with the radius added
+    # to its name (pocket.pdb -> pocket_5.pdb, pocket_8.pdb, ...)
+    if len(radii) == 1:
+        return [outfile]
+    stem, ext = os.path.splitext(CompressedFiles.strip_suffix(outfile))
+    compression = outfile[len(CompressedFiles.strip_suffix(outfile)):]
+    return ['%s_%g%s%s' % (stem, r, ext, compression) for r in radii]
+
+
+def extract_within(infile, outfile, radii, reference):
+    # Write the residues within each radius of the reference to its own file, in one pass over the input. Distances are
+    # measured within each model.
+    if CompressedFiles.is_cif(infile):
+        extract_within_cif(infile, outfile, radii, reference)
+        return
+
+    with CompressedFiles.open_file(infile, 'r') as f:
+        data = f.read()
+    header, models, trailer = PdbArrays.split_models(data)
+    if not models:
+        header, models = '', [data]
+
+    outs = [CompressedFiles.open_file(name, 'w') for name in radius_files(outfile, radii)]
+    try:
+        for o in outs:
+            o.write(header)
+        for model in models:
+            for o, text in zip(outs, within_text(model, radii, reference)):
+                o.write(text)
+        for o in outs:
+            o.write(trailer)
+    finally:
+        for o in outs:
+            o.close()
+
+
+def within_text(data, radii, reference):
+    # The text of a PDB file cut down, for each radius, to the residues within that radius of the reference. The ATOM,
+    # HETATM and ANISOU records of the residues that are not selected are removed, together with any TER record that
+    # follows a removed atom.
+    lines = AtomLines(data)
+    residue = lines.residues()
+    in_reference = reference.contains(lines.chains(), lines.residue_keys(), lines.resnames())
+    has_coords = lines.with_coords()
+    nres = residue[-1] + 1 if len(residue) else 0
+    return [lines.text(~selected[residue])[0]
+            for selected in residues_within(lines.xyz(has_coords), residue[has_coords], nres, in_reference[has_coords],
+                                            radii)]
+
+
+def extract_within_cif(infile, outfile, radii, reference):
+    # As extract_within, for an mmCIF file. Models are told apart by the pdbx_PDB_model_num item, if it is present.
+    with CifArrays.CifReader(infile) as r:
+        blocks = list(r.blocks())
+    tokens = np.concatenate([block.tokens for block in blocks]) if blocks else np.zeros((0, len(r.names)), dtype='S1')
+    site = CifArrays.AtomSite(r.names, tokens)
+
+    chains = site.chains()
+    resids = site.resids()
+    resnames = site.resnames()
+    models = site.values(site.item('pdbx_PDB_model_num'))
+    xyz = np.column_stack([PdbArrays.column_floats(site.values('Cartn_' + axis)) for axis in 'xyz'])
+    in_reference = reference.contains(chains, site.residue_keys(), resnames)
+
+    change = (chains[1:] != chains[:-1]) | (resids[1:] != resids[:-1]) | (resnames[1:] != resnames[:-1])
+    residue = np.cumsum(np.r_[True, change]) - 1 if len(site) else np.zeros(0, dtype=np.int64)
+    model_starts = np.r_[0, np.nonzero(models[1:] != models[:-1])[0] + 1, len(site)]
+
+    keep = [np.zeros(len(site), dtype=bool) for _ in radii]
+    for start, end in zip(model_starts[:-1], model_starts[1:]):
+        if end == start:
+            continue
+        model_residue = residue[start:end] - residue[start]
+        masks = residues_within(xyz[start:end], model_residue, model_residue[-1] + 1, in_reference[start:end], radii)
+        for k, selected in zip(keep, masks):
+            k[start:end] = selected[model_residue]
+
+    for name, k in zip(radius_files(outfile, radii), keep):
+        with CompressedFiles.open_file(name, 'w') as o:
+            o.write(r.header)
+            o.write(site.select(k).text())
+            o.write(r.trailer)
 
-    with open(args.outfile, 'w') as o:
-        o.write(extracted)
 
 if __name__ == "__main__":
     main(sys.argv)
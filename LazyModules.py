@@ -0,0 +1,42 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Modules that are imported when they are first used, rather than when the tool that uses them is loaded.
+#
+# NumPy, and the modules built on it, take longer to load than a tool takes to print its help. The tools therefore
+# refer to them as, for example, np = LazyModule('numpy'), and the module is imported the first time one of its
+# attributes is used, which is after the arguments have been read. As the import is made on use, the same holds for a
+# tool's functions when they are called from another tool, or in a worker process, whether it was forked or started
+# afresh.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import importlib
+
+
+class LazyModule(object):
+    """A module that is imported when one of its attributes is first used."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # Called only for attributes not yet looked up. Each is kept, so that later uses do not come back here. This
+        # assumes that the module does not rebind the attributes it is asked for, which holds for the modules used.
+        value = getattr(importlib.import_module(self._name), attr)
+        setattr(self, attr, value)
+        return value
@@ -23,58 +23,217 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import argparse
+import CompressedFiles
+import WarningLog
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+Neighbours = LazyModule('Neighbours')
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Read SSBOND directives from a PDB, and generate corresponding CONECT records')
     parser.add_argument('infile', help='input file (PDB format)')
     parser.add_argument('outfile', help='output file (PDB format)')
+    parser.add_argument('-p', '--processes', help='number of worker processes used to process the models of a '
+                                                  'multi-model (MODEL/ENDMDL) file in parallel', type=int, default=1)
+    parser.add_argument('-g', '--geometric', help='find disulphide bonds from the distance between CYS/CYX SG atoms, '
+                                                  'and write SSBOND records for them in place of any in the input file',
+                        action='store_true')
+    parser.add_argument('-d', '--distance', help='largest SG-SG distance, in Angstroms, taken as a disulphide bond '
+                                                 'with -g (default %(default)s)', type=float, default=SG_CUTOFF)
+    parser.add_argument('-c', '--control', help='also write a ConvertRes control file renaming each bonded residue '
+                                                'to CYX')
+    WarningLog.add_arguments(parser)
     args = parser.parse_args()
+    WarningLog.configure(args)
 
     ssbonds = []
-    atoms = {}
-
+    new_ssbonds = None
+    cutoff = args.distance if args.geometric else None
+
+    with CompressedFiles.open_file(args.infile, "r") as f:
+        data = f.read()
+
+    header, models, trailer = PdbArrays.split_models(data)
+
+    if not models:
+        s = PdbArrays.parse_pdb(data)
+        model_atoms = [sg_atoms(s)]
+        if args.geometric:
+            new_ssbonds = find_ssbonds(s, cutoff)
+    else:
+        # SG atoms are found separately in each model. Disulphide bonds are taken from the first model.
+        results = PdbArrays.map_models(process_model, models, (cutoff,), args.processes)
+        model_atoms = [atoms for text, atoms, found, log in results]
+        for text, atoms, found, log in results:
+            WarningLog.log.merge(log)
+        if args.geometric:
+            new_ssbonds = results[0][2]
+            for i, (text, atoms, found, log) in enumerate(results[1:]):
+                if [bond[:2] for bond in found] != [bond[:2] for bond in new_ssbonds]:
+                    WarningLog.warn('disulphide bonds differ between models',
+                                    'disulphide bonds found in model %d differ from those in model 1.' % (i + 2))
+
+    if new_ssbonds is not None:
+        ssbonds = [bond[:2] for bond in new_ssbonds]
+        for r1, r2, distance in new_ssbonds:
+            print 'SSBOND(%s,%s) %.2f' % (r1, r2, distance)
+        new_ssbonds = ssbond_records(new_ssbonds)
+
+    with CompressedFiles.open_file(args.outfile, "w") as of:
+        if not models:
+            written = write_records(of, s.text_lines(), ssbonds, model_atoms, new_ssbonds)
+        else:
+            written = write_records(of, header.splitlines(), ssbonds, model_atoms, new_ssbonds)
+            for text, atoms, found, log in results:
+                of.write(text)
+            written = write_records(of, trailer.splitlines(), ssbonds, model_atoms, new_ssbonds) or written
+        end_conects(of, written, ssbonds, model_atoms)
+
+    if args.control:
+        write_control(args.control, ssbonds)
+
+    WarningLog.report()
+
+
+# Largest SG-SG distance taken as a disulphide bond. Bonds are typically 2.05 Angstroms long.
+
+SG_CUTOFF = 2.5
+
+# Records that follow the SSBOND records in a PDB file, before which they are written if the input has none
+
+_AFTER_SSBOND = ['LINK', 'CISPEP', 'SITE', 'CRYST1', 'ORIGX1', 'ORIGX2', 'ORIGX3', 'SCALE1', 'SCALE2', 'SCALE3',
+                 'MTRIX1', 'MTRIX2', 'MTRIX3', 'MODEL', 'ATOM', 'HETATM']
+
+
+def find_ssbonds(s, cutoff):
+    # Pairs of CYS/CYX SG atoms within cutoff of each other, found with a cell list. Returns (residue 1, residue 2,
+    # distance) for each, in the format used in SSBOND records. Where an SG is within range of more than one other,
+    # the closest pairing is kept.
+
+    rec = s.records
+    sg = np.nonzero(s.is_record('ATOM  ') & np.in1d(s.atoms['resname'], ['CYS', 'CYX']) & (s.atoms['name'] == 'SG'))[0]
+    i, j, d = Neighbours.close_pairs(s.atoms['xyz'][sg], cutoff)
+    labels = np.char.add(np.char.add(rec['chain'][sg], ' '), rec['resid'][sg]).tolist()
+
+    bonds = []
+    bonded = set()
+    for k in np.argsort(d, kind='mergesort'):
+        if i[k] in bonded or j[k] in bonded:
+            WarningLog.warn('SG within cutoff of several SGs', 'SG of %s is also within %.2f of SG of %s: ignored.' % (
+                labels[i[k]], d[k], labels[j[k]]))
+            continue
+        bonded.update((i[k], j[k]))
+        bonds.append((i[k], j[k], d[k]))
+
+    bonds.sort()
+    return [(labels[a], labels[b], dist) for a, b, dist in bonds]
+
+
+def ssbond_records(bonds):
+    return ['SSBOND %3d CYS %s   CYS %s%s  1555   1555 %5.2f' % (k + 1, r1, r2, ' ' * 23, distance)
+            for k, (r1, r2, distance) in enumerate(bonds)]
+
+
+def write_control(ctrlfile, ssbonds):
+    # A ConvertRes control file renaming each residue in ssbonds to CYX
+    written = set()
+    with CompressedFiles.open_file(ctrlfile, "w") as cf:
+        for bond in ssbonds:
+            for label in bond:
+                chain, resnum = label[0], label[2:].strip()
+                if (chain, resnum) not in written:
+                    cf.write("%s %s %s\n" % (resnum, chain, 'CYX'))
+                    written.add((chain, resnum))
+
+
+def sg_atoms(s):
+    # SG atoms, keyed by chain and residue in the format used in SSBOND records
+    rec = s.records
+    sg = s.is_record('ATOM  ') & (np.char.find(rec['name'], 'SG') >= 0)
+    return dict(zip(np.char.add(np.char.add(rec['chain'][sg], ' '), rec['resid'][sg]).tolist(),
+                    rec['serial'][sg].tolist()))
+
+
+def process_model(text, cutoff=None):
+    # The text of the model without CONECT records, its SG atoms, and, if cutoff is given, its disulphide bonds,
+    # together with the warnings given. These are collected so that those of models processed in parallel are merged.
+    s = PdbArrays.PdbStructure(text)
+    lines = [line.strip() for line in s.text_lines()]
+    saved = WarningLog.log
+    WarningLog.log = WarningLog.WarningLog(saved.examples, saved.verbose)
+    try:
+        found = find_ssbonds(s, cutoff) if cutoff else []
+        log = WarningLog.log
+    finally:
+        WarningLog.log = saved
+    return ''.join(line + '\n' for line in lines if line[0:6] != "CONECT"), sg_atoms(s), found, log
+
+
+def write_records(of, lines, ssbonds, model_atoms, new_ssbonds=None):
+    # Write lines, collecting SSBOND records, dropping CONECT records and writing new ones before END. Returns True
+    # if an END record was found. If new_ssbonds is given, SSBOND records in lines are replaced with it: it is
+    # written in place of the first of them, or before the records that follow them, and then emptied.
     written = False
-
-    with open(args.infile, "r") as f, open(args.outfile, "w") as of:
-        for line in f:
-            line = line.strip()
-            if line[0:6] == "SSBOND":
-                res1 = line[15:22]
-                res2 = line[29:36]
-                ssbonds.append((res1, res2))
-
-            elif line[0:6] == "ATOM  ":
-                res = line[21] + ' ' + line [22:27]
-                atom = line[12:16]
-                number = line[6:11]
-                if 'SG' in atom:
-                    atoms[res] = number
-                    
-            elif line[0:6] == "CONECT":
+    for line in lines:
+        line = line.strip()
+        if new_ssbonds is not None and (line[0:6] == "SSBOND" or line[0:6].strip() in _AFTER_SSBOND):
+            for record in new_ssbonds:
+                of.write(record + '\n')
+            del new_ssbonds[:]
+
+        if line[0:6] == "SSBOND":
+            if new_ssbonds is not None:
                 continue
-            
-            elif line[0:3] == "END":
-                if len(line) == 3 or line[3] == ' ':
-                    for r1,r2 in ssbonds:
-                        if r1 in atoms and r2 in atoms:
-                            of.write("CONECT%s%s\n" % (atoms[r1], atoms[r2]))
-                            of.write("CONECT%s%s\n" % (atoms[r2], atoms[r1]))
-                        else:
-                            print 'Warning: atoms corresponding to SSBOND(%s,%s) were not found.' % (r1, r2)
-                written = True
-            
-            of.write(line + '\n')
-
-        if not written:
-            print 'Warning: END record was not found. CONECTS will be written at the end of the file.'
-
-
-            for r1, r2 in ssbonds:
-                if r1 in atoms and r2 in atoms:
-                    of.write("CONECT%s%s\n" % (atoms[r1], atoms[r2]))
-                    of.write("CONECT%s%s\n" % (atoms[r2], atoms[r1]))
-                else:
-                    print 'Warning: atoms corresponding to SSBOND(%s,%s) were not found.' % (r1, r2)
+            res1 = line[15:22]
+            res2 = line[29:36]
+            ssbonds.append((res1, res2))
+
+        elif line[0:6] == "CONECT":
+            continue
+
+        elif line[0:3] == "END":
+            if len(line) == 3 or line[3] == ' ':
+                write_conects(of, ssbonds, model_atoms)
+            written = True
+
+        of.write(line + '\n')
+
+    if new_ssbonds:
+        for record in new_ssbonds:
+            of.write(record + '\n')
+        del new_ssbonds[:]
+    return written
+
+
+def end_conects(of, written, ssbonds, model_atoms):
+    # If no END record was written by write_records, write the CONECT records at the end of the file
+    if not written:
+        print 'Warning: END record was not found. CONECTS will be written at the end of the file.'
+        write_conects(of, ssbonds, model_atoms)
+
+
+def write_conects(of, ssbonds, model_atoms):
+    # Where models share atom numbering, the CONECT records for each model are the same, and are written once
+    for r1, r2 in ssbonds:
+        conects = []
+        missing = 0
+        for atoms in model_atoms:
+            if r1 in atoms and r2 in atoms:
+                for conect in ("CONECT%s%s\n" % (atoms[r1], atoms[r2]), "CONECT%s%s\n" % (atoms[r2], atoms[r1])):
+                    if conect not in conects:
+                        conects.append(conect)
+            else:
+                missing += 1
+        for conect in conects:
+            of.write(conect)
+        if missing == 1 and len(model_atoms) == 1:
+            WarningLog.warn('SSBOND atoms not found', 'atoms corresponding to SSBOND(%s,%s) were not found.' % (r1, r2))
+        elif missing:
+            WarningLog.warn('SSBOND atoms not found', 'atoms corresponding to SSBOND(%s,%s) were not found in %d of %d '
+                                                      'models.' % (r1, r2, missing, len(model_atoms)))
+
 
 if __name__ == "__main__":
     main(sys.argv)
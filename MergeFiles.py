@@ -19,6 +19,7 @@ __author__ = 'William Lees'
 __docformat__ = "restructuredtext en"
 
 import sys
+import CompressedFiles
 
 def main(argv):
     if len(argv) < 4:
@@ -30,14 +31,14 @@ def main(argv):
     
     for i in range(0, num_files):
       contents.append([])
-      with open(argv[i+1], "r") as f:
+      with CompressedFiles.open_file(argv[i+1], "r") as f:
           l = 0
           for line in f:
             if l > 0 or i == 0:  
               contents[i].append(line.rstrip('\n'))
             l += 1
     
-    with open(argv[len(argv)-1], "w") as f:
+    with CompressedFiles.open_file(argv[len(argv)-1], "w") as f:
         done = False
         j = 0
         while not done:
@@ -0,0 +1,112 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Neighbour search over atomic coordinates using a cell list.
+#
+# Space is divided into cubic cells no smaller than the cutoff, so that any two points within the cutoff of each other
+# lie in the same or adjacent cells. The points are sorted by cell, and each query point is compared only with the
+# points in the 27 cells around it, so that the search time grows linearly with the number of points rather than with
+# the number of pairs. When the points are searched against themselves, only the cell itself and the 13 cells that
+# follow it in the order of cells need be compared, as each pair of adjacent cells is then met once.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import numpy as np
+
+_OFFSETS = np.array([(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)], dtype=np.int64)
+_FORWARD_OFFSETS = _OFFSETS[13:]
+
+
+class CellList(object):
+    """Points (an n x 3 array of coordinates) binned into cubic cells of the given size."""
+
+    def __init__(self, xyz, cell):
+        self.xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+        self.cell = float(cell)
+        self.origin = self.xyz.min(axis=0) if len(self.xyz) else np.zeros(3)
+
+        # Cells are numbered from 1 in each dimension, leaving a margin so that neighbouring cells of a query point
+        # never wrap round into another row
+        cells = self._cells(self.xyz)
+        self.dims = cells.max(axis=0) + 2 if len(cells) else np.ones(3, dtype=np.int64)
+        self.keys = self._keys(cells)
+        self.order = np.argsort(self.keys, kind='mergesort')
+        self.sorted_keys = self.keys[self.order]
+
+    def _cells(self, xyz):
+        return np.floor((xyz - self.origin) / self.cell).astype(np.int64) + 1
+
+    def _keys(self, cells):
+        return (cells[:, 0] * (self.dims[1] + 1) + cells[:, 1]) * (self.dims[2] + 1) + cells[:, 2]
+
+    def candidates(self, points, offsets=_OFFSETS):
+        # Pairs (i, j) of query points i and points j in the same or adjacent cells (those at the given offsets)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        cells = self._cells(points)
+        qi = []
+        pj = []
+        for offset in offsets:
+            near = cells + offset
+            valid = np.all((near >= 0) & (near <= self.dims), axis=1)
+            keys = np.where(valid, self._keys(np.clip(near, 0, self.dims)), -1)
+            left = np.searchsorted(self.sorted_keys, keys, side='left')
+            right = np.searchsorted(self.sorted_keys, keys, side='right')
+            counts = np.where(valid, right - left, 0)
+            total = counts.sum()
+            if not total:
+                continue
+            i = np.repeat(np.arange(len(points)), counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            qi.append(i)
+            pj.append(self.order[np.repeat(left, counts) + within])
+        if not qi:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(qi), np.concatenate(pj)
+
+    def pairs(self, points, cutoff):
+        # Pairs (i, j) of query points i and points j no more than cutoff apart, with the distance between them.
+        # cutoff must not exceed the cell size.
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        i, j = self.candidates(points)
+        d = np.sqrt(((points[i] - self.xyz[j]) ** 2).sum(axis=1))
+        close = d <= cutoff
+        return i[close], j[close], d[close]
+
+    def self_pairs(self, cutoff, chunk=None):
+        # Generate the pairs (i, j) of the points no more than cutoff apart, with the distance between them. Each pair
+        # is given once, as (i, j) or (j, i). The points are searched in chunks of the given number of points, to
+        # bound the memory taken by the candidate pairs, and the pairs of each chunk are generated in turn.
+        # At least one chunk is searched, so that an empty set of points gives an empty set of pairs
+        n = max(len(self.xyz), 1)
+        chunk = chunk or n
+        for start in range(0, n, chunk):
+            i, j = self.candidates(self.xyz[start:start + chunk], _FORWARD_OFFSETS)
+            i += start
+            # Pairs within a cell are met both ways round
+            keep = (j > i) | (self.keys[i] != self.keys[j])
+            i, j = i[keep], j[keep]
+            d = np.sqrt(((self.xyz[i] - self.xyz[j]) ** 2).sum(axis=1))
+            close = d <= cutoff
+            yield i[close], j[close], d[close]
+
+
+def close_pairs(xyz, cutoff):
+    # Pairs (i, j), i < j, of points no more than cutoff apart, with the distance between them, ordered by i then j
+    i, j, d = next(CellList(xyz, cutoff).self_pairs(cutoff))
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    order = np.lexsort((j, i))
+    return i[order], j[order], d[order]
@@ -25,30 +25,149 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import argparse
+import CompressedFiles
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+CifArrays = LazyModule('CifArrays')
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Renumber residues and assign to the specified chain')
-    parser.add_argument('infile', help='input file (PDB format)')
-    parser.add_argument('outfile', help='output file (PDB format)')
+    parser.add_argument('infile', help='input file (PDB or mmCIF format)')
+    parser.add_argument('outfile', help='output file (in the format of the input file)')
     parser.add_argument('startnum', help='starting residue number')
-    parser.add_argument('chain', help='chain ID')
+    parser.add_argument('chain', help='chain ID (the first character is used, except in mmCIF files)')
+    parser.add_argument('-m', '--mmap', help='copy the file in bulk and patch the chain ids and residue numbers in a '
+                                             'memory map of the copy. If outfile is the same as infile, the file is '
+                                             'changed in place', action='store_true')
+    parser.add_argument('-p', '--processes', help='number of worker processes: the file is split into chunks at '
+                                                  'residue boundaries, which are numbered in parallel', type=int,
+                        default=1)
     args = parser.parse_args()
 
-    next_id = int(args.startnum) - 1
+    if CompressedFiles.is_cif(args.infile):
+        number_cif(args.infile, args.outfile, int(args.startnum), args.chain)
+        return
+
     chain_id = args.chain[:1]
-    old_resnum = -1
-        
-    with open(args.infile, "r") as f, open(args.outfile, "w") as of:
-        for line in f:
-            if line[0:4] == "ATOM":
-                resnum = line[22:27]        # include letter
-                if resnum != old_resnum:
-                    old_resnum = resnum
-                    next_id += 1
-                n = "%4d" % next_id    
-                line = line[:21] + chain_id + n + ' ' + line[27:]
-
-            of.write(line)
+
+    if args.mmap and PdbArrays.patchable(args.infile, args.outfile):
+        number_mapped(args.infile, args.outfile, int(args.startnum), chain_id)
+        return
+
+    if args.processes > 1:
+        number_parallel(args.infile, args.outfile, int(args.startnum), chain_id, args.processes)
+        return
+
+    s = PdbArrays.read_pdb(args.infile)
+    number(s, int(args.startnum), chain_id)
+
+    with CompressedFiles.open_file(args.outfile, "w") as of:
+        s.write(of)
+
+
+def number(s, startnum, chain_id):
+    # Number the residues of the ATOM records in s from startnum. Returns the number of residues.
+    sel = s.is_record('ATOM  ')
+    rec = s.select(sel)
+
+    resnums = rec['resid']        # include letter
+    new_res = np.r_[True, resnums[1:] != resnums[:-1]] if len(rec) else np.zeros(0, dtype=bool)
+    ids = startnum - 1 + np.cumsum(new_res)
+
+    rec['chain'] = chain_id
+    rec['resid'] = PdbArrays.format_column('%4d ', ids)
+    s.update(sel, rec)
+    return np.count_nonzero(new_res)
+
+
+def number_parallel(infile, outfile, startnum, chain_id, processes):
+    # Split the file into chunks that start at residue boundaries. The residues in each chunk are counted from a scan
+    # of the text, and a prefix sum of the counts gives the number at which each chunk starts, so that the chunks can
+    # then be numbered independently.
+
+    with CompressedFiles.open_file(infile, "r") as f:
+        data = f.read()
+
+    chunks = PdbArrays.residue_chunks(data, processes)
+    counts = residue_counts(data, chunks)
+    first_ids = startnum + np.r_[0, np.cumsum(counts)[:-1]]
+
+    jobs = [(data[start:end], first_id) for (start, end), first_id in zip(chunks, first_ids.tolist())]
+    results = PdbArrays.map_models(number_chunk, jobs, (chain_id,), processes)
+
+    if [count for text, count in results] != counts.tolist():
+        print 'Error: residues were not counted consistently between chunks. Try again without -p.'
+        quit()
+
+    with CompressedFiles.open_file(outfile, "w") as of:
+        for text, count in results:
+            of.write(text)
+
+
+def residue_counts(data, chunks):
+    # The number of residues starting in each chunk, found as number() would find them
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = PdbArrays.line_bounds(buf)
+    atom = PdbArrays.is_line_record(buf, starts, ends, 'ATOM  ')
+    starts, ends = starts[atom], ends[atom]
+    resnums = PdbArrays.gather_column(buf, starts, 22, 5, ends)
+    new_res = np.r_[True, resnums[1:] != resnums[:-1]] if len(starts) else np.zeros(0, dtype=bool)
+
+    # Every chunk starts with a new residue, so the residues in a chunk are those whose first atom lies in it
+    first = starts[new_res]
+    bounds = np.searchsorted(first, [start for start, end in chunks] + [chunks[-1][1]])
+    return np.diff(bounds)
+
+
+def number_chunk(job, chain_id):
+    text, first_id = job
+    s = PdbArrays.PdbStructure(text)
+    count = number(s, first_id, chain_id)
+    return s.text(), count
+
+
+def number_mapped(infile, outfile, startnum, chain_id):
+    # As above, patching the ATOM records in a memory-mapped copy of infile
+    buf = PdbArrays.map_for_patching(infile, outfile)
+    if buf is None:
+        return
+
+    offsets = PdbArrays.record_offsets(buf, 'ATOM  ', 27)
+    resnums = PdbArrays.gather_column(buf, offsets, 22, 5)
+    new_res = np.r_[True, resnums[1:] != resnums[:-1]] if len(offsets) else np.zeros(0, dtype=bool)
+    residue = np.cumsum(new_res) - 1
+
+    # Each residue number is formatted once
+    labels = PdbArrays.format_column('%4d ', startnum + np.arange(residue[-1] + 1 if len(residue) else 0))
+
+    PdbArrays.patch_column(buf, offsets, 21, 1, chain_id)
+    PdbArrays.patch_column(buf, offsets, 22, 5, labels[residue])
+    buf.flush()
+
+def number_cif(infile, outfile, startnum, chain_id):
+    # As number, for the author residue numbers and chain ids of an mmCIF file, which is streamed a block of rows at a
+    # time. Insertion codes are cleared, as the new numbers are distinct.
+    last_resid = None
+    next_id = startnum
+
+    with CifArrays.CifReader(infile) as r, CompressedFiles.open_file(outfile, "w") as of:
+        of.write(r.header)
+        for block in r.blocks():
+            sel = np.nonzero(block.is_record('ATOM'))[0]
+            resids = block.resids()[sel]
+            if len(resids):
+                new_res = np.r_[resids[0] != last_resid, resids[1:] != resids[:-1]]
+                ids = next_id - 1 + np.cumsum(new_res)
+                next_id = ids[-1] + 1
+                last_resid = resids[-1]
+
+                block.set_values(block.chain_item, chain_id, sel)
+                block.set_values(block.resseq_item, PdbArrays.format_column('%d', ids), sel)
+                block.set_values(CifArrays.ICODE_ITEM, '?', sel)
+            of.write(block.text())
+        of.write(r.trailer)
 
 if __name__ == "__main__":
     main(sys.argv)
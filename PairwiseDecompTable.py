@@ -21,6 +21,7 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import csv
+import CompressedFiles
 
 def main(argv):
     found_threshold = False
@@ -68,7 +69,7 @@ def main(argv):
     num_files = len(infiles)
     
     for file in infiles:
-        with open(file, "rb") as f:
+        with CompressedFiles.open_file(file, "rb") as f:
             reader = csv.reader(f)
             skip = True
             firstrow = True
@@ -121,7 +122,7 @@ def main(argv):
         for res in empty_res:
             residues.remove(res)
 
-    with open(outfile, "wb") as f:
+    with CompressedFiles.open_file(outfile, "wb") as f:
         fieldnames = ['Res']
         fieldnames.extend(residues)
         writer = csv.DictWriter(f, fieldnames=fieldnames)
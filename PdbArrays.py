@@ -0,0 +1,621 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Columnar parser for the ATOM/HETATM records of a PDB file, shared by the structure preparation tools.
+#
+# The file is read in one go and the ATOM/HETATM records are held as a fixed-width byte array, with a structured
+# view (records) that exposes each PDB v3.3 column range as a field. Tools select atoms with vectorized masks over
+# the parsed values (atoms) and patch the columns they need to change directly in records. All other lines are
+# carried through untouched when the structure is written out.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import glob
+import hashlib
+import itertools
+import multiprocessing
+import os
+import re
+import shutil
+import numpy as np
+import CompressedFiles
+
+# Column layout of an ATOM/HETATM record (0-based offsets). resname is given four columns as Amber and CHARMM
+# residue names may run into column 21. resid covers the residue sequence number and insertion code together, as
+# the tools have always compared them as a unit.
+
+_COLUMNS = [
+    ('record', 'S6', 0),
+    ('serial', 'S5', 6),
+    ('name', 'S4', 12),
+    ('altloc', 'S1', 16),
+    ('resname', 'S4', 17),
+    ('chain', 'S1', 21),
+    ('resid', 'S5', 22),
+    ('resseq', 'S4', 22),
+    ('icode', 'S1', 26),
+    ('x', 'S8', 30),
+    ('y', 'S8', 38),
+    ('z', 'S8', 46),
+    ('occupancy', 'S6', 54),
+    ('bfactor', 'S6', 60),
+    ('element', 'S2', 76),
+    ('charge', 'S2', 78),
+]
+
+PDB_LINE_WIDTH = 80
+
+# Parsed per-atom values
+
+ATOM_DTYPE = np.dtype([
+    ('serial', 'i8'),
+    ('name', 'S4'),
+    ('altloc', 'S1'),
+    ('resname', 'S4'),
+    ('chain', 'S1'),
+    ('resseq', 'i8'),
+    ('icode', 'S1'),
+    ('xyz', 'f8', (3,)),
+    ('occupancy', 'f8'),
+    ('bfactor', 'f8'),
+])
+
+# Records that break a chain or residue even if the identifiers either side of them are the same
+
+_BREAK_RECORDS = ['TER   ', 'TER', 'MODEL ', 'ENDMDL', 'END   ', 'END']
+
+_MODEL_RE = re.compile(r'^MODEL', re.M)
+_ENDMDL_RE = re.compile(r'^ENDMDL.*(\n|$)', re.M)
+
+
+def pdb_columns(itemsize=PDB_LINE_WIDTH):
+    return np.dtype({'names': [c[0] for c in _COLUMNS],
+                     'formats': [c[1] for c in _COLUMNS],
+                     'offsets': [c[2] for c in _COLUMNS],
+                     'itemsize': itemsize})
+
+
+def column_ints(col):
+    # Convert a fixed-width text column to integers. Blank fields are read as 0.
+    col = np.char.strip(col)
+    col = np.where(col == '', '0', col)
+    try:
+        return col.astype(np.int64)
+    except ValueError:
+        return np.array([int(v) if v.lstrip('-').isdigit() else 0 for v in col], dtype=np.int64)
+
+
+def column_floats(col):
+    # Convert a fixed-width text column to floats. Blank fields are read as 0, malformed fields as NaN.
+    col = np.char.strip(col)
+    col = np.where(col == '', '0', col)
+    try:
+        return col.astype(np.float64)
+    except ValueError:
+        return np.array([_to_float(v) for v in col], dtype=np.float64)
+
+
+def _to_float(v):
+    try:
+        return float(v)
+    except ValueError:
+        return np.nan
+
+
+def format_column(fmt, values):
+    return np.char.mod(fmt, values)
+
+
+# Hybrid-36 encoding of numbers too large for a fixed-width decimal field, as used for atom serial numbers beyond
+# 99,999 and residue numbers beyond 9,999. Numbers that fit are written in decimal. After that come upper-case base-36
+# numbers starting at A0000 (for a width of 5), then lower-case ones starting at a0000.
+
+_DIGITS_UPPER = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_DIGITS_LOWER = _DIGITS_UPPER.lower()
+
+_CODES_UPPER = np.frombuffer(_DIGITS_UPPER, dtype=np.uint8)
+_CODES_LOWER = np.frombuffer(_DIGITS_LOWER, dtype=np.uint8)
+
+# Value of each character as a base-36 digit, or -1
+_DIGIT_VALUES = -np.ones(256, dtype=np.int64)
+_DIGIT_VALUES[_CODES_UPPER] = np.arange(36)
+_DIGIT_VALUES[_CODES_LOWER] = np.arange(36)
+
+
+def hy36_max(width):
+    # The largest number that can be encoded in the given width
+    return 10**width + 2 * 26 * 36**(width - 1) - 1
+
+
+def hy36encode(width, value):
+    if -10**(width - 1) < value < 10**width:
+        return '%*d' % (width, value)
+    if value < 0 or value > hy36_max(width):
+        raise ValueError('%d is out of range for a hybrid-36 field of width %d' % (value, width))
+    value -= 10**width
+    digits = _DIGITS_UPPER
+    if value >= 26 * 36**(width - 1):
+        value -= 26 * 36**(width - 1)
+        digits = _DIGITS_LOWER
+    value += 10 * 36**(width - 1)
+    text = ''
+    while value:
+        value, d = divmod(value, 36)
+        text = digits[d] + text
+    return text
+
+
+def hy36decode(width, text):
+    # Blank or malformed fields are read as 0
+    text = text.strip()
+    if text[:1].isalpha():
+        try:
+            value = int(text, 36) - 10 * 36**(width - 1) + 10**width
+        except ValueError:
+            return 0
+        return value + 26 * 36**(width - 1) if text[0].islower() else value
+    return int(text) if text.lstrip('-').isdigit() else 0
+
+
+def format_hy36(width, values):
+    # Encode an array of numbers as hybrid-36 fields
+    values = np.asarray(values, dtype=np.int64)
+    text = format_column('%%%dd' % width, values).astype('S%d' % width)
+    large = np.nonzero(values >= 10**width)[0]
+    if len(large):
+        values = values[large]
+        if values.max() > hy36_max(width):
+            raise ValueError('%d is out of range for a hybrid-36 field of width %d' % (values.max(), width))
+
+        # As hy36encode, one digit at a time over the whole array
+        values = values - 10**width
+        lower = values >= 26 * 36**(width - 1)
+        values = np.where(lower, values - 26 * 36**(width - 1), values) + 10 * 36**(width - 1)
+        digits = np.zeros((len(values), width), dtype=np.uint8)
+        for k in range(width - 1, -1, -1):
+            digits[:, k] = np.where(lower, _CODES_LOWER[values % 36], _CODES_UPPER[values % 36])
+            values //= 36
+        text[large] = digits.view('S%d' % width).ravel()
+    return text
+
+
+def column_hy36(width, col):
+    # Decode a fixed-width column of hybrid-36 fields. Blank or malformed fields are read as 0.
+    encoded = np.char.isalpha(np.char.lstrip(col).astype('S1'))
+    values = column_ints(np.where(encoded, '0', col))
+    encoded = np.nonzero(encoded)[0]
+    if len(encoded):
+        if col.dtype.itemsize == width:
+            # Fields of the full width made up only of base-36 digits are decoded together, as hy36decode
+            text = np.ascontiguousarray(col[encoded]).view(np.uint8).reshape(-1, width)
+            digits = _DIGIT_VALUES[text]
+            valid = np.all(digits >= 0, axis=1)
+            decoded = np.zeros(len(encoded), dtype=np.int64)
+            for k in range(width):
+                decoded = decoded * 36 + digits[:, k]
+            decoded += 10**width - 10 * 36**(width - 1) + np.where(text[:, 0] >= ord('a'), 26 * 36**(width - 1), 0)
+            values[encoded[valid]] = decoded[valid]
+            encoded = encoded[~valid]
+        values[encoded] = [hy36decode(width, v) for v in col[encoded].tolist()]
+    return values
+
+
+def columns(raw):
+    # Structured column view of an array of record text
+    return raw.view(pdb_columns(raw.dtype.itemsize))
+
+
+def record_lines(raw):
+    # The text of each record in an array of record text, or a column view of one
+    lines = raw.view('S%d' % raw.dtype.itemsize).tolist()
+    return [line.replace('\0', ' ') if '\0' in line else line for line in lines]
+
+
+def residue_keys(records):
+    # Integer key ordering residues by sequence number, then insertion code, as used by ReplaceRes
+    icode = np.where(records['icode'] == '', ' ', records['icode'])
+    return column_ints(records['resseq']) * 1000 + icode.view(np.uint8)
+
+
+class PdbStructure(object):
+    """The records of a PDB file, with ATOM and HETATM records held in columnar form.
+
+    lines holds every record in the file, without line terminators. The ATOM/HETATM records are identified by
+    atom_lines (line indices), and their text is held in raw, with records as a column view of it: changes made to
+    records are reflected when the structure is written. lengths holds the original length of each ATOM/HETATM line. atoms holds the parsed
+    values, and res_starts and chain_starts the index of the first atom in each residue and chain.
+    """
+
+    def __init__(self, data):
+        self.newline = '\r\n' if '\r\n' in data else '\n'
+        self.final_newline = data.endswith('\n')
+        self.lines = data.splitlines()
+
+        raw = np.array(self.lines) if self.lines else np.zeros(0, dtype='S%d' % PDB_LINE_WIDTH)
+        self.record_types = raw.astype('S6')
+        self.atom_lines = np.nonzero((self.record_types == 'ATOM  ') | (self.record_types == 'HETATM'))[0]
+
+        width = max(PDB_LINE_WIDTH, raw.dtype.itemsize)
+        self.raw = raw[self.atom_lines].astype('S%d' % width)
+        self.lengths = np.char.str_len(self.raw)
+        self.records = columns(self.raw)
+
+        break_lines = np.nonzero(np.in1d(self.record_types, _BREAK_RECORDS))[0]
+        self._segment = np.searchsorted(break_lines, self.atom_lines)
+
+        self.parse()
+
+    def parse(self):
+        # (Re)compute the parsed values and boundaries from the current text of the records
+        rec = self.records
+        atoms = np.zeros(len(rec), dtype=ATOM_DTYPE)
+        atoms['serial'] = column_hy36(5, rec['serial'])
+        for f in ('name', 'altloc', 'resname', 'chain', 'icode'):
+            atoms[f] = np.char.strip(rec[f])
+        atoms['resseq'] = column_ints(rec['resseq'])
+        for i, f in enumerate(('x', 'y', 'z')):
+            atoms['xyz'][:, i] = column_floats(rec[f])
+        atoms['occupancy'] = column_floats(rec['occupancy'])
+        atoms['bfactor'] = column_floats(rec['bfactor'])
+        self.atoms = atoms
+
+        seg_change = self._segment[1:] != self._segment[:-1]
+        chain_change = (rec['chain'][1:] != rec['chain'][:-1]) | seg_change
+        res_change = (rec['resid'][1:] != rec['resid'][:-1]) | chain_change
+        self.chain_starts = np.concatenate(([0], np.nonzero(chain_change)[0] + 1)) if len(rec) else np.zeros(0, int)
+        self.res_starts = np.concatenate(([0], np.nonzero(res_change)[0] + 1)) if len(rec) else np.zeros(0, int)
+
+    def __len__(self):
+        return len(self.records)
+
+    def select(self, sel):
+        # A copy of the selected records. Copy through the text, so that columns not covered by a field come too.
+        return columns(self.raw[sel])
+
+    def update(self, sel, records):
+        # Write back records obtained from select
+        self.raw[sel] = records.view(self.raw.dtype)
+
+    def residue_index(self):
+        # Index of the residue each atom belongs to
+        index = np.zeros(len(self), dtype=np.int64)
+        index[self.res_starts[1:]] = 1
+        return np.cumsum(index)
+
+    def is_record(self, *types):
+        # Mask over atoms selecting the given record types, e.g. is_record('ATOM  ')
+        return np.in1d(self.records['record'], types)
+
+    def text_lines(self):
+        # Every line of the file, with the current text of the ATOM/HETATM records
+        lines = list(self.lines)
+        for i, text in itertools.izip(self.atom_lines.tolist(), self.raw.tolist()):
+            lines[i] = text
+        return lines
+
+    def write(self, of, keep=None, insert=None):
+        # Write the structure to an open file. keep is an optional mask over lines: lines for which it is False are
+        # omitted. insert is an optional dict of line index -> list of lines to write before that line.
+        of.write(self.text(keep, insert))
+
+    def text(self, keep=None, insert=None, lines=None):
+        # The text that write would write. lines, if given, is the result of text_lines, which may be kept when the
+        # structure is to be written many times with different keep and insert arguments.
+        if lines is None:
+            lines = self.text_lines()
+        if keep is None:
+            keep = np.ones(len(lines), dtype=bool)
+        keep = keep.tolist()
+
+        out = []
+        prev = 0
+        for i in sorted(insert or []):
+            out.extend(itertools.compress(lines[prev:i], keep[prev:i]))
+            out.extend(insert[i])
+            prev = i
+        out.extend(itertools.compress(lines[prev:], keep[prev:]))
+
+        if not out:
+            return ''
+        text = self.newline.join(out)
+        if '\0' in text:
+            text = text.replace('\0', ' ')
+        if self.final_newline or not keep[-1] or (insert and max(insert) >= len(lines)):
+            text += self.newline
+        return text
+
+
+def split_models(data):
+    # Split the text of a PDB file into the records preceding the first MODEL record, the text of each model (from its
+    # MODEL record to its ENDMDL record), and the records following the last model. If there are no MODEL records, the
+    # whole file is returned as the header.
+
+    starts = [m.start() for m in _MODEL_RE.finditer(data)]
+    if not starts:
+        return data, [], ''
+
+    ends = starts[1:]
+    m = _ENDMDL_RE.search(data, starts[-1])
+    ends.append(m.end() if m else len(data))
+
+    return data[:starts[0]], [data[start:end] for start, end in zip(starts, ends)], data[ends[-1]:]
+
+
+def residue_chunks(data, n):
+    # Split the text of a PDB file into at most n chunks of roughly equal size, returned as (start, end) offsets. Each
+    # cut is made before an ATOM record whose residue number (columns 23-27) differs from that of the ATOM record on
+    # the line before, so that every chunk after the first starts with a new residue.
+
+    if n <= 1 or not data:
+        return [(0, len(data))]
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = line_bounds(buf)
+    atom = is_line_record(buf, starts, ends, 'ATOM  ')
+    resid = gather_column(buf, starts, 22, 5, ends)
+    cuts = starts[1:][atom[1:] & atom[:-1] & (resid[1:] != resid[:-1])]
+    if not len(cuts):
+        return [(0, len(data))]
+
+    targets = len(data) * np.arange(1, n) // n
+    cuts = np.unique(cuts[np.minimum(np.searchsorted(cuts, targets), len(cuts) - 1)]).tolist()
+    bounds = [0] + cuts + [len(data)]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def map_models(func, models, args=(), processes=1, shared=None):
+    # Apply func(model, *args) to each model (usually its text), returning the results in order. If processes is
+    # greater than 1, the models are processed on a pool of that many worker processes, in which case func must be a
+    # module-level function. If shared is given, func is called as func(model, shared, *args). shared is sent to each
+    # worker once, when it is started, rather than with each model, so it may be large.
+
+    if shared is not None:
+        args = (shared,) + tuple(args)
+    jobs = [(func, model, args) for model in models]
+    if processes <= 1 or len(jobs) < 2:
+        return map(_apply, jobs)
+
+    if shared is None:
+        pool = multiprocessing.Pool(processes)
+        apply_job = _apply
+    else:
+        pool = multiprocessing.Pool(processes, _set_shared, (shared,))
+        jobs = [(func, model, args[1:]) for func, model, args in jobs]
+        apply_job = _apply_shared
+    try:
+        return pool.map(apply_job, jobs, chunksize=max(1, len(jobs) // (4 * processes)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _apply(job):
+    func, model, args = job
+    return func(model, *args)
+
+
+# The shared argument of map_models, in a worker process
+
+_shared = None
+
+
+def _set_shared(shared):
+    global _shared
+    _shared = shared
+
+
+def _apply_shared(job):
+    func, model, args = job
+    return func(model, _shared, *args)
+
+
+def expand_files(patterns, suffixes=('.pdb',)):
+    # The files named by a list of file names, wildcard patterns and directories (taken as every file in them with one
+    # of the given suffixes, compressed or not), in the order given
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(f for suffix in suffixes for ext in ['', '.gz', '.bz2', '.xz']
+                             for f in glob.glob(os.path.join(pattern, '*' + suffix + ext)))
+        else:
+            matches = sorted(glob.glob(pattern))
+        if not matches:
+            print 'Warning: no files match %s' % pattern
+        files.extend(matches)
+    return files
+
+
+def output_files(infiles, outdir, name=os.path.basename, kind='input file'):
+    # The file in outdir to which each input file of a batch is written, named by name(infile). Stops with an error if
+    # two input files would be written to the same file, or if an input file would be overwritten.
+    outfiles = []
+    sources = {}
+    for infile in infiles:
+        outfile = os.path.join(outdir, name(infile))
+        if os.path.realpath(outfile) == os.path.realpath(infile):
+            print 'Error: %s %s is in the output directory, and would be overwritten.' % (kind, infile)
+            quit()
+        if outfile in sources:
+            print 'Error: %ss %s and %s would both be written to %s.' % (kind, sources[outfile], infile, outfile)
+            quit()
+        sources[outfile] = infile
+        outfiles.append(outfile)
+    return outfiles
+
+
+# Tools that change only a few fixed columns can patch them in a memory-mapped copy of the file, or in the file itself,
+# instead of rewriting every line. The copy is made in bulk, and only the pages holding patched bytes are written back.
+
+def patchable(infile, outfile):
+    # True if outfile can be patched as a copy of infile. Compressed files cannot, so a warning is given and the caller
+    # should process the whole file instead.
+    if CompressedFiles.is_compressed(infile) or CompressedFiles.is_compressed(outfile, 'w'):
+        print 'Warning: compressed files cannot be patched in place. The whole file will be processed.'
+        return False
+    return True
+
+
+def same_file(infile, outfile):
+    # True if infile and outfile both exist and are the same file
+    return os.path.exists(infile) and os.path.exists(outfile) and os.path.samefile(infile, outfile)
+
+
+def map_for_patching(infile, outfile):
+    # A writable memory map of outfile, which is first made a copy of infile unless it is the same file. Returns None
+    # if the file is empty, as there is then nothing to map.
+    if not same_file(infile, outfile):
+        shutil.copyfile(infile, outfile)
+    if os.path.getsize(outfile) == 0:
+        return None
+    return np.memmap(outfile, dtype=np.uint8, mode='r+')
+
+
+def line_bounds(buf):
+    # Offsets in buf (an array of bytes) of the start and end of each line, not counting the line ending
+    ends = np.nonzero(buf == ord('\n'))[0]
+    if len(buf) and buf[-1] != ord('\n'):
+        ends = np.append(ends, len(buf))
+    starts = np.r_[0, ends[:-1] + 1] if len(ends) else ends
+    ends = np.where((ends > starts) & (buf[np.maximum(ends - 1, 0)] == ord('\r')), ends - 1, ends)
+    return starts, ends
+
+
+def is_line_record(buf, starts, ends, *types):
+    # Mask over lines selecting the given record types (six characters, padded)
+    rec = gather_column(buf, starts, 0, 6, ends)
+    return np.in1d(rec, types)
+
+
+def record_offsets(buf, record, width):
+    # Offsets in buf of the lines of the given record type that are at least width characters long, not counting the
+    # line ending
+    starts, ends = line_bounds(buf)
+    keep = ends - starts >= max(width, 6)
+    starts, ends = starts[keep], ends[keep]
+    return starts[is_line_record(buf, starts, ends, record)]
+
+
+def gather_column(buf, offsets, start, width, ends=None):
+    # The given column range of the lines at offsets, as an array of strings. Columns beyond the end of the file, or
+    # of the line if its end is given, are read as blanks.
+    if not len(offsets):
+        return np.zeros(0, dtype='S%d' % width)
+    cols = offsets[:, None] + np.arange(start, start + width)
+    text = np.asarray(buf)[np.minimum(cols, len(buf) - 1)]
+    text[cols >= (len(buf) if ends is None else ends[:, None])] = ord(' ')
+    return np.ascontiguousarray(text).view('S%d' % width).ravel()
+
+
+def patch_column(buf, offsets, start, width, values):
+    # Overwrite the given column range of the lines at offsets with values, which are truncated or padded with spaces
+    # to the width of the column
+    if len(offsets):
+        data = np.ascontiguousarray(np.broadcast_to(np.asarray(values).astype('S%d' % width), offsets.shape))
+        data = data.view(np.uint8).reshape(-1, width).copy()
+        data[data == 0] = ord(' ')
+        buf[offsets[:, None] + np.arange(start, start + width)] = data
+
+
+# Parsed structures may be kept in a cache directory, named by the environment variable AMBERUTILS_CACHE, so that a
+# file that has been parsed before is loaded from its arrays rather than parsed again. Entries are keyed by a hash of
+# the file's content, and the least recently used are removed once the total size of the cache exceeds
+# AMBERUTILS_CACHE_SIZE megabytes.
+
+CACHE_ENV = 'AMBERUTILS_CACHE'
+CACHE_SIZE_ENV = 'AMBERUTILS_CACHE_SIZE'
+CACHE_SIZE = 1024
+_CACHE_VERSION = 1
+
+_CACHE_ARRAYS = ['lines', 'record_types', 'atom_lines', 'raw', 'lengths', 'segment', 'atoms', 'chain_starts',
+                 'res_starts']
+
+
+def parse_pdb(data):
+    # The PdbStructure of the text of a PDB file, from the cache if it is enabled
+    cache_dir = os.environ.get(CACHE_ENV)
+    if not cache_dir:
+        return PdbStructure(data)
+
+    entry = os.path.join(cache_dir, '%s.v%d.npz' % (hashlib.sha1(data).hexdigest(), _CACHE_VERSION))
+    if os.path.isfile(entry):
+        try:
+            s = _load_cached(entry)
+            os.utime(entry, None)
+            return s
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    s = PdbStructure(data)
+    try:
+        _store_cached(s, cache_dir, entry)
+    except (IOError, OSError):
+        print 'Warning: could not write to structure cache %s' % cache_dir
+    return s
+
+
+def _store_cached(s, cache_dir, entry):
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    # Write under a temporary name and rename, so that other processes never see a partial entry
+    arrays = dict((f, getattr(s, f)) for f in _CACHE_ARRAYS if f not in ('lines', 'segment'))
+    tmp = '%s.%d.tmp' % (entry, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.savez(f, lines=np.array(s.lines) if s.lines else np.zeros(0, dtype='S1'), segment=s._segment,
+                 newline=s.newline, final_newline=s.final_newline, **arrays)
+    os.rename(tmp, entry)
+
+    # Evict the least recently used entries
+    limit = float(os.environ.get(CACHE_SIZE_ENV, CACHE_SIZE)) * 1024 * 1024
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz'):
+            path = os.path.join(cache_dir, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= limit or path == entry:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def _load_cached(entry):
+    stored = np.load(entry)
+    s = PdbStructure.__new__(PdbStructure)
+    s.newline = str(stored['newline'])
+    s.final_newline = bool(stored['final_newline'])
+    s.lines = stored['lines'].tolist()
+    s.record_types = stored['record_types']
+    s.atom_lines = stored['atom_lines']
+    s.raw = stored['raw']
+    s.lengths = stored['lengths']
+    s.records = columns(s.raw)
+    s._segment = stored['segment']
+    s.atoms = stored['atoms']
+    s.chain_starts = stored['chain_starts']
+    s.res_starts = stored['res_starts']
+    return s
+
+
+def read_pdb(filename):
+    with CompressedFiles.open_file(filename, 'r') as f:
+        return parse_pdb(f.read())
@@ -0,0 +1,240 @@
+#! /usr/bin/env python
+
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Run a chain of preparation steps over a PDB file in a single process. The file is read in blocks of lines, and each
+# block is streamed through the steps in turn, each applying the functions of the tool it names, so that no
+# intermediate files are written and the file is never held in memory as a whole. Each step is specified as the name
+# of the tool followed by its arguments, omitting the input and output files, for example:
+#
+# python Pipeline.py in.pdb out.pdb "ConvertRes in.control" "ReplaceRes rel.pdb C 96 106" RenumberAtoms MakeConects
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import sys
+import argparse
+import shlex
+import StringIO
+import ConvertRes
+import MakeConects
+import NumberRes
+import RenumberAtoms
+import ReplaceRes
+import CompressedFiles
+import WarningLog
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+
+
+# Each step is a generator over the blocks produced by the step before it, each block a PdbStructure. Only the state
+# that a later block needs is carried from one block to the next.
+
+def convert_res(blocks, changes):
+    # As ConvertRes. Each renamed residue is reported once, even if it occurs in several models or blocks.
+    lookup = ConvertRes.control_lookup(changes)
+    changed = set()
+    reported = set()
+    for s in blocks:
+        for message in ConvertRes.rename(s, lookup, changed):
+            if message not in reported:
+                print message
+                reported.add(message)
+        yield s
+
+    for message in ConvertRes.not_found(changes, changed):
+        print message
+
+
+def replace_res(blocks, specs, remove_anisou=False):
+    # As ReplaceRes. Blocks that hold none of the residues to replace are passed on as they are. From the first that
+    # does, blocks are held back until the last residue of the span is complete, and are then spliced as one. The
+    # CYX SG and CB atoms of the blocks before the span are remembered, as ReplaceRes takes them from the whole file.
+    cyx_sg_atoms = {}
+    cyx_cb_atoms = {}
+    span = []
+    span_open = False
+
+    for s in blocks:
+        replaced = _replaced(s, specs)
+        if span or replaced.any():
+            span.append(s.text())
+            atoms = np.nonzero(s.is_record('ATOM  '))[0]
+            if len(atoms):
+                span_open = replaced[atoms[-1]]
+            if span_open:
+                continue
+            s = PdbArrays.PdbStructure(''.join(span))
+            span = []
+        yield _splice(s, specs, cyx_sg_atoms, cyx_cb_atoms, remove_anisou)
+
+    if span:
+        yield _splice(PdbArrays.PdbStructure(''.join(span)), specs, cyx_sg_atoms, cyx_cb_atoms, remove_anisou)
+
+
+def _replaced(s, specs):
+    # Mask over the atoms of s selecting the ATOM records of the residues to replace
+    rec = s.records
+    keys = PdbArrays.residue_keys(rec)
+    replaced = np.zeros(len(rec), dtype=bool)
+    for _, chain_id, first_id, last_id in specs:
+        replaced |= (rec['chain'] == chain_id) & (keys >= ReplaceRes.resnum_key(first_id)) \
+                    & (keys <= ReplaceRes.resnum_key(last_id))
+    return replaced & s.is_record('ATOM  ')
+
+
+def _splice(s, specs, cyx_sg_atoms, cyx_cb_atoms, remove_anisou):
+    # s with any residues to replace in it replaced, adding its CYX atoms to those seen before
+    sg_atoms, cb_atoms = ReplaceRes.cyx_atoms(s)
+    cyx_sg_atoms.update(sg_atoms)
+    cyx_cb_atoms.update(cb_atoms)
+
+    keep, insert = ReplaceRes.splice(s, specs, cyx_sg_atoms, cyx_cb_atoms)
+    if remove_anisou:
+        keep &= s.record_types != "ANISOU"
+    if insert or not keep.all():
+        s = PdbArrays.PdbStructure(s.text(keep, insert))
+    return s
+
+
+def number_res(blocks, startnum, chain):
+    # As NumberRes. A residue that runs on from one block into the next keeps the number it was given in the first.
+    next_num = startnum
+    last_resid = None
+    for s in blocks:
+        resids = s.records['resid'][s.is_record('ATOM  ')]
+        if len(resids):
+            if resids[0] == last_resid:
+                next_num -= 1
+            last_resid = resids[-1]
+            next_num += NumberRes.number(s, next_num, chain)
+        yield s
+
+
+def renumber_atoms(blocks):
+    # As RenumberAtoms. The map from old to new serial numbers is extended with the atoms of each block as it
+    # arrives, rather than from a prescan of the file, and is what is held for the CONECT records.
+    new_atom_nums = RenumberAtoms.SerialMap([])
+    atom_num = 0
+    for s in blocks:
+        new_atom_nums.extend(PdbArrays.column_hy36(5, s.records['serial']))
+        atom_num = RenumberAtoms.renumber_block(s, new_atom_nums, atom_num)
+        yield s
+
+
+def make_conects(blocks):
+    # As MakeConects. The SSBOND records and SG atoms found so far are held, so that the CONECT records can be written
+    # at the END record, or, if there is none, after the last block.
+    ssbonds = []
+    model_atoms = [{}]
+    written = False
+    for s in blocks:
+        model_atoms[0].update(MakeConects.sg_atoms(s))
+        of = StringIO.StringIO()
+        written = MakeConects.write_records(of, s.text_lines(), ssbonds, model_atoms) or written
+        yield PdbArrays.PdbStructure(of.getvalue())
+
+    of = StringIO.StringIO()
+    MakeConects.end_conects(of, written, ssbonds, model_atoms)
+    if of.getvalue():
+        yield PdbArrays.PdbStructure(of.getvalue())
+
+
+def _stage_parsers():
+    # The parser for the arguments of each step, with a function composing the step over a stream of blocks. Files
+    # named in the arguments are read when the step is composed, before any block is processed.
+    parsers = {}
+
+    p = argparse.ArgumentParser(prog='ConvertRes', add_help=False)
+    p.add_argument('ctrlfile')
+    parsers['ConvertRes'] = (p, lambda b, a: convert_res(b, ConvertRes.read_control(a.ctrlfile)))
+
+    p = argparse.ArgumentParser(prog='ReplaceRes', add_help=False)
+    p.add_argument('replacement')
+    p.add_argument('chain')
+    p.add_argument('startnum')
+    p.add_argument('endnum')
+    p.add_argument('-a', '--remove_anisou', action='store_true')
+    parsers['ReplaceRes'] = (p, lambda b, a: replace_res(
+        b, ReplaceRes.read_specs([(a.replacement, a.chain, a.startnum, a.endnum)]), a.remove_anisou))
+
+    p = argparse.ArgumentParser(prog='NumberRes', add_help=False)
+    p.add_argument('startnum', type=int)
+    p.add_argument('chain')
+    parsers['NumberRes'] = (p, lambda b, a: number_res(b, a.startnum, a.chain[:1]))
+
+    p = argparse.ArgumentParser(prog='RenumberAtoms', add_help=False)
+    parsers['RenumberAtoms'] = (p, lambda b, a: renumber_atoms(b))
+
+    p = argparse.ArgumentParser(prog='MakeConects', add_help=False)
+    parsers['MakeConects'] = (p, lambda b, a: make_conects(b))
+
+    return parsers
+
+
+def parse_steps(steps):
+    # The function and arguments of each step, in order. Every step is checked before any is run.
+    parsers = _stage_parsers()
+    stages = []
+    for step in steps:
+        words = shlex.split(step)
+        name = words[0][:-3] if words and words[0].endswith('.py') else (words[0] if words else '')
+        if name not in parsers:
+            print 'Error: unknown step "%s". Steps must be one of: %s' % (step, ', '.join(sorted(parsers)))
+            quit()
+        parser, stage = parsers[name]
+        stages.append((stage, parser.parse_args(words[1:])))
+    return stages
+
+
+def run_steps(blocks, stages):
+    # Compose the steps, each drawing its blocks from the one before. Returns the blocks produced by the last.
+    for stage, args in stages:
+        blocks = stage(blocks, args)
+    return blocks
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Run a chain of preparation steps over a PDB file in a single process, '
+                                                 'without writing intermediate files.')
+    parser.add_argument('infile', help='input file (PDB format)')
+    parser.add_argument('outfile', help='output file (PDB format)')
+    parser.add_argument('steps', nargs='+', help='steps to run, in order. Each step consists of the name of the tool '
+                        '(ConvertRes, ReplaceRes, NumberRes, RenumberAtoms or MakeConects) followed by its arguments, '
+                        'omitting infile and outfile, e.g. "ReplaceRes rel.pdb C 96 106"')
+    WarningLog.add_arguments(parser)
+    args = parser.parse_args()
+    WarningLog.configure(args)
+
+    if PdbArrays.same_file(args.infile, args.outfile):
+        print 'Error: outfile must not be the same as infile.'
+        quit()
+
+    stages = parse_steps(args.steps)
+
+    with CompressedFiles.open_file(args.infile, "r") as f:
+        blocks = run_steps((PdbArrays.PdbStructure(data) for data in RenumberAtoms.read_blocks(f)), stages)
+        with CompressedFiles.open_file(args.outfile, "w") as of:
+            for s in blocks:
+                s.write(of)
+
+    WarningLog.report()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -25,6 +25,12 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import argparse
+import CompressedFiles
+import WarningLog
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Label the chains in an unlabelled pdb file, by consulting a reference.')
@@ -34,95 +40,197 @@ def main(argv):
     parser.add_argument('-c', '--chain', help='unlabelled file contains the specified chain only')
     parser.add_argument('-r', '--replace_md_res', help='replace CIS, HIS in file with CYX, HID etc in reference, if found', action='store_true')
     parser.add_argument('-d', '--delete_unreferenced', help='delete records found past the end of the reference file', action='store_true')
+    WarningLog.add_arguments(parser)
     args = parser.parse_args()
+    WarningLog.configure(args)
     
-    res = []
-    old_resnum = -1
-
-    # Read reference file
-    with open(args.reference, "r") as rf:
-        for line in rf:
-            if line[0:6] == "ATOM  ":
-                resnum = line[22:27]
-                resname = line[17:20]
-                chain = line[21]
-                # Add each residue to the list exactly once
-                if resnum != old_resnum:
-                    if args.chain is None or chain == args.chain:
-                        res.append([resnum, resname, chain])
-                        old_resnum = resnum
-
-    res_iter = iter(res)
-    old_resnum = ""
-    old_ref_resnum = None
-    old_chain = ""
-    ref_chain_startnum = ""
-    inf_chain_startnum = ""
-    ref_res = None
-    last_warning = ''
-    error = None
-           
-    print "Chain Ref. Start Ref. End Inf. Start Inf. End"
-    
-    with open(args.infile, "r") as fi, open(args.outfile, "w") as fo:
-        try:        
-            for line in fi:
-                if line[0:6] == "ATOM  ":
-                    resnum = line[22:27]
-                    resname = line[17:20]
-
-                    # For each residue, exactly once...
-                    if resnum != old_resnum:
-                        old_ref_resnum = ref_res[0] if ref_res else None
-
-                        # Find the corresponding reference residue
-                        ref_res = res_iter.next()
-
-                        # Track chain changes
-                        if old_chain != ref_res[2]:
-                            if old_chain != "": 
-                                print "%5s %11s %8s %10s %8s" % (old_chain, ref_chain_startnum, old_ref_resnum, inf_chain_startnum, old_resnum)
-                            ref_chain_startnum = ref_res[0]
-                            inf_chain_startnum = resnum
-                            old_chain = ref_res[2]
-                        old_resnum = resnum
-    
-                    l = list(line)
-
-                    # Here the algorithm expects that the infile and the reference file have the same ordering of the
-                    # residue names and just differ in their chain and residue numbering (this also means that the chain
-                    # ordering has to be the same and also that no new residues have been added in the ATOM records
-                    # which might be the case with modelled loops)
-                    # if there is a different order we output the following warnings or changes the resname to the pdb
-                    # convention
-                    if resname != ref_res[1]:
-                        if args.replace_md_res and resname == 'HIS' and ref_res[1] in ['HID', 'HIE']:
-                            l[17:20] = ref_res[1]    
-                        elif args.replace_md_res and resname == 'CYS' and ref_res[1] == 'CYX':
-                            l[17:20] = ref_res[1]    
-                        else:
-                            if resnum != last_warning:
-                                print "Warning: at residue %s in infile, residue %s in infile differs from %s in reference." % (resnum, resname, ref_res[1])
-                                last_warning = resnum
-
-                    # Use reference residue number and chain
-                    l[22:27] = ref_res[0]
-                    l[21] = ref_res[2]
-                    line = "".join(l)            
-                fo.write(line)
-        except StopIteration:
-            if args.delete_unreferenced:
-                error = '\nInput file contains additional residues past the end of the reference file (possibly solvents): these have been omitted.'
+    # Read reference file: each residue, exactly once
+
+    ref = PdbArrays.read_pdb(args.reference)
+    sel = ref.is_record('ATOM  ')
+    if args.chain is not None:
+        sel &= ref.records['chain'] == args.chain
+    ref_rec = ref.select(sel)
+    ref_first = first_of_residue(ref_rec)
+    reference = (ref_rec['resid'][ref_first], ref_rec['resname'][ref_first].astype('S3'), ref_rec['chain'][ref_first])
+    ref_resnum, ref_resname, ref_chain = reference
+
+    with CompressedFiles.open_file(args.infile, "r") as f:
+        data = f.read()
+
+    header, models, trailer = PdbArrays.split_models(data)
+
+    with CompressedFiles.open_file(args.outfile, "w") as fo:
+        if not models:
+            s = PdbArrays.parse_pdb(data)
+            keep, inf_resnum, error = relabel(s, reference, args.replace_md_res, args.delete_unreferenced)
+            if keep is not None:
+                s.write(fo, keep=keep)
                 fo.write('END')
             else:
-                for line in fi:
-                    fo.write(line)
+                s.write(fo)
+        else:
+            # Each model of a trajectory has the same layout, so the changes made to the first model are recorded as
+            # a template and copied into the others. A model that does not match the template is relabelled in full.
+            fo.write(header)
+            s = PdbArrays.PdbStructure(models[0])
+            keep, inf_resnum, error = relabel(s, reference, args.replace_md_res, args.delete_unreferenced)
+            if keep is not None:
+                keep |= s.record_types == 'ENDMDL'
+            template = Template(models[0], s, keep)
+            fo.write(s.text(keep))
+
+            for model in models[1:]:
+                text = template.apply(model)
+                if text is None:
+                    ms = PdbArrays.PdbStructure(model)
+                    model_keep = relabel(ms, reference, args.replace_md_res, args.delete_unreferenced)[0]
+                    if model_keep is not None:
+                        model_keep |= ms.record_types == 'ENDMDL'
+                    text = ms.text(model_keep)
+                fo.write(text)
+            fo.write(trailer)
+
+    # Track chain changes
+
+    print "Chain Ref. Start Ref. End Inf. Start Inf. End"
+
+    n = len(inf_resnum)
+    chain_starts = np.nonzero(np.r_[True, ref_chain[1:n] != ref_chain[:n-1]])[0] if n else []
+    chain_ends = np.r_[chain_starts[1:], n] - 1
+    for start, end in zip(chain_starts, chain_ends):
+        print "%5s %11s %8s %10s %8s" % (ref_chain[start], ref_resnum[start], ref_resnum[end], inf_resnum[start], inf_resnum[end])
 
-    print "%5s %11s %8s %10s %8s" % (old_chain, ref_chain_startnum, old_ref_resnum, inf_chain_startnum, old_resnum)
-    
     if error:
         print error
-        
+
+    WarningLog.report()
+
+
+def relabel(s, reference, replace_md_res=False, delete_unreferenced=False):
+    # Relabel the residues of s from the reference residues (residue number, name and chain of each). Returns the
+    # keep mask with which to write s, if residues past the end of the reference are to be omitted, the residue
+    # numbers of s before relabelling, and a message to report at the end, if any.
+
+    ref_resnum, ref_resname, ref_chain = reference
+
+    # Find the corresponding reference residue for each residue in the input file
+
+    in_atoms = np.nonzero(s.is_record('ATOM  '))[0]
+    rec = s.select(in_atoms)
+    new_res = first_of_residue(rec)
+    res_index = np.cumsum(new_res) - 1
+
+    # res_index ascends through the file, so the atoms with a reference residue come first
+    mapped = np.count_nonzero(res_index < len(ref_resnum))
+    error = None
+    keep = None
+    if mapped < len(in_atoms):
+        # The input file contains residues past the end of the reference file
+        if delete_unreferenced:
+            error = '\nInput file contains additional residues past the end of the reference file (possibly solvents): these have been omitted.'
+            keep = np.arange(len(s.lines)) < s.atom_lines[in_atoms[mapped]]
+        rec = rec[:mapped]
+        res_index = res_index[:mapped]
+        new_res = new_res[:mapped]
+        in_atoms = in_atoms[:mapped]
+
+    # Here the algorithm expects that the infile and the reference file have the same ordering of the
+    # residue names and just differ in their chain and residue numbering (this also means that the chain
+    # ordering has to be the same and also that no new residues have been added in the ATOM records
+    # which might be the case with modelled loops)
+    # if there is a different order we output the following warnings or changes the resname to the pdb
+    # convention
+
+    resname = rec['resname'].astype('S3')
+    target = ref_resname[res_index]
+    differs = resname != target
+    if replace_md_res:
+        replace = differs & (((resname == 'HIS') & np.in1d(target, ['HID', 'HIE'])) |
+                             ((resname == 'CYS') & (target == 'CYX')))
+        rec['resname'][replace] = target[replace]
+        differs &= ~replace
+
+    warned = np.nonzero(differs)[0]
+    if len(warned):
+        warned = warned[np.r_[True, res_index[warned][1:] != res_index[warned][:-1]]]
+    for i in warned:
+        WarningLog.warn('residue name differs from reference',
+                        "at residue %s in infile, residue %s in infile differs from %s in reference." % (rec['resid'][i], resname[i], target[i]))
+
+    inf_resnum = rec['resid'][new_res]
+
+    # Use reference residue number and chain
+    rec['resid'] = ref_resnum[res_index]
+    rec['chain'] = ref_chain[res_index]
+    s.update(in_atoms, rec)
+
+    return keep, inf_resnum, error
+
+
+class Template(object):
+    """The changes made in relabelling a model, as byte patches that can be applied to other models of the same layout.
+
+    A model matches the template if its lines fall at the same offsets as those of the original model, and its record
+    types, residue names, chains and residue numbers are the same. The relabelled model is then the matching model
+    with the patch bytes written over it, less any lines that were omitted from the original.
+    """
+
+    def __init__(self, text, s, keep=None):
+        self.valid = False
+        orig = np.frombuffer(text, dtype=np.uint8)
+        new = s.text()
+        if len(new) != len(orig):
+            return
+        new = np.frombuffer(new, dtype=np.uint8)
+
+        self.length = len(orig)
+        self.newlines = np.nonzero(orig == ord('\n'))[0]
+        starts = np.r_[0, self.newlines + 1][:len(s.lines)]
+        if len(starts) != len(s.lines):
+            return
+
+        # Bytes that must match: the record type of every line, and the residue name, chain and number of atoms
+        cols = np.r_[starts[:, None] + np.arange(6)].ravel()
+        atom_starts = starts[s.atom_lines]
+        cols = np.r_[cols, (atom_starts[:, None] + np.arange(17, 27)).ravel()]
+        self.check = cols[cols < self.length]
+        self.check_values = orig[self.check]
+
+        self.patch = np.nonzero(orig != new)[0]
+        self.patch_values = new[self.patch]
+
+        self.keep = None
+        if keep is not None:
+            ends = np.r_[self.newlines + 1, self.length][:len(s.lines)]
+            line_of_byte = np.repeat(np.arange(len(s.lines)), ends - starts)
+            if len(line_of_byte) != self.length:
+                return
+            self.keep = keep[line_of_byte]
+
+        # Check that the template reproduces the relabelled model
+        self.valid = True
+        self.valid = self.apply(text) == s.text(keep)
+
+    def apply(self, text):
+        # The relabelled text of a model, or None if it does not match the template
+        if not self.valid or len(text) != self.length:
+            return None
+        buf = np.frombuffer(text, dtype=np.uint8)
+        if np.count_nonzero(buf == ord('\n')) != len(self.newlines) or np.any(buf[self.newlines] != ord('\n')) \
+                or np.any(buf[self.check] != self.check_values):
+            return None
+        buf = buf.copy()
+        buf[self.patch] = self.patch_values
+        if self.keep is not None:
+            buf = buf[self.keep]
+        return buf.tostring()
+
+
+def first_of_residue(rec):
+    # Mask selecting the first atom of each residue, in the sense of a change in residue number
+    resnum = rec['resid']
+    return np.r_[True, resnum[1:] != resnum[:-1]] if len(rec) else np.zeros(0, dtype=bool)
             
 if __name__ == "__main__":
     main(sys.argv)
@@ -21,38 +21,163 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import argparse
+import CompressedFiles
 
 
 def main(argv):
     parser = argparse.ArgumentParser(
-        description='Rename (re-letter) the specified chain. If there are multiple chains with the same id in the pdb file, only the first is renamed.')
-    parser.add_argument('infile', help='input file (PDB format)')
-    parser.add_argument('outfile', help='output file (PDB format)')
-    parser.add_argument('old_id', help='current chain id (single letter)')
-    parser.add_argument('new_id', help='desired chain id (single letter)')
+        description='Rename (re-letter) the specified chains. If there are multiple chains with the same id in the pdb '
+                    'file, only the first is renamed, unless -a is given. In a file with several models, the chains of '
+                    'each model are renamed.')
+    parser.add_argument('infile', help='input file (PDB or mmCIF format)')
+    parser.add_argument('outfile', help='output file (in the format of the input file)')
+    parser.add_argument('old_id', help='current chain id (single letter, or for mmCIF files one or more characters), '
+                                       'or a list of renames old:new separated by commas (e.g. A:H,B:L,C:A), which are '
+                                       'all made in one pass, in which case new_id is not given')
+    parser.add_argument('new_id', nargs='?', help='desired chain id (single letter, or for mmCIF files one or more '
+                                                  'characters)')
+    parser.add_argument('-a', '--all', help='rename every occurrence of each chain, rather than the first',
+                        action='store_true')
+    parser.add_argument('-m', '--mmap', help='copy the file in bulk and patch the chain ids in a memory map of the '
+                                             'copy, leaving the rest of each line untouched. If outfile is the same as '
+                                             'infile, the file is changed in place', action='store_true')
     args = parser.parse_args()
 
-    if len(args.old_id) != 1 or len(args.new_id) != 1:
+    renames = read_renames(args.old_id, args.new_id)
+
+    if CompressedFiles.is_cif(args.infile):
+        rename_cif(args.infile, args.outfile, renames, args.all)
+        return
+
+    if any(len(old_id) != 1 or len(new_id) != 1 for old_id, new_id in renames):
         print 'old-id and new-id must be single letters.'
         quit()
 
-    found_chain = False
-    finished_chain = False
+    if args.mmap:
+        # NumPy is only needed here, so is not loaded otherwise
+        import PdbArrays
+        if PdbArrays.patchable(args.infile, args.outfile):
+            rename_mapped(args.infile, args.outfile, renames, args.all)
+            return
+
+    # Chain ids are translated through a table of 256 characters. Once the first run of ATOM records in a chain has
+    # ended, the chain's entry is set back to itself, unless every occurrence is to be renamed. The table is restored at
+    # the start of each model.
 
-    with open(args.infile, "r") as f, open(args.outfile, "w") as of:
+    renamed = ''.join(chr(i) for i in range(256))
+    for old_id, new_id in renames:
+        renamed = renamed[:ord(old_id)] + new_id + renamed[ord(old_id) + 1:]
+    table = renamed
+    current = None
+
+    with CompressedFiles.open_file(args.infile, "r") as f, CompressedFiles.open_file(args.outfile, "w") as of:
         for line in f:
             line = line.strip()
             if line[0:6] == "ATOM  ":
-                if line[21] == args.old_id:
-                    found_chain = True
-                    if not finished_chain:
-                        line = line[:21] + args.new_id + line[22:]
-                else:
-                    if found_chain:
-                        finished_chain = True
+                chain = line[21]
+                if chain != current:
+                    if current is not None and not args.all:
+                        table = table[:ord(current)] + current + table[ord(current) + 1:]
+                    current = chain
+                new_id = table[ord(chain)]
+                if new_id != chain:
+                    line = line[:21] + new_id + line[22:]
+            elif line[0:6] == "MODEL ":
+                table = renamed
+                current = None
 
             of.write(line + '\n')
 
 
+def read_renames(old_id, new_id):
+    # The renames given on the command line, as a list of (old id, new id)
+    if new_id is not None:
+        return [(old_id, new_id)]
+
+    renames = []
+    for item in old_id.split(','):
+        ids = item.split(':')
+        if len(ids) != 2 or not ids[0] or not ids[1]:
+            print 'Error: renames must take the form old:new, separated by commas (e.g. A:H,B:L).'
+            quit()
+        if ids[0] in [old for old, _ in renames]:
+            print 'Error: chain %s is renamed more than once.' % ids[0]
+            quit()
+        renames.append(tuple(ids))
+    return renames
+
+
+def rename_mapped(infile, outfile, renames, every=False):
+    # As above, patching the chain ids of the ATOM records in a memory-mapped copy
+    import numpy as np
+    import PdbArrays
+
+    buf = PdbArrays.map_for_patching(infile, outfile)
+    if buf is None:
+        return
+    offsets = PdbArrays.record_offsets(buf, 'ATOM  ', 22)
+    chains = PdbArrays.gather_column(buf, offsets, 21, 1)
+
+    # Runs of ATOM records in the same chain, numbered by the model they fall in
+    models = np.searchsorted(PdbArrays.record_offsets(buf, 'MODEL ', 6), offsets)
+    run_starts = np.nonzero(np.r_[True, (chains[1:] != chains[:-1]) | (models[1:] != models[:-1])])[0] \
+        if len(offsets) else np.zeros(0, dtype=np.int64)
+
+    table = np.arange(256, dtype=np.uint8)
+    for old_id, new_id in renames:
+        table[ord(old_id)] = ord(new_id)
+    run_chains = chains[run_starts].view(np.uint8)
+    selected = table[run_chains] != run_chains
+    if not every:
+        # The first run of each chain in each model
+        keys = models[run_starts] * 256 + run_chains
+        first = np.zeros(len(run_starts), dtype=bool)
+        first[np.unique(keys, return_index=True)[1]] = True
+        selected &= first
+
+    lengths = np.diff(np.r_[run_starts, len(offsets)])
+    patch = np.repeat(selected, lengths)
+    if patch.any():
+        PdbArrays.patch_column(buf, offsets[patch], 21, 1, table[chains[patch].view(np.uint8)].view('S1'))
+        buf.flush()
+
+
+def rename_cif(infile, outfile, renames, every=False):
+    # As above, for the author chain ids (or label chain ids, if there are none) of an mmCIF file, which is streamed a
+    # block of rows at a time. Models are told apart by the pdbx_PDB_model_num item, if it is present.
+    import numpy as np
+    import CifArrays
+
+    renames = dict(renames)
+    done = set()
+    current = None
+    model = None
+
+    with CifArrays.CifReader(infile) as r, CompressedFiles.open_file(outfile, "w") as of:
+        of.write(r.header)
+        for block in r.blocks():
+            atoms = np.nonzero(block.is_record('ATOM'))[0]
+            chains = block.chains()[atoms]
+            models = block.values(block.item('pdbx_PDB_model_num'))[atoms]
+
+            # Runs of ATOM records in the same chain and model, continuing the last run of the previous block
+            starts = np.nonzero(np.r_[True, (chains[1:] != chains[:-1]) | (models[1:] != models[:-1])])[0] \
+                if len(atoms) else np.zeros(0, dtype=np.int64)
+            for start, end in zip(starts.tolist(), starts[1:].tolist() + [len(atoms)]):
+                chain, run_model = chains[start], models[start]
+                if run_model != model:
+                    done = set()
+                    model = run_model
+                    current = None
+                if chain != current:
+                    if current is not None and not every:
+                        done.add(current)
+                    current = chain
+                if chain in renames and chain not in done:
+                    block.set_values(block.chain_item, renames[chain], atoms[start:end])
+            of.write(block.text())
+        of.write(r.trailer)
+
+
 if __name__ == "__main__":
     main(sys.argv)
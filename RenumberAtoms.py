@@ -21,41 +21,235 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import argparse
+import itertools
+import CompressedFiles
+import WarningLog
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+
+STREAM_LINES = 1 << 16
+
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Renumber atoms serially and fix up CONECTs')
     parser.add_argument('infile', help='input file (PDB format)')
     parser.add_argument('outfile', help='output file (PDB format)')
+    parser.add_argument('-p', '--processes', help='number of worker processes: the file is split into chunks at '
+                                                  'residue boundaries, which are renumbered in parallel', type=int,
+                        default=1)
+    WarningLog.add_arguments(parser)
     args = parser.parse_args()
-    
-    new_atom_nums = {}
-    atom_num = 1
-    
-    with open(args.infile, "r") as f, open(args.outfile, "w") as of:
-        for line in f:
-            if len(line) >= 13 and (line[:6] == 'ATOM  ' or line[:6] == 'HETATM'):
-                oldnum = line[6:11]
-                if line[16] != ' ' and oldnum.strip() != '0' and oldnum in new_atom_nums: # alternate location
-                    newnum = new_atom_nums[oldnum]
-                else:
-                    newnum = '%5d' % atom_num
-                    atom_num += 1
-                    new_atom_nums[oldnum] = newnum
-                line = line[:6] + newnum + line[11:]
-                
-            elif line[0:6] == "CONECT":
-                newline = 'CONECT'
-                for ind in [6, 11, 16, 21, 26]:
-                    if len(line) >= ind + 5:
-                        if line[ind:ind+5].strip() != '0' and line[ind:ind+5] in new_atom_nums:
-                            newnum = new_atom_nums[line[ind:ind+5]]
-                        else:
-                            print 'Warning: Atom serial number %s was found in CONECT record but the corresponding atom could not be identified.' % line[ind:ind+5]
-                            newnum = '    0'
-                        newline += newnum
-                line = newline + '\n'
-                
-            of.write(line)
+    WarningLog.configure(args)
+
+    if args.processes > 1:
+        renumber_parallel(args.infile, args.outfile, args.processes)
+    else:
+        renumber_file(args.infile, args.outfile)
+
+    WarningLog.report()
+
+
+def renumber_file(infile, outfile):
+
+    # The file is streamed through in blocks of lines. Only the map from old to new serial numbers, with an entry for
+    # each serial number found in a prescan of the file, is held throughout.
+
+    new_atom_nums = serial_map(infile)
+    atom_num = 0
+
+    with CompressedFiles.open_file(infile, "r") as f, CompressedFiles.open_file(outfile, "w") as of:
+        for data in read_blocks(f):
+            s = PdbArrays.PdbStructure(data)
+            atom_num = renumber_block(s, new_atom_nums, atom_num)
+            s.write(of)
+
+
+def renumber_block(s, new_atom_nums, atom_num):
+    # Renumber the atoms of s on from atom_num, and fix up its CONECT records, updating new_atom_nums. Returns the last
+    # number allocated.
+    try:
+        atom_num = renumber(s, new_atom_nums, atom_num)
+    except ValueError:
+        too_many_atoms()
+    for message in fix_conects(s, new_atom_nums):
+        WarningLog.warn('CONECT atom not found', message)
+    return atom_num
+
+
+def too_many_atoms():
+    print 'Error: the file has more atoms than can be numbered in a PDB file (%d).' % PdbArrays.hy36_max(5)
+    quit()
+
+
+def read_blocks(f):
+    while True:
+        data = ''.join(itertools.islice(f, STREAM_LINES))
+        if not data:
+            break
+        yield data
+
+
+def serial_map(infile):
+    # A SerialMap holding each old serial number in the file
+    serials = []
+    with CompressedFiles.open_file(infile, "r") as f:
+        for data in read_blocks(f):
+            raw = np.array(data.splitlines())
+            rec = PdbArrays.columns(raw.astype('S%d' % max(PdbArrays.PDB_LINE_WIDTH, raw.dtype.itemsize)))
+            atoms = np.in1d(rec['record'], ['ATOM  ', 'HETATM'])
+            serials.append(np.unique(PdbArrays.column_hy36(5, rec['serial'][atoms])))
+    return SerialMap(np.concatenate(serials) if serials else [])
+
+
+class SerialMap(object):
+    """Map from old to new atom serial numbers, with an entry for each of the given old numbers.
+
+    The old numbers are held sorted, so that the map is sized by the number of atoms rather than by the largest serial
+    number, which in hybrid-36 may be far beyond it. Indexing with old numbers gives their new numbers, or -1 for
+    numbers that have not been allocated one or are not in the map.
+    """
+
+    def __init__(self, serials):
+        self.serials = np.unique(np.r_[0, np.maximum(serials, 0)].astype(np.int64))
+        self.new = -np.ones(len(self.serials), dtype=np.int64)
+
+    def __getitem__(self, old):
+        pos = np.minimum(np.searchsorted(self.serials, old), len(self.serials) - 1)
+        return np.where(self.serials[pos] == old, self.new[pos], -1)
+
+    def __setitem__(self, old, values):
+        self.new[np.searchsorted(self.serials, old)] = values
+
+    def extend(self, serials):
+        # Add entries, with no new number yet, for those of the given old numbers that are not in the map
+        serials = np.maximum(serials, 0).astype(np.int64)
+        pos = np.minimum(np.searchsorted(self.serials, serials), len(self.serials) - 1)
+        missing = np.unique(serials[self.serials[pos] != serials])
+        if len(missing):
+            pos = np.searchsorted(self.serials, missing)
+            self.serials = np.insert(self.serials, pos, missing)
+            self.new = np.insert(self.new, pos, -1)
+
+
+def renumber(s, new_atom_nums, atom_num):
+    # Number the atoms in s on from atom_num, updating new_atom_nums. Returns the last number allocated.
+
+    sel = s.lengths >= 13
+    rec = s.select(sel)
+    newnums, atom_num = number_atoms(PdbArrays.column_hy36(5, rec['serial']), rec['altloc'], new_atom_nums, atom_num)
+    rec['serial'] = PdbArrays.format_hy36(5, newnums)
+    s.update(sel, rec)
+    return atom_num
+
+
+def number_atoms(old, altloc, new_atom_nums, atom_num):
+    # New serial numbers, numbering on from atom_num, for atoms with the given old serial numbers and alternate
+    # location indicators, updating new_atom_nums. Returns the numbers and the last number allocated.
+
+    old = np.maximum(old, 0)
+    pos = np.arange(len(old))
+
+    # Order the atoms by old serial number, then position, and mark the first and last of each group
+
+    order = np.lexsort((pos, old))
+    sorted_old = old[order]
+    group_first = np.r_[True, sorted_old[1:] != sorted_old[:-1]] if len(old) else np.zeros(0, dtype=bool)
+    group_last = np.r_[sorted_old[1:] != sorted_old[:-1], True] if len(old) else np.zeros(0, dtype=bool)
+
+    # An alternate location of an atom already seen, here or in an earlier block, keeps the serial number allocated
+    # to the first location
+
+    first_here = np.zeros(len(old), dtype=bool)
+    first_here[order[group_first]] = True
+    seen = ~first_here | (new_atom_nums[old] >= 0)
+    reuse = seen & (altloc != ' ') & (old != 0)
+    numbered = ~reuse
+    newnums = atom_num + np.cumsum(numbered)
+
+    # Within each group, in file order, carry the most recently allocated number forward. A group that starts with
+    # a reused number takes it from the map.
+
+    marker = numbered[order] | group_first
+    last = np.maximum.accumulate(np.where(marker, pos, -1)) if len(old) else pos
+    source = order[last]
+    newnums[order] = np.where(numbered[source], newnums[source], new_atom_nums[old[source]])
+
+    new_atom_nums[old[order[group_last]]] = newnums[order[group_last]]
+    return newnums, atom_num + np.count_nonzero(numbered)
+
+
+def renumber_parallel(infile, outfile, processes):
+    # The old serial number and alternate location of every atom are read from a scan of the text, and the new numbers
+    # are allocated to them all at once, as renumber would allocate them. The file is then split into chunks at
+    # residue boundaries, and each chunk is given its slice of the new numbers to write in parallel. CONECT records
+    # are fixed up from the final map of old to new numbers.
+
+    with CompressedFiles.open_file(infile, "r") as f:
+        data = f.read()
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = PdbArrays.line_bounds(buf)
+    atoms = PdbArrays.is_line_record(buf, starts, ends, 'ATOM  ', 'HETATM') & (ends - starts >= 13)
+    starts, ends = starts[atoms], ends[atoms]
+    old = PdbArrays.column_hy36(5, PdbArrays.gather_column(buf, starts, 6, 5, ends))
+    altloc = PdbArrays.gather_column(buf, starts, 16, 1, ends)
+
+    new_atom_nums = SerialMap(old)
+    newnums, atom_num = number_atoms(old, altloc, new_atom_nums, 0)
+    if atom_num > PdbArrays.hy36_max(5):
+        too_many_atoms()
+
+    jobs = []
+    for start, end in PdbArrays.residue_chunks(data, processes):
+        first, last = np.searchsorted(starts, [start, end])
+        conect_map = new_atom_nums if data.find('CONECT', start, end) >= 0 else None
+        jobs.append((data[start:end], newnums[first:last], conect_map))
+    results = PdbArrays.map_models(renumber_chunk, jobs, (), processes)
+
+    if any(result is None for result in results):
+        print 'Error: atoms were not counted consistently between chunks. Try again without -p.'
+        quit()
+
+    with CompressedFiles.open_file(outfile, "w") as of:
+        for text, messages in results:
+            for message in messages:
+                WarningLog.warn('CONECT atom not found', message)
+            of.write(text)
+
+
+def renumber_chunk(job):
+    text, newnums, conect_map = job
+    s = PdbArrays.PdbStructure(text)
+    sel = s.lengths >= 13
+    if np.count_nonzero(sel) != len(newnums):
+        return None
+    rec = s.select(sel)
+    rec['serial'] = PdbArrays.format_hy36(5, newnums)
+    s.update(sel, rec)
+    messages = fix_conects(s, conect_map) if conect_map is not None else []
+    return s.text(), messages
+
+
+def fix_conects(s, new_atom_nums):
+    # Renumber the atoms in the CONECT records of s. Returns a warning for each atom that cannot be found.
+    messages = []
+    for i, line in enumerate(s.lines):
+        if line[0:6] == "CONECT":
+            newline = 'CONECT'
+            for ind in [6, 11, 16, 21, 26]:
+                if len(line) >= ind + 5:
+                    old = PdbArrays.hy36decode(5, line[ind:ind+5])
+                    new = new_atom_nums[old] if old > 0 else -1
+                    if new >= 0:
+                        newnum = PdbArrays.hy36encode(5, int(new))
+                    else:
+                        messages.append('Atom serial number %s was found in CONECT record but the corresponding atom could not be identified.' % line[ind:ind+5])
+                        newnum = '    0'
+                    newline += newnum
+            s.lines[i] = newline
+    return messages
 
 if __name__ == "__main__":
     main(sys.argv)
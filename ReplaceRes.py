@@ -24,131 +24,311 @@ __author__ = 'William Lees'
 __docformat__ = "restructuredtext en"
 
 import sys
+import os
 import argparse
+import StringIO
+import CompressedFiles
+import WarningLog
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+ResidueIndex = LazyModule('ResidueIndex')
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Replace specified residues in the input file with the corresponding residues in the replacement file.')
     parser.add_argument('infile', help='input file (PDB format)')
     parser.add_argument('outfile', help='output file (PDB format)')
-    parser.add_argument('replacement', help='replacement file (PDB format)')
-    parser.add_argument('chain', help='chain in which the replacement occurs')
-    parser.add_argument('startnum', help='number of first residue to replace')
-    parser.add_argument('endnum', help='number of last residue to replace')
+    parser.add_argument('replacement', nargs='?', help='replacement file (PDB format)')
+    parser.add_argument('chain', nargs='?', help='chain in which the replacement occurs')
+    parser.add_argument('startnum', nargs='?', help='number of first residue to replace')
+    parser.add_argument('endnum', nargs='?', help='number of last residue to replace')
+    parser.add_argument('-s', '--spec', nargs=4, action='append', default=[],
+                        metavar=('REPLACEMENT', 'CHAIN', 'STARTNUM', 'ENDNUM'),
+                        help='a further range of residues to replace, and the file to replace them from. May be '
+                             'repeated: all ranges are replaced in a single pass over the input file')
     parser.add_argument('-a', '--remove_anisou', help='remove ANISOU records, if found', action='store_true')
+    parser.add_argument('-i', '--index', help='use a residue index alongside the input file (building it if necessary) '
+                                              'to parse only the residues that are replaced', action='store_true')
+    parser.add_argument('-e', '--ensemble', help='splice each of a set of replacement models into the input file in '
+                                                 'turn, writing an output file for each. replacement is then a list of '
+                                                 'files, wildcard patterns or directories, separated by commas, and '
+                                                 'outfile the directory to write the output files to, each named '
+                                                 'after its replacement file', action='store_true')
+    parser.add_argument('-p', '--processes', help='with -e, number of worker processes used to write the output '
+                                                  'files in parallel', type=int, default=1)
+    WarningLog.add_arguments(parser)
     args = parser.parse_args()
+    WarningLog.configure(args)
+
+    positional = [args.replacement, args.chain, args.startnum, args.endnum]
+    if any(positional) and not all(positional):
+        parser.error('replacement, chain, startnum and endnum must be given together')
+    if not any(positional) and not args.spec:
+        parser.error('no residues to replace: give replacement, chain, startnum and endnum, or use -s')
+
+    if args.ensemble:
+        if not all(positional):
+            parser.error('-e requires replacement, chain, startnum and endnum')
+        replace_ensemble(args.infile, args.outfile, args.replacement, [positional] + args.spec, args.remove_anisou,
+                         args.processes)
+        WarningLog.report()
+        return
+
+    specs = read_specs(([positional] if all(positional) else []) + args.spec)
+
+    index = args.index and not args.remove_anisou
+    if index and PdbArrays.same_file(args.infile, args.outfile):
+        print 'Warning: the residue index cannot be used when outfile is the same as infile. The whole file will be ' \
+              'processed.'
+        index = False
+    if index and ResidueIndex.usable(args.infile):
+        replace_indexed(args.infile, args.outfile, specs)
+        WarningLog.report()
+        return
+
+    s = PdbArrays.read_pdb(args.infile)
+    keep, insert = replace(s, specs, args.remove_anisou)
+
+    with CompressedFiles.open_file(args.outfile, "w") as of:
+        s.write(of, keep=keep, insert=insert)
+
+    WarningLog.report()
+
+
+def read_specs(args, replacements=None):
+    # Each spec is (replacement structure, chain, first id, last id). Residue ids are fixed up to be right-justified
+    # 4-digit residue numbers followed by insertion letter or space. Each replacement file is read once. replacements
+    # may give the structures of some of the files already.
+
+    replacements = dict(replacements or {})
+    specs = []
+    for replacement, chain_id, startnum, endnum in args:
+        if replacement not in replacements:
+            replacements[replacement] = PdbArrays.read_pdb(replacement)
+        specs.append((replacements[replacement], chain_id, format_resnum(startnum), format_resnum(endnum)))
+
+    for i, (_, chain_1, first_1, last_1) in enumerate(specs):
+        for _, chain_2, first_2, last_2 in specs[:i]:
+            if chain_1 == chain_2 and resnum_key(first_1) <= resnum_key(last_2) \
+                    and resnum_key(first_2) <= resnum_key(last_1):
+                print 'Error: residues %s to %s of chain %s overlap residues %s to %s.' % (
+                    first_1.strip(), last_1.strip(), chain_1, first_2.strip(), last_2.strip())
+                quit()
+
+    return specs
+
+
+def replace(s, specs, remove_anisou=False):
+    # Replace the residues of each spec in s. Returns the keep and insert arguments with which to write s.
+    cyx_sg_atoms, cyx_cb_atoms = cyx_atoms(s)
+    keep, insert = splice(s, specs, cyx_sg_atoms, cyx_cb_atoms)
+    if remove_anisou:
+        keep &= s.record_types != "ANISOU"
+    return keep, insert
+
+
+def replace_indexed(infile, outfile, specs):
+    # Parse only the CYX residues and the spans of the file holding the residues to replace: copy the rest in bulk
+    index = ResidueIndex.load_index(infile)
+    keys = index.keys()
+
+    # Byte range of each spec, merging any that overlap
+    segments = []
+    for spec in specs:
+        r, chain_id, first_id, last_id = spec
+        in_range = np.nonzero((index.chain == chain_id) & (keys >= resnum_key(first_id))
+                              & (keys <= resnum_key(last_id)))[0]
+        if len(in_range):
+            segments.append([index.offset[in_range[0]], index.offset[in_range[-1]] + index.length[in_range[-1]],
+                             [spec]])
+    segments.sort(key=lambda seg: seg[0])
+    merged = []
+    for seg in segments:
+        if merged and seg[0] < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], seg[1])
+            merged[-1][2].extend(seg[2])
+        else:
+            merged.append(seg)
+
+    with open(infile, "rb") as f, CompressedFiles.open_file(outfile, "wb") as of:
+        cyx = np.nonzero(np.char.strip(index.resname) == 'CYX')[0]
+        cyx_sg_atoms, cyx_cb_atoms = cyx_atoms(PdbArrays.PdbStructure(''.join(index.read_block(f, i) for i in cyx)))
+
+        pos = 0
+        for start, end, seg_specs in merged:
+            ResidueIndex.copy_range(f, of, pos, start)
+            f.seek(start)
+            s = PdbArrays.PdbStructure(f.read(end - start))
+            keep, insert = splice(s, seg_specs, cyx_sg_atoms, cyx_cb_atoms)
+            s.write(of, keep=keep, insert=insert)
+            pos = end
+        ResidueIndex.copy_range(f, of, pos, index.size)
+
+
+def replace_ensemble(infile, outdir, replacement, spec_args, remove_anisou=False, processes=1):
+    # Splice each of the models named by replacement into infile, writing the results to outdir. Ranges given with the
+    # same replacement are taken from each model in turn; other ranges are taken from their own files every time.
+    # The input file is parsed once, into a template that holds the structure, the text of its lines and the ranges to
+    # replace, which is sent to each worker process once.
+
+    models = PdbArrays.expand_files(replacement.split(','))
+    if not models:
+        print 'Error: no replacement files were found.'
+        quit()
+    outfiles = PdbArrays.output_files(models, outdir, kind='replacement file')
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    specs = read_specs(spec_args, {replacement: None})
+    s = PdbArrays.read_pdb(infile)
+    keep = np.ones(len(s.lines), dtype=bool)
+    if remove_anisou:
+        keep &= s.record_types != "ANISOU"
+    template = (s, s.text_lines(), keep, cyx_atoms(s), specs)
+
+    results = PdbArrays.map_models(replace_model, zip(models, outfiles), (), processes, shared=template)
+
+    for model, (messages, log) in zip(models, results):
+        print '%s:' % model
+        sys.stdout.write(messages)
+        WarningLog.log.merge(log)
 
-    if len(argv) != 7:
-        print "usage: python replace_res.py <input file> <modeller output file> <output file> <chain> <starting_number> <ending_number>."
-        sys.exit(0)
 
-    chain_id = args.chain
+def replace_model(files, template):
+    # Splice one model into the template, given the model's file and its output file, returning the messages printed
+    # and the warnings given. These are collected rather than printed so that those of models written in parallel are
+    # not interleaved.
+    model, outfile = files
+    s, lines, template_keep, (cyx_sg_atoms, cyx_cb_atoms), specs = template
+    r = PdbArrays.read_pdb(model)
+    specs = [(r if rep is None else rep, chain_id, first_id, last_id) for rep, chain_id, first_id, last_id in specs]
 
+    saved = WarningLog.log, sys.stdout
+    WarningLog.log = WarningLog.WarningLog(WarningLog.log.examples, WarningLog.log.verbose)
+    sys.stdout = StringIO.StringIO()
+    try:
+        keep, insert = splice(s, specs, cyx_sg_atoms, cyx_cb_atoms)
+        keep &= template_keep
+        with CompressedFiles.open_file(outfile, "w") as of:
+            of.write(s.text(keep, insert, lines))
+        messages, log = sys.stdout.getvalue(), WarningLog.log
+    finally:
+        WarningLog.log, sys.stdout = saved
+    return messages, log
+
+
+def cyx_atoms(s):
     # Determine the ATOM ids of SG and atoms in CYX/CYS residues so that we can use them later if any are involved in insertions
     # This preserves the integrity of disulphide bond CONECT records
 
-    cyx_sg_atoms = {}
-    cyx_cb_atoms = {}
-    with open(args.infile, "r") as f:
-        for line in f:
-            if len(line) > 20 and line[0:4] == "ATOM" and (line[17:20] == "CYX" or line[17:20] == "CYX"):
-                if "SG" in line[12:16]:
-                    cyx_sg_atoms["%s %s" % (line[21], line[22:27])] = line[6:11]
-                elif "CB" in line[12:16]:
-                    cyx_cb_atoms["%s %s" % (line[21], line[22:27])] = line[6:11]
-
-    # Fix up first and last ids to be right-justified 4-digit residue numbers followed by insertion letter or space
-    
-    first_id = args.startnum
-    if first_id[-1:].isdigit:
-        first_id = first_id + ' '
-    if len(first_id)  < 5:
-        first_id = ' '*(5 - len(first_id)) + first_id
-        
-    last_id = args.endnum
-    if last_id[-1:].isdigit:
-        last_id = last_id + ' '
-    if len(last_id)  < 5:
-        last_id = ' '*(5 - len(last_id)) + last_id
-
-    with open(args.infile, "r") as f, \
-            open(args.replacement, "r") as rf,  \
-            open(args.outfile, "w") as of:
-
-        # Position replacement file at first residue to replace
-        rep_line = rf.readline()
-        rep_resnum = 0
-        while rep_line:
-            if rep_line[0:4] == "ATOM":
-                rep_resnum = rep_line[22:27]
-                if rep_resnum == first_id:
-                    break
-            rep_line = rf.readline()
-            
-        line = f.readline()
-        
-        while line:
-            if line[0:4] == "ATOM":
-                resnum = line[22:27]
-                chain = line[21]
-                if chain != chain_id or compare_resnums(first_id, resnum) > 0 or compare_resnums(resnum, last_id) > 0:
-                    of.write(line)
-                    line = f.readline()
+    rec = s.records
+    cyx = np.char.startswith(rec['record'], 'ATOM') & (s.atoms['resname'] == 'CYX')
+    sg = cyx & (np.char.find(rec['name'], 'SG') >= 0)
+    cb = cyx & ~sg & (np.char.find(rec['name'], 'CB') >= 0)
+    cyx_sg_atoms = dict(zip(residue_labels(rec[sg]), rec['serial'][sg].tolist()))
+    cyx_cb_atoms = dict(zip(residue_labels(rec[cb]), rec['serial'][cb].tolist()))
+    return cyx_sg_atoms, cyx_cb_atoms
+
+
+def splice(s, specs, cyx_sg_atoms, cyx_cb_atoms):
+    # Replace residues first_id..last_id of chain_id in s with the corresponding residues in r, for each spec
+    # (r, chain_id, first_id, last_id). Returns the keep and insert arguments with which to write s.
+
+    rec = s.records
+    is_atom = np.char.startswith(rec['record'], 'ATOM')
+    keys = PdbArrays.residue_keys(rec)
+    keep = np.ones(len(s.lines), dtype=bool)
+    insert = {}
+
+    for r, chain_id, first_id, last_id in specs:
+        replaced = is_atom & (rec['chain'] == chain_id) & (keys >= resnum_key(first_id)) & (keys <= resnum_key(last_id))
+        insert.update(_splice_range(s, keys, replaced, r, first_id, cyx_sg_atoms, cyx_cb_atoms))
+        keep[s.atom_lines[replaced]] = False
+
+    return keep, insert
+
+
+def _splice_range(s, keys, replaced, r, first_id, cyx_sg_atoms, cyx_cb_atoms):
+    # The replacement records for the atoms selected by replaced, keyed by the line before which they are written
+
+    rec = s.records
+
+    # The first atom of each residue to replace
+
+    replaced_idx = np.nonzero(replaced)[0]
+    starts = replaced_idx[np.r_[True, rec['resid'][replaced_idx][1:] != rec['resid'][replaced_idx][:-1]]] \
+        if len(replaced_idx) else replaced_idx
+
+    # Replacement atoms, from the first residue to replace
+
+    rep_raw = r.raw.copy()
+    rep = PdbArrays.columns(rep_raw)
+    rep_atoms = np.nonzero(np.char.startswith(rep['record'], 'ATOM'))[0]
+    at_first = np.nonzero(rep['resid'][rep_atoms] == first_id)[0]
+    rep_atoms = rep_atoms[at_first[0]:] if len(at_first) else rep_atoms[:0]
+    rep_keys = PdbArrays.residue_keys(rep[rep_atoms])
+
+    insert = {}
+    pos = 0
+    for start in starts:
+        resnum = rec['resid'][start]
+        resname = rec['resname'][start][:3]
+        chain = rec['chain'][start]
+
+        # The replacement atoms up to and including this residue
+        end = pos
+        while end < len(rep_atoms) and rep_keys[end] <= keys[start]:
+            end += 1
+        chunk = rep_atoms[pos:end]
+        pos = end
+
+        old_rep_resnum = -1
+        for k in chunk:
+            rep_resname = rep['resname'][k][:3]
+            rep_resnum = rep['resid'][k]
+            if resname == "HIS":
+                WarningLog.warn('HIS replaced', "replacing HIS residue at %s: fix protonation." % resnum)
+            if rep_resname == "HIS":
+                WarningLog.warn('HIS inserted', "inserting HIS residue at %s: fix protonation." % resnum)
+            if rep_resnum != old_rep_resnum:
+                if rep_resnum == resnum:
+                    if resname != rep_resname:
+                        print "%s %s %s -> %s" % (rep_resnum, chain, resname, rep_resname)
                 else:
-                    rep_resname = rep_line[17:20]
-                    rep_resnum = rep_line[22:27]
-                    old_rep_resnum = -1
-                    while rep_line and compare_resnums(rep_resnum, resnum) <= 0:
-                        if rep_line[0:4] == "ATOM":
-                            resname = line[17:20]
-                            if resname == "HIS":
-                                print "Warning: replacing HIS residue at %s: fix protonation." % resnum
-                            if rep_resname == "HIS":
-                                print "Warning: inserting HIS residue at %s: fix protonation." % resnum
-                            if rep_resnum != old_rep_resnum:
-                                if rep_resnum == resnum:
-                                    if resname != rep_resname:
-                                        print "%s %s %s -> %s" % (rep_resnum, chain, resname, rep_resname)
-                                else:
-                                    print "%s %s gap -> %s" % (rep_resnum, chain, rep_resname)
-
-                            if "SG" in rep_line[12:16] and "%s %s" % (rep_line[21], rep_line[22:27]) in cyx_sg_atoms:
-                                atom_num = cyx_sg_atoms["%s %s" % (rep_line[21], rep_line[22:27])]
-                            elif "CB" in rep_line[12:16] and "%s %s" % (rep_line[21], rep_line[22:27]) in cyx_cb_atoms:
-                                atom_num = cyx_cb_atoms["%s %s" % (rep_line[21], rep_line[22:27])]
-                            else:
-                                atom_num = "%5d" % 0
-
-                            rep_line = rep_line[:6] + atom_num + rep_line[11:21] + chain + rep_line[22:]
-                            of.write(rep_line)
-                        rep_line = rf.readline()
-                        if rep_line[0:4] == "ATOM":
-                            rep_resname = rep_line[17:20]
-                            old_rep_resnum = rep_resnum
-                            rep_resnum = rep_line[22:27]
-                    prev_resnum = resnum
-                    # Position input file at next residue (skip all remaining ATOM records of the input file)
-                    while line and resnum == prev_resnum:
-                        line = f.readline()
-                        if line[0:4] == "ATOM":
-                            resnum = line[22:27]
-                        # write records at the end of the specified replacement residue range (before we get a
-                        # new residue number from the next "ATOM" record) to preserve "TER", "ENDMDL", "MODEL" lines
-                        else:
-                            of.write(line)
+                    print "%s %s gap -> %s" % (rep_resnum, chain, rep_resname)
+            old_rep_resnum = rep_resnum
+
+        atom_nums = []
+        for label, name in zip(residue_labels(rep[chunk]), rep['name'][chunk]):
+            if "SG" in name and label in cyx_sg_atoms:
+                atom_nums.append(cyx_sg_atoms[label])
+            elif "CB" in name and label in cyx_cb_atoms:
+                atom_nums.append(cyx_cb_atoms[label])
             else:
-                if (not args.remove_anisou) or line[0:6] != "ANISOU": 
-                    of.write(line)                
-                line = f.readline()
-
-def compare_resnums(resnum1, resnum2):
-    num1 = 1000 * int(resnum1[:-1]) + ord(resnum1[-1:])
-    num2 = 1000 * int(resnum2[:-1]) + ord(resnum2[-1:])
-    
-    if num1 < num2:
-        return -1
-    if num2 < num1:
-        return 1
-    return 0
+                atom_nums.append("%5d" % 0)
+        rep['serial'][chunk] = atom_nums
+        rep['chain'][chunk] = chain
+        insert[s.atom_lines[start]] = PdbArrays.record_lines(rep_raw[chunk])
+
+    return insert
+
+
+def residue_labels(rec):
+    # chain and residue number of each atom, as used to key the CYX atom maps
+    return np.char.add(np.char.add(rec['chain'], ' '), rec['resid']).tolist()
+
+
+def format_resnum(resnum):
+    if resnum[-1:].isdigit():
+        resnum = resnum + ' '
+    if len(resnum) < 5:
+        resnum = ' '*(5 - len(resnum)) + resnum
+    return resnum
+
+
+def resnum_key(resnum):
+    return 1000 * int(resnum[:-1]) + ord(resnum[-1:])
 
 if __name__ == "__main__":
     main(sys.argv)
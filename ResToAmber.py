@@ -4,76 +4,165 @@ __docformat__ = "restructuredtext en"
 import sys
 import os
 import argparse
+import csv
+import CompressedFiles
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
 
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Analyse the protonation of histidines in a PDB file and produce a control file for ConvertRes'
             ' that will rename HIS residues to Amber standards. Analyse SSBOND records and produce control file records that will rename corresponding'
             ' CYS records to CYX.')
-    parser.add_argument('infile', help='input file (PDB format')
-    parser.add_argument('outfile', help='output file (ConvertRes control file format)')
+    parser.add_argument('infile', nargs='+', help='input file (PDB format). With -b or -t, one or more input files, '
+                                                  'wildcard patterns or directories')
+    parser.add_argument('outfile', help='output file (ConvertRes control file format). With -b, the directory to '
+                                        'write the control files to')
+    parser.add_argument('-b', '--batch', help='analyse a batch of input files, writing a control file for each to the '
+                                              'outfile directory', action='store_true')
+    parser.add_argument('-t', '--table', help='analyse a batch of input files, writing a single table to outfile '
+                                              '(CSV), in which each line of each control file is preceded by the name '
+                                              'of the input file', action='store_true')
+    parser.add_argument('-p', '--processes', help='number of worker processes used to analyse the models of a '
+                                                  'multi-model (MODEL/ENDMDL) file, or the files of a batch, in '
+                                                  'parallel', type=int, default=1)
     args = parser.parse_args()
-    
-    histnum = None
-    found_HD1 = False
-    found_HE2 = False
+
+    if len(args.infile) > 1 and not (args.batch or args.table):
+        parser.error('only one input file may be given unless -b or -t is specified')
+
+    if args.batch or args.table:
+        analyse_batch(args.infile, args.outfile, args.table, args.processes)
+        return
+
+    rows, messages = analyse(args.infile[0], args.processes)
+    for message in messages:
+        print message
+    write_control(args.outfile, rows)
+
+
+def analyse(infile, processes=1):
+    # Analyse a PDB file. Returns the control file rows (residue number, chain, residue name), and the messages to
+    # report.
+
     ssbonds = {}
-    
-    with open(args.infile, "r") as f, open(args.outfile, "w") as cf:
-        for line in f:
-            if len(line) >= 26 and line[:6] == 'ATOM  ':
-                resname = line[17:20]
-                resnum = line[22:27].strip()
-                chain = line[21]
-                atomname = line[12:16].strip()
-                if histnum and histnum != resnum:
-                    histype = None
-                    if found_HD1 and found_HE2:
-                        histype = 'HIP'
-                    elif found_HD1:
-                        histype = 'HID'
-                    elif found_HE2:
-                        histype = 'HIE'
-
-                    if histype:
-                        cf.write("%s %s %s\n" % (histnum, hischain, histype))
-                    else:
-                        print 'HIS at chain %s residue %s has no HD1 or HE2.' % (chain, histnum)
-                    histnum = None
-                if resname == 'HIS':
-                    if not histnum:
-                        found_HD1 = False
-                        found_HE2 = False
-                        histnum = resnum
-                        hischain = chain
-                    if atomname == 'HD1':
-                        found_HD1 = True
-                    elif atomname == 'HE2':
-                        found_HE2 = True
-            elif len(line) >= 35 and line[0:6] == 'SSBOND':
-                chain1 = line[15]
-                num1 = line[17:22].strip()
-                chain2 = line[29]
-                num2 = line[31:35].strip()
-                ssbonds[chain1+num1] = (chain1, num1)
-                ssbonds[chain2+num2] = (chain2, num2)
-
-        if histnum and histnum != resnum:
-            histype = None
-            if found_HD1 and found_HE2:
-                histype = 'HIP'
-            elif found_HD1:
-                histype = 'HID'
-            elif found_HE2:
-                histype = 'HIE'
-
-            if histype:
-                cf.write('%d %s %s\n' % (histnum, hischain, histype))
-            else:
-                print 'HIS at %d has no HD1 or HE2.' % histnum
-
-        for (chain, num) in ssbonds.values():
-            cf.write("%s %s %s\n" % (num, chain, 'CYX'))
+    messages = []
+
+    with CompressedFiles.open_file(infile, "r") as f:
+        data = f.read()
+
+    header, models, trailer = PdbArrays.split_models(data)
+
+    if not models:
+        histidines = classify_histidines(data)
+    else:
+        # The protonation of each HIS is taken from the first model in which it is found
+        histidines = []
+        found = {}
+        for i, model_histidines in enumerate(PdbArrays.map_models(classify_histidines, models, (), processes)):
+            for histnum, hischain, histype in model_histidines:
+                if (histnum, hischain) not in found:
+                    found[(histnum, hischain)] = (histype, i + 1)
+                    histidines.append((histnum, hischain, histype))
+                elif found[(histnum, hischain)][0] != histype:
+                    messages.append('Warning: HIS at chain %s residue %s is %s in model %d but %s in model %d.' % (
+                        hischain, histnum, found[(histnum, hischain)][0], found[(histnum, hischain)][1], histype, i + 1))
+
+    rows = []
+    for histnum, hischain, histype in histidines:
+        if histype:
+            rows.append((histnum, hischain, histype))
+        else:
+            messages.append('HIS at chain %s residue %s has no HD1 or HE2.' % (hischain, histnum))
+
+    for line in data.splitlines():
+        if len(line) >= 35 and line[0:6] == 'SSBOND':
+            chain1 = line[15]
+            num1 = line[17:22].strip()
+            chain2 = line[29]
+            num2 = line[31:35].strip()
+            ssbonds[chain1+num1] = (chain1, num1)
+            ssbonds[chain2+num2] = (chain2, num2)
+
+    for (chain, num) in ssbonds.values():
+        rows.append((num, chain, 'CYX'))
+
+    return rows, messages
+
+
+TABLE_COLUMNS = ['File', 'Residue', 'Chain', 'Name']
+
+
+def write_control(ctrlfile, rows):
+    with CompressedFiles.open_file(ctrlfile, "w") as cf:
+        for row in rows:
+            cf.write("%s %s %s\n" % row)
+
+
+def analyse_batch(patterns, outfile, table=False, processes=1):
+    # Analyse each input file, spreading the files over a pool of processes if requested. Messages are printed file
+    # by file, in the order in which the files were given.
+
+    infiles = PdbArrays.expand_files(patterns)
+    if not table:
+        outfiles = PdbArrays.output_files(infiles, outfile, control_name)
+        if not os.path.isdir(outfile):
+            os.makedirs(outfile)
+
+    results = PdbArrays.map_models(analyse, infiles, (), processes)
+
+    for infile, (rows, messages) in zip(infiles, results):
+        if messages:
+            print '%s:' % infile
+            for message in messages:
+                print message
+
+    if table:
+        with CompressedFiles.open_file(outfile, "wb") as cf:
+            writer = csv.writer(cf)
+            writer.writerow(TABLE_COLUMNS)
+            for infile, (rows, messages) in zip(infiles, results):
+                for row in rows:
+                    writer.writerow((infile,) + row)
+    else:
+        for controlfile, (rows, messages) in zip(outfiles, results):
+            write_control(controlfile, rows)
+
+
+def control_name(infile):
+    # The name of the control file written for infile in batch mode
+    return os.path.splitext(CompressedFiles.strip_suffix(os.path.basename(infile)))[0] + '.control'
+
+
+def classify_histidines(text):
+    # Classify each HIS residue by the protons present on its ring nitrogens. Returns the residue number, chain and
+    # Amber residue name (or None if neither proton is present) of each HIS, in file order.
+
+    s = PdbArrays.PdbStructure(text)
+    rec = s.records
+    atoms = s.atoms
+
+    his = (s.lengths >= 26) & s.is_record('ATOM  ') & (atoms['resname'] == 'HIS')
+    res_index = s.residue_index()
+    found_HD1 = np.zeros(len(s.res_starts), dtype=bool)
+    found_HE2 = np.zeros(len(s.res_starts), dtype=bool)
+    found_HD1[res_index[his & (atoms['name'] == 'HD1')]] = True
+    found_HE2[res_index[his & (atoms['name'] == 'HE2')]] = True
+
+    histidines = []
+    for r in np.unique(res_index[his]):
+        start = s.res_starts[r]
+        histype = None
+        if found_HD1[r] and found_HE2[r]:
+            histype = 'HIP'
+        elif found_HD1[r]:
+            histype = 'HID'
+        elif found_HE2[r]:
+            histype = 'HIE'
+        histidines.append((rec['resid'][start].strip(), rec['chain'][start], histype))
+    return histidines
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# One-letter codes of the standard amino acids, under their PDB names and the Amber names for their protonation states
+# and disulphide-bonded cysteine.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+res_codes = {}
+res_codes['ALA'] = 'A'
+res_codes['ARG'] = 'R'
+res_codes['ASN'] = 'N'
+res_codes['ASP'] = 'D'
+res_codes['ASH'] = 'D'
+res_codes['CYS'] = 'C'
+res_codes['CYX'] = 'C'
+res_codes['CYM'] = 'C'
+res_codes['GLU'] = 'E'
+res_codes['GLH'] = 'E'
+res_codes['GLN'] = 'Q'
+res_codes['GLY'] = 'G'
+res_codes['HIS'] = 'H'
+res_codes['HIE'] = 'H'
+res_codes['HID'] = 'H'
+res_codes['HIP'] = 'H'
+res_codes['ILE'] = 'I'
+res_codes['LEU'] = 'L'
+res_codes['LYS'] = 'K'
+res_codes['LYN'] = 'K'
+res_codes['MET'] = 'M'
+res_codes['PHE'] = 'F'
+res_codes['PRO'] = 'P'
+res_codes['SER'] = 'S'
+res_codes['THR'] = 'T'
+res_codes['TRP'] = 'W'
+res_codes['TYR'] = 'Y'
+res_codes['VAL'] = 'V'
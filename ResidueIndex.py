@@ -0,0 +1,176 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Byte-offset index of the residues in a PDB file, kept in a sidecar file alongside it.
+#
+# Each residue block (the consecutive ATOM/HETATM records of one chain and residue number, with any ANISOU records
+# that accompany them) is recorded with its byte offset and length, as are TER, MODEL, ENDMDL and END records. Tools
+# can then seek straight to the residues they need and copy the rest of the file in bulk. The sidecar is rebuilt
+# whenever the size or modification time of the PDB file no longer match those recorded in it.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import os
+import numpy as np
+import CompressedFiles
+
+INDEX_SUFFIX = '.residx.npz'
+
+_BOUNDARY_RECORDS = ['TER', 'MODEL', 'ENDMDL', 'END']
+
+COPY_CHUNK = 1 << 22
+
+
+class ResidueIndex(object):
+    """Residue blocks and boundary records of a PDB file.
+
+    For residue block i, chain[i], resid[i] (residue number and insertion code, columns 23-27) and resname[i] are
+    taken from its first record; offset[i] and length[i] locate the block in the file, and model[i] is the number
+    of MODEL records preceding it. boundary_record, boundary_offset and boundary_length do the same for TER, MODEL,
+    ENDMDL and END records.
+    """
+
+    _FIELDS = ['chain', 'resid', 'resname', 'offset', 'length', 'model',
+               'boundary_record', 'boundary_offset', 'boundary_length']
+
+    def __init__(self, size, mtime, **arrays):
+        self.size = size
+        self.mtime = mtime
+        for f in self._FIELDS:
+            setattr(self, f, arrays[f])
+
+    def __len__(self):
+        return len(self.offset)
+
+    def keys(self):
+        # Integer key ordering residues by sequence number, then insertion code (see PdbArrays.residue_keys)
+        resseq = np.char.strip(self.resid.astype('S4'))
+        resseq = np.where(resseq == '', '0', resseq).astype(np.int64)
+        icode = self.resid.astype('S5').view(np.uint8).reshape(-1, 5)[:, 4]
+        return resseq * 1000 + np.where(icode == 0, ord(' '), icode)
+
+    def read_block(self, f, i):
+        f.seek(self.offset[i])
+        return f.read(self.length[i])
+
+    def save(self, filename):
+        arrays = dict((f, getattr(self, f)) for f in self._FIELDS)
+        np.savez(filename, size=self.size, mtime=self.mtime, **arrays)
+
+
+def build_index(filename):
+    st = os.stat(filename)
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.nonzero(buf == ord('\n'))[0] + 1
+    if len(data) and data[-1] != '\n':
+        ends = np.append(ends, len(data))
+    starts = np.r_[0, ends[:-1]] if len(ends) else ends
+
+    # Gather columns 1-27 of every line, blanking anything past the end of the line
+    padded = np.concatenate((buf, np.zeros(27, dtype=np.uint8)))
+    cols = starts[:, None] + np.arange(27)
+    text = padded[cols]
+    text[(cols >= ends[:, None]) | (text == ord('\n')) | (text == ord('\r'))] = 0
+    text = np.ascontiguousarray(text)
+
+    record = np.char.strip(text[:, 0:6].copy().view('S6').ravel())
+    is_atom = (record == 'ATOM') | (record == 'HETATM')
+    is_boundary = np.in1d(record, _BOUNDARY_RECORDS)
+
+    # ANISOU records belong with the atom they follow
+    line_no = np.arange(len(record))
+    owner = np.maximum.accumulate(np.where(is_atom | is_boundary, line_no, -1)) if len(record) else line_no
+    member = is_atom | ((record == 'ANISOU') & (owner >= 0) & is_atom[np.maximum(owner, 0)])
+
+    atom_lines = np.nonzero(is_atom)[0]
+    chain = text[atom_lines, 21].copy().view('S1')
+    resid = text[atom_lines, 22:27].copy().view('S5').ravel()
+    resname = text[atom_lines, 17:21].copy().view('S4').ravel()
+
+    segment = np.cumsum(is_boundary)[atom_lines]
+    new_block = np.r_[True, (chain[1:] != chain[:-1]) | (resid[1:] != resid[:-1]) | (segment[1:] != segment[:-1])] \
+        if len(atom_lines) else np.zeros(0, dtype=bool)
+    atom_block = np.cumsum(new_block) - 1
+
+    # Each member line takes the block of its owning atom; blocks are contiguous runs of member lines
+    member_lines = np.nonzero(member)[0]
+    member_block = atom_block[np.searchsorted(atom_lines, owner[member_lines])]
+    last = np.r_[member_block[1:] != member_block[:-1], True] if len(member_lines) else np.zeros(0, dtype=bool)
+
+    first_atom = atom_lines[new_block]
+    last_line = member_lines[last]
+    models = np.cumsum(record == 'MODEL')
+
+    boundary_lines = np.nonzero(is_boundary)[0]
+
+    return ResidueIndex(
+        st.st_size, st.st_mtime,
+        chain=chain.ravel()[new_block],
+        resid=resid[new_block],
+        resname=resname[new_block],
+        offset=starts[first_atom],
+        length=ends[last_line] - starts[first_atom],
+        model=models[first_atom],
+        boundary_record=record[boundary_lines],
+        boundary_offset=starts[boundary_lines],
+        boundary_length=ends[boundary_lines] - starts[boundary_lines])
+
+
+def load_index(filename):
+    # Load the sidecar index of a PDB file, building (and saving) it if it is missing or out of date
+
+    st = os.stat(filename)
+    index_file = filename + INDEX_SUFFIX
+    if os.path.isfile(index_file):
+        try:
+            stored = np.load(index_file)
+            if int(stored['size']) == st.st_size and float(stored['mtime']) == st.st_mtime:
+                return ResidueIndex(int(stored['size']), float(stored['mtime']),
+                                    **dict((f, stored[f]) for f in ResidueIndex._FIELDS))
+        except (IOError, ValueError, KeyError):
+            pass
+
+    index = build_index(filename)
+    try:
+        index.save(index_file)
+    except (IOError, OSError):
+        print 'Warning: could not write residue index %s' % index_file
+    return index
+
+
+def usable(infile, outfile=None):
+    # True if the index can be used to read infile (and, if given, patch outfile in place). Compressed files cannot be
+    # read at random, so a warning is given and the caller should process the whole file instead.
+    if CompressedFiles.is_compressed(infile) or (outfile is not None and CompressedFiles.is_compressed(outfile, 'w')):
+        print 'Warning: the residue index cannot be used with compressed files. The whole file will be processed.'
+        return False
+    return True
+
+
+def copy_range(f, of, start, end):
+    # Copy bytes start..end of f to of, in bulk
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = f.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            break
+        of.write(chunk)
+        remaining -= len(chunk)
@@ -0,0 +1,192 @@
+#! /usr/bin/env python
+
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Take an inventory of the chains of a collection of structures: the one-letter sequence of each chain, the range of
+# its residue numbers, the gaps in the numbering, the residues with insertion codes and the non-standard residues.
+# Sequences are written in FASTA format and the rest as a table.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import sys
+import os
+import argparse
+import csv
+import CompressedFiles
+import ExtractResidues
+from ResidueCodes import res_codes
+from LazyModules import LazyModule
+
+np = LazyModule('numpy')
+PdbArrays = LazyModule('PdbArrays')
+CifArrays = LazyModule('CifArrays')
+
+FASTA_WIDTH = 60
+
+SUMMARY_COLUMNS = ['File', 'Chain', 'Residues', 'First', 'Last', 'Gaps', 'Insertions', 'Nonstandard']
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='List the sequence, numbering, gaps, insertion codes and non-standard '
+                                                 'residues of each chain in a collection of structures.')
+    parser.add_argument('infiles', nargs='+', help='input files (PDB or mmCIF format), wildcard patterns or '
+                                                   'directories')
+    parser.add_argument('fasta', help='output file for the sequences (FASTA format)')
+    parser.add_argument('summary', help='output file for the table of chains (CSV)')
+    parser.add_argument('-p', '--processes', help='number of worker processes used to read the files in parallel',
+                        type=int, default=1)
+    parser.add_argument('-e', '--exclude', help='names of residues to leave out, comma separated (default %s)'
+                                                % ExtractResidues.DEFAULT_STRIP, default=ExtractResidues.DEFAULT_STRIP)
+    args = parser.parse_args()
+
+    infiles = PdbArrays.expand_files(args.infiles, ('.pdb', '.cif'))
+    if not infiles:
+        print 'Error: no input files were found.'
+        quit()
+
+    results = PdbArrays.map_models(inventory, infiles, (args.exclude.split(','),), args.processes)
+
+    with CompressedFiles.open_file(args.fasta, 'w') as fo, CompressedFiles.open_file(args.summary, 'wb') as so:
+        writer = csv.writer(so)
+        writer.writerow(SUMMARY_COLUMNS)
+        for infile, chains in zip(infiles, results):
+            name = os.path.splitext(os.path.basename(CompressedFiles.strip_suffix(infile)))[0]
+            if not chains:
+                print 'Warning: no chains were found in %s.' % infile
+            for chain in chains:
+                fo.write('>%s:%s %s-%s\n' % (name, chain['Chain'].strip(), chain['First'], chain['Last']))
+                seq = chain['Sequence']
+                for i in range(0, len(seq), FASTA_WIDTH):
+                    fo.write(seq[i:i + FASTA_WIDTH] + '\n')
+                writer.writerow([infile] + [chain[col] for col in SUMMARY_COLUMNS[1:]])
+
+    print '%d chains in %d files' % (sum(len(chains) for chains in results), len(infiles))
+
+
+def inventory(infile, exclude):
+    # The inventory of each chain in a file, in the order in which the chains first appear, as a list of dicts with
+    # the keys of SUMMARY_COLUMNS (other than File) and Sequence
+    if CompressedFiles.is_cif(infile):
+        residues = cif_residues(infile)
+    else:
+        residues = pdb_residues(infile)
+    is_atom, chains, resseqs, icodes, resnames, segments = residues
+
+    excluded = np.in1d(resnames, exclude)
+    chains = number_blank_chains(chains, segments, ~excluded)
+    standard = np.in1d(resnames, res_codes.keys())
+    order = []
+    for chain in chains[~excluded].tolist():
+        if chain not in order:
+            order.append(chain)
+
+    resids = ['%d%s' % (n, c.strip()) for n, c in zip(resseqs.tolist(), icodes.tolist())]
+
+    result = []
+    for chain in order:
+        in_chain = (chains == chain) & ~excluded
+        polymer = np.nonzero(in_chain & is_atom)[0]
+
+        # Gaps are runs of residue numbers missing between consecutive residues of the polymer
+        gaps = []
+        numbers = resseqs[polymer]
+        for after in np.nonzero(numbers[1:] > numbers[:-1] + 1)[0].tolist():
+            lo, hi = numbers[after] + 1, numbers[after + 1] - 1
+            gaps.append(str(lo) if lo == hi else '%d-%d' % (lo, hi))
+
+        result.append({
+            'Chain': chain,
+            'Sequence': ''.join(res_codes.get(name, 'X') for name in resnames[polymer].tolist()),
+            'Residues': len(polymer),
+            'First': resids[polymer[0]] if len(polymer) else '',
+            'Last': resids[polymer[-1]] if len(polymer) else '',
+            'Gaps': ' '.join(gaps),
+            'Insertions': ' '.join(resids[i] for i in polymer.tolist() if icodes[i].strip()),
+            'Nonstandard': ' '.join('%s %s' % (resnames[i], resids[i])
+                                    for i in np.nonzero(in_chain & ~standard)[0].tolist()),
+        })
+    return result
+
+
+def number_blank_chains(chains, segments, kept):
+    # Chains without ids, as in the PDB files written by Amber, are told apart by the TER records between them. The
+    # kept residues with blank chain ids are given the ids ' 1', ' 2' and so on, numbering their segments in order.
+    blank = (chains == ' ') & kept
+    if not blank.any():
+        return chains
+    numbers = np.unique(segments[blank], return_inverse=True)[1] + 1
+    chains = chains.astype('S%d' % max(chains.dtype.itemsize, len(str(numbers[-1])) + 1))
+    chains[blank] = [' %d' % n for n in numbers.tolist()]
+    return chains
+
+
+def pdb_residues(infile):
+    # Whether each residue of the first model of a PDB file is made up of ATOM records, and its chain, residue number,
+    # insertion code, name and segment (the number of TER records before it). The columns are read straight from the
+    # bytes of the text.
+    with CompressedFiles.open_file(infile, 'r') as f:
+        data = f.read()
+    header, models, trailer = PdbArrays.split_models(data)
+    if models:
+        data = models[0]
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = PdbArrays.line_bounds(buf)
+    records = PdbArrays.gather_column(buf, starts, 0, 6, ends)
+    lines = np.nonzero(np.in1d(records, ['ATOM  ', 'HETATM']))[0]
+
+    # A residue is a run of atoms with the same name, chain and residue id, unbroken by a TER record
+    segment = np.cumsum(records == 'TER   ')[lines]
+    labels = PdbArrays.gather_column(buf, starts[lines], 17, 10, ends[lines])
+    first = np.nonzero(np.r_[True, (labels[1:] != labels[:-1]) | (segment[1:] != segment[:-1])])[0] \
+        if len(lines) else np.zeros(0, dtype=np.int64)
+
+    starts, ends = starts[lines[first]], ends[lines[first]]
+    return (records[lines[first]] == 'ATOM  ',
+            PdbArrays.gather_column(buf, starts, 21, 1, ends),
+            PdbArrays.column_ints(PdbArrays.gather_column(buf, starts, 22, 4, ends)),
+            PdbArrays.gather_column(buf, starts, 26, 1, ends),
+            np.char.strip(PdbArrays.gather_column(buf, starts, 17, 4, ends)),
+            segment[first])
+
+
+def cif_residues(infile):
+    # As pdb_residues, for an mmCIF file. The first model is taken if there is a pdbx_PDB_model_num item. There are no
+    # TER records, so every residue is in segment 0.
+    with CifArrays.CifReader(infile) as r:
+        blocks = list(r.blocks())
+    if not blocks:
+        empty = np.zeros(0, dtype='S1')
+        return np.zeros(0, dtype=bool), empty, np.zeros(0, dtype=np.int64), empty, empty, np.zeros(0, dtype=np.int64)
+    site = CifArrays.AtomSite(r.names, np.concatenate([block.tokens for block in blocks]))
+
+    models = site.values(site.item('pdbx_PDB_model_num'))
+    site = site.select(models == models[0])
+
+    chains = site.chains()
+    resseqs = site.resseqs()
+    icodes = site.icodes()
+    resnames = site.resnames()
+    change = (chains[1:] != chains[:-1]) | (resseqs[1:] != resseqs[:-1]) | (icodes[1:] != icodes[:-1]) | \
+             (resnames[1:] != resnames[:-1])
+    first = np.nonzero(np.r_[True, change])[0]
+    return site.is_record('ATOM')[first], chains[first], resseqs[first], icodes[first], resnames[first], \
+        np.zeros(len(first), dtype=np.int64)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,112 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Collection of the warnings given by the tools.
+#
+# A tool may give the same kind of warning for a great many records of an unexpected input file, and printing each of
+# them can take longer than the work itself. Warnings are instead counted by kind, and the first few of each kind are
+# kept as examples. When the tool finishes, the examples are printed, with a count of those not shown, or everything
+# is written to a JSON report. With --verbose, each warning is printed as it is given.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+EXAMPLES = 10
+
+
+class WarningLog(object):
+    """Warnings counted by kind, with the first few of each kind kept as examples."""
+
+    def __init__(self, examples=EXAMPLES, verbose=False, report_file=None):
+        self.examples = examples
+        self.verbose = verbose
+        self.report_file = report_file
+        self.kinds = []
+        self.counts = {}
+        self.kept = {}
+
+    def warn(self, kind, message):
+        if kind not in self.counts:
+            self.kinds.append(kind)
+            self.counts[kind] = 0
+            self.kept[kind] = []
+        self.counts[kind] += 1
+        if len(self.kept[kind]) < self.examples:
+            self.kept[kind].append(message)
+        if self.verbose:
+            print 'Warning: %s' % message
+
+    def merge(self, other):
+        # Add the warnings collected in another log, for example by a worker process
+        for kind in other.kinds:
+            if kind not in self.counts:
+                self.kinds.append(kind)
+                self.counts[kind] = 0
+                self.kept[kind] = []
+            self.counts[kind] += other.counts[kind]
+            self.kept[kind].extend(other.kept[kind][:self.examples - len(self.kept[kind])])
+
+    def summary(self):
+        # The examples of each kind of warning, in the order in which the kinds were first seen, each followed by the
+        # number of warnings of that kind that are not shown
+        lines = []
+        for kind in self.kinds:
+            lines.extend('Warning: %s' % message for message in self.kept[kind])
+            more = self.counts[kind] - len(self.kept[kind])
+            if more:
+                lines.append('Warning: %d more warnings of this kind (%s) are not shown. Use --verbose to show every '
+                             'warning.' % (more, kind))
+        return lines
+
+    def report(self):
+        # Print the summary (unless each warning has been printed already), or write the JSON report
+        if self.report_file:
+            import json
+            with open(self.report_file, 'w') as f:
+                json.dump({'warnings': [{'kind': kind, 'count': self.counts[kind], 'examples': self.kept[kind]}
+                                        for kind in self.kinds]}, f, indent=2)
+        elif not self.verbose:
+            for line in self.summary():
+                print line
+
+
+# The log used by the tools
+
+log = WarningLog()
+
+
+def warn(kind, message):
+    log.warn(kind, message)
+
+
+def add_arguments(parser):
+    parser.add_argument('-v', '--verbose', help='print every warning as it is found, rather than a summary at the end',
+                        action='store_true')
+    parser.add_argument('-w', '--warning_examples', help='number of warnings of each kind to print in the summary '
+                                                         '(default %d)' % EXAMPLES, type=int, default=EXAMPLES)
+    parser.add_argument('--warning_report', help='write the warnings to this file, in JSON format, instead of printing '
+                                                 'the summary')
+
+
+def configure(args):
+    # Set up the log from the arguments added by add_arguments
+    log.examples = args.warning_examples
+    log.verbose = args.verbose
+    log.report_file = args.warning_report
+
+
+def report():
+    log.report()
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Run any of the tools as a subcommand, for example:
+#
+# python amberutils.py ConvertRes in.pdb out.pdb in.control
+#
+# Only the module of the selected tool is imported, so that the libraries used by the other tools are not loaded.
+# Because the tools are imported as modules, Python keeps their compiled form, which also saves the time taken to
+# compile the script on each run.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import sys
+
+TOOLS = [
+    ('AmberNum', 'tabulate tleap residue numbers against PDB residue numbers and chains'),
+    ('AutoSub', 'make substitutions with Modeller and find the best model'),
+    ('CalcBounds', 'analyse the distribution of MMPBSA/MMGBSA delta G'),
+    ('ConsolidateHbonds', 'total the hydrogen bonds between residue pairs found by cpptraj'),
+    ('ContactMap', 'list the residues in contact at the interfaces between chains'),
+    ('ConvertRes', 'change residue names as specified in a control file'),
+    ('CreateInteractionControl', 'create a control file for DrawInteractions'),
+    ('DrawInteractions', 'plot residue interactions'),
+    ('ExtractFramesHighLow', 'create cpptraj input files to extract high and low energy frames'),
+    ('ExtractMMPBSATotals', 'extract frame-by-frame MMPBSA/MMGBSA energy totals'),
+    ('ExtractResidues', 'extract residues from a PDB file'),
+    ('MakeConects', 'generate CONECT records from SSBOND records'),
+    ('MergeFiles', 'interleave the lines of several files'),
+    ('NumberRes', 'renumber residues and assign them to a chain'),
+    ('PairwiseDecompTable', 'tabulate residue-residue interaction energies from MMPBSA.py'),
+    ('Pipeline', 'run a chain of preparation steps in a single process'),
+    ('RelabelChains', 'label the chains of an unlabelled PDB file from a reference'),
+    ('RenameChain', 'rename a chain'),
+    ('RenumberAtoms', 'renumber atoms serially and fix up CONECTs'),
+    ('ReplaceRes', 'replace residues with those in a replacement file'),
+    ('ResToAmber', 'create a ConvertRes control file for histidines and disulphides'),
+    ('SequenceInventory', 'list the sequence, numbering and gaps of each chain in a set of structures'),
+]
+
+
+def usage():
+    print 'usage: amberutils.py [-h] tool [args ...]'
+    print
+    print 'Run one of the AmberUtils tools. Use amberutils.py tool -h for help on a tool.'
+    print
+    print 'tools:'
+    width = max(len(name) for name, _ in TOOLS)
+    for name, description in TOOLS:
+        print '  %s  %s' % (name.ljust(width), description)
+
+
+def find_tool(name):
+    # The name of the tool, matched without regard to case or a .py suffix, or None
+    if name.endswith('.py'):
+        name = name[:-3]
+    for tool, _ in TOOLS:
+        if tool.lower() == name.lower():
+            return tool
+    return None
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] in ('-h', '--help'):
+        usage()
+        return
+
+    tool = find_tool(argv[1])
+    if tool is None:
+        print 'Error: unknown tool "%s". Use amberutils.py -h for a list of tools.' % argv[1]
+        quit()
+
+    # The tools read their arguments from sys.argv, and name themselves in usage messages from sys.argv[0]
+    sys.argv = [tool + '.py'] + argv[2:]
+    module = __import__(tool)
+    module.main(sys.argv)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
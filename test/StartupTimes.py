@@ -0,0 +1,134 @@
+# Copyright (c) 2026 William Lees
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+# Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Measure the start-up time of the tools run through amberutils.py, and of the scripts run directly. Run from the test
+# directory. The help commands, and runs of the tools that work on plain text on trivial inputs, are expected to
+# complete within the target time. The runs of the text tools on the full test files are timed and reported as well,
+# but are not held to the target, as their time is mostly spent processing the files.
+
+__author__ = 'William Lees'
+__docformat__ = "restructuredtext en"
+
+import argparse
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+TARGET_MS = 100
+
+# Tools that work on plain text, with arguments for a run on the test files (outfile is replaced by a temporary file),
+# and the number of lines at the start of each input file that make up a trivial input. Ten lines of a pairwise
+# decomposition file hold the energy of one residue with itself.
+TEXT_TOOLS = [
+    ('RenameChain', ['3gbm_clean_fill_MP.pdb', 'outfile', 'A', 'Z'], 20),
+    ('MergeFiles', ['FINAL_DECOMP_GB_TOTALS_20_10_1.csv', 'FINAL_DECOMP_GB_TOTALS_20_10_2.csv', 'outfile'], 20),
+    ('PairwiseDecompTable', ['FINAL_DECOMP_MMPBSA_pw_20_10_1.csv', 'FINAL_DECOMP_MMPBSA_pw_20_10_2.csv', 'outfile'],
+     10),
+    ('ConsolidateHbonds', ['AV_HBOND_DONORS_prod2_1.dat', 'AV_HBOND_ACCEPTORS_prod2_1.dat', 'outfile'], 20),
+]
+
+# Tools that need NumPy or other libraries for their work: only their help is timed. The libraries are loaded once the
+# arguments have been read, so the help is expected to meet the target too.
+OTHER_TOOLS = ['AmberNum', 'ConvertRes', 'ExtractResidues', 'MakeConects', 'NumberRes', 'Pipeline', 'RelabelChains',
+               'RenumberAtoms', 'ReplaceRes', 'ResToAmber', 'CalcBounds', 'DrawInteractions', 'ExtractMMPBSATotals',
+               'CreateInteractionControl', 'ExtractFramesHighLow', 'ContactMap',
+               'SequenceInventory']
+
+
+def time_command(command, repeats):
+    # Median wall-clock time of the command in milliseconds, or None if it fails
+    times = []
+    with open(os.devnull, 'w') as null:
+        for _ in range(repeats):
+            start = time.time()
+            if subprocess.call(command, stdout=null, stderr=null) != 0:
+                return None
+            times.append((time.time() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def trivial_input(filename, lines, tmpdir):
+    # A copy of the first lines of the file, in tmpdir
+    copy = os.path.join(tmpdir, filename)
+    with open(filename, 'r') as f, open(copy, 'w') as o:
+        for line in itertools.islice(f, lines):
+            o.write(line)
+    return copy
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measure the start-up time of the tools')
+    parser.add_argument('-n', '--repeats', help='number of runs of each command (default 10)', type=int, default=10)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    dispatcher = os.path.join(root, 'amberutils.py')
+    tmpdir = tempfile.mkdtemp()
+    outfile = os.path.join(tmpdir, 'out')
+
+    # (label, command): start-up, checked against the target, and processing of the test files, which is not
+    startup = [('amberutils.py -h', [dispatcher, '-h'])]
+    processing = []
+    for tool, tool_args, lines in TEXT_TOOLS:
+        trivial_args = [outfile if a == 'outfile' else trivial_input(a, lines, tmpdir) if os.path.isfile(a) else a
+                        for a in tool_args]
+        tool_args = [outfile if a == 'outfile' else a for a in tool_args]
+        startup.append(('amberutils.py %s -h' % tool, [dispatcher, tool, '-h']))
+        startup.append(('amberutils.py %s (trivial input)' % tool, [dispatcher, tool] + trivial_args))
+        startup.append(('%s.py (trivial input)' % tool, [os.path.join(root, tool + '.py')] + trivial_args))
+        processing.append(('amberutils.py %s' % tool, [dispatcher, tool] + tool_args))
+        processing.append(('%s.py' % tool, [os.path.join(root, tool + '.py')] + tool_args))
+    for tool in OTHER_TOOLS:
+        startup.append(('amberutils.py %s -h' % tool, [dispatcher, tool, '-h']))
+        startup.append(('%s.py -h' % tool, [os.path.join(root, tool + '.py'), '-h']))
+
+    slow = False
+    failed = False
+    try:
+        # Run each command once first, so that compiled modules are in place
+        for label, command in startup + processing:
+            time_command([sys.executable] + command, 1)
+
+        for title, commands, check in [('Start-up (target %d ms)' % TARGET_MS, startup, True),
+                                       ('Processing of the test files', processing, False)]:
+            print title
+            for label, command in commands:
+                ms = time_command([sys.executable] + command, args.repeats)
+                if ms is None:
+                    print '%-50s  failed' % label
+                    failed = True
+                    continue
+                status = ''
+                if check:
+                    status = 'ok' if ms < TARGET_MS else 'SLOW'
+                    slow = slow or ms >= TARGET_MS
+                print '%-50s %7.1f ms  %s' % (label, ms, status)
+            print
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if failed:
+        print '*******ERROR*******     Some commands failed.'
+    if slow:
+        print '*******ERROR*******     Some commands took longer than %d ms to start.' % TARGET_MS
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -2,4 +2,41 @@ python ..\ReplaceRes.py 3GBM_refined_monomer_renum_i_2.pdb 3GBM_monomer_replaced
 python CompareFiles.py 3GBM_monomer_replaced.pdb 3GBM_monomer_replaced.pdb.golden
 python ..\DrawInteractions.py -t 1.0 -o -x CR6261_interactions_control.csv FINAL_DECOMP_MMPBSA_pw_table_20_10_av.csv hbonds_consol.csv 300 CR6261_interactions.pdf CR6261_interactions_summary.csv
 python ..\DrawInteractions.py -t 1.0 -o -x -c FINAL_DECOMP_MMPBSA_F54A_pw_table_20_10_av.csv CR6261_interactions_control.csv FINAL_DECOMP_MMPBSA_pw_table_20_10_av.csv hbonds_consol.csv 300 CR6261_interactions.pdf CR6261_interactions_summary.csv
+python ..\ContactMap.py -x 3gbm_clean_fill_MP_contacts.csv -c 3gbm_clean_fill_MP_interface_control.csv 3gbm_clean_fill_MP.pdb 3gbm_clean_fill_MP_interface.txt
+python CompareFiles.py 3gbm_clean_fill_MP_interface.txt 3gbm_clean_fill_MP_interface.txt.golden
+python CompareFiles.py 3gbm_clean_fill_MP_contacts.csv 3gbm_clean_fill_MP_contacts.csv.golden
+python CompareFiles.py 3gbm_clean_fill_MP_interface_control.csv 3gbm_clean_fill_MP_interface_control.csv.golden
+python ..\SequenceInventory.py "3GBM_fill.B9999000*.pdb" 3gbm_clean_fill_MP.pdb 3gbm_refined.pdb prod_3.pdb test_sequences.fa test_sequences.csv
+python CompareFiles.py test_sequences.fa test_sequences.fa.golden
+python CompareFiles.py test_sequences.csv test_sequences.csv.golden
+python ..\ExtractResidues.py -s prod_3.pdb prod_3_stripped.pdb
+python CompareFiles.py prod_3_stripped.pdb prod_3_stripped.pdb.golden
+python ..\ExtractResidues.py -s -k 15 prod_3.pdb prod_3_stripped_k15.pdb
+python CompareFiles.py prod_3_stripped_k15.pdb prod_3_stripped_k15.pdb.golden
+python ..\ExtractResidues.py -r 5,8 --around_chains I 3gbm_clean_fill_MP.pdb 3gbm_clean_fill_MP_pocket.pdb
+python CompareFiles.py 3gbm_clean_fill_MP_pocket_5.pdb 3gbm_clean_fill_MP_pocket_5.pdb.golden
+python CompareFiles.py 3gbm_clean_fill_MP_pocket_8.pdb 3gbm_clean_fill_MP_pocket_8.pdb.golden
+python ..\ReplaceRes.py -e 3GBM_refined_monomer_renum_i_2.pdb 3GBM_ensemble "3GBM_fill.B9999000*.pdb" D 44 50
+python CompareFiles.py 3GBM_ensemble\3GBM_fill.B99990001.pdb 3GBM_ensemble.golden\3GBM_fill.B99990001.pdb
+python CompareFiles.py 3GBM_ensemble\3GBM_fill.B99990007.pdb 3GBM_ensemble.golden\3GBM_fill.B99990007.pdb
+python ..\Pipeline.py 3GBM_refined_monomer_renum_i_2.pdb 3GBM_monomer_pipeline.pdb "ReplaceRes 3GBM_fill.B99990001.pdb D 44 50" RenumberAtoms MakeConects
+python CompareFiles.py 3GBM_monomer_pipeline.pdb 3GBM_monomer_pipeline.pdb.golden
+python ..\ConvertRes.py 3gbm_fragment.cif 3gbm_fragment_res.cif 3gbm_fragment.control
+python CompareFiles.py 3gbm_fragment_res.cif 3gbm_fragment_res.cif.golden
+python ..\RenameChain.py 3gbm_fragment.cif 3gbm_fragment_ren.cif HC:H,HD:L
+python CompareFiles.py 3gbm_fragment_ren.cif 3gbm_fragment_ren.cif.golden
+python ..\NumberRes.py 3gbm_fragment.cif 3gbm_fragment_num.cif 101 HC
+python CompareFiles.py 3gbm_fragment_num.cif 3gbm_fragment_num.cif.golden
+python ..\ExtractResidues.py 3gbm_fragment.cif 3gbm_fragment_ext.cif "52 56 HC"
+python CompareFiles.py 3gbm_fragment_ext.cif 3gbm_fragment_ext.cif.golden
+python ..\SequenceInventory.py 3gbm_fragment.cif prod_3.cif.gz cif_sequences.fa cif_sequences.csv
+python CompareFiles.py cif_sequences.fa cif_sequences.fa.golden
+python CompareFiles.py cif_sequences.csv cif_sequences.csv.golden
+python ..\ConvertRes.py prod_3.cif.gz prod_3_res.cif.gz prod_3_cif.control
+python ..\RenameChain.py prod_3_res.cif.gz prod_3_ren.cif.gz G Z
+python ..\ExtractResidues.py prod_3_ren.cif.gz prod_3_ren_ext.cif "2138 2142 Z"
+python CompareFiles.py prod_3_ren_ext.cif prod_3_ren_ext.cif.golden
+python ..\NumberRes.py prod_3.cif.gz prod_3_num.cif.gz 1 A
+python ..\ExtractResidues.py prod_3_num.cif.gz prod_3_num_ext.cif "2138 2142 A"
+python CompareFiles.py prod_3_num_ext.cif prod_3_num_ext.cif.golden
 